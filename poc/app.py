@@ -4,29 +4,147 @@ POC 版本
 """
 
 import os
+import json
+import math
 import uuid
+import time
 import asyncio
+import shutil
+import html
+import hashlib
+import threading
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, UploadFile, File, Form, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from typing import List, NamedTuple, Optional
+from fastapi import FastAPI, UploadFile, File, Form, Query, Request
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import uvicorn
-from concurrent.futures import ThreadPoolExecutor
-from functools import partial
 
-from stt import transcribe
-from summarizer import summarize, check_ollama_status
-
-# 建立執行緒池處理 CPU 密集型任務
-executor = ThreadPoolExecutor(max_workers=2)
-
-app = FastAPI(title="語音摘要助手")
+from stt import transcribe, transcribe_progressive, transcript_cache
+from stt_backends import get_backend
+from summarizer import (
+    PipelinedSummarizer, summarize_stream, summarize_styles, summarize_styles_stream, parse_styles,
+    check_ollama_status, summary_cache, estimate_tokens,
+    DEFAULT_MODEL, MAP_REDUCE_THRESHOLD_TOKENS, MAP_CHUNK_TOKENS, MAP_CONCURRENCY
+)
+from audio import guess_duration
+from batch import collect_recordings, run_batch
+from jobs import Job, JobScheduler, QueueFullError, COMPLETED, CANCELLED
+from throughput import throughput
+from metrics import (
+    STT_TIER_CHOICES, SUMMARY_SECONDS, UPLOAD_BYTES, UPLOAD_SECONDS, record_error,
+    render as render_metrics, stats_collector
+)
+from ollama_client import ollama
+from store import meeting_store, STORE_ENABLED
+from export import CONTENT_FORMATS, MEDIA_TYPES, download_name, export_cache, export_meeting
+from segments import Segments
+from compress import CompressionMiddleware
+from warmup import stt_warmup
+from residency import model_residency
+from tiers import (
+    AUTO, check_quality, choose_tier, draft_tier, get_tiers,
+    transcribe_seconds as estimate_transcribe_seconds
+)
+
+# 有界任務排程器處理 CPU 密集型任務（取代無上限的執行緒池）
+scheduler = JobScheduler()
+
+# /metrics 抓取時直接讀取快取、佇列與 Ollama 節點的現有統計
+stats_collector.caches = {
+    "transcripts": transcript_cache.stats,
+    "summaries": summary_cache.stats,
+    "exports": export_cache.stats
+}
+stats_collector.queue = scheduler.stats
+stats_collector.ollama = ollama.status
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    啟動時先完成一次 Ollama 健康檢查，之後由背景定期更新；
+    STT 模型與 Ollama 摘要模型在背景預載，不阻塞啟動
+    """
+    stt_warmup.start()
+    await asyncio.wrap_future(ollama.run(ollama.refresh_status()))
+    ollama.start_health_monitor()
+    model_residency.start()
+    yield
+
+
+app = FastAPI(title="語音摘要助手", lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
 
 # 建立上傳目錄
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# 邊轉錄邊摘要：長逐字稿在轉錄進行中就開始產生分段筆記
+PIPELINE_SUMMARY = os.environ.get("MEETING_PIPELINE_SUMMARY", "1") == "1"
+
+# 事件串流輪詢間隔與保持連線訊息間隔（秒）
+EVENT_POLL_INTERVAL = 0.2
+EVENT_KEEPALIVE_INTERVAL = 15
+
+# 上傳檔案大小上限（MB）與串流寫入的區塊大小
+MAX_UPLOAD_MB = int(os.environ.get("MEETING_MAX_UPLOAD_MB", "2048"))
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+# /batch 一次請求所有檔案合計的大小上限（MB）；單一檔案仍受 MAX_UPLOAD_MB 限制
+MAX_BATCH_UPLOAD_MB = int(os.environ.get("MEETING_MAX_BATCH_UPLOAD_MB", "8192"))
+MAX_BATCH_UPLOAD_BYTES = MAX_BATCH_UPLOAD_MB * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# 批次任務的輸出目錄，依上傳內容分子目錄，相同內容重新送出時可略過已完成的檔案
+BATCH_OUTPUT_DIR = Path(os.environ.get("MEETING_BATCH_OUTPUT_DIR", "results"))
+
+# 任務結果可用 fields 選擇的欄位；未指定時回傳 segments 以外的欄位
+RESULT_FIELDS = (
+    "transcript", "transcript_with_timestamps", "segments", "summary", "summary_stats",
+    "language", "audio_sha256", "meeting_id", "stt", "summaries"
+)
+DEFAULT_RESULT_FIELDS = tuple(name for name in RESULT_FIELDS if name != "segments")
+MEETING_FIELDS = (
+    "id", "created_at", "filename", "audio_sha256", "style", "language", "duration_ms",
+    "transcript", "summary", "segments"
+)
+
+
+class UploadTooLargeError(Exception):
+    """上傳檔案超過大小上限"""
+
+    def __init__(self, message: Optional[str] = None):
+        super().__init__(message or f"檔案過大，上限為 {MAX_UPLOAD_MB} MB")
+
+
+def batch_too_large_error() -> UploadTooLargeError:
+    return UploadTooLargeError(f"批次上傳總大小過大，上限為 {MAX_BATCH_UPLOAD_MB} MB")
+
+
+class StoredUpload(NamedTuple):
+    """已寫入磁碟的上傳檔案"""
+    path: Path
+    filename: str
+    sha256: str
+    size: int
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """
+    在解析 multipart 之前依 Content-Length 拒絕過大的上傳
+
+    /batch 一次上傳多個檔案，改以 MAX_BATCH_UPLOAD_BYTES 限制整個請求，單檔上限由 save_upload 檢查
+    """
+    batch = request.url.path == "/batch"
+    limit = MAX_BATCH_UPLOAD_BYTES if batch else MAX_UPLOAD_BYTES
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        return upload_too_large_response(batch_too_large_error() if batch else UploadTooLargeError())
+    return await call_next(request)
+
 # HTML 模板
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -246,8 +364,6 @@ HTML_TEMPLATE = """
             .options { flex-direction: column; }
         }
     </style>
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/jspdf/2.5.1/jspdf.umd.min.js"></script>
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/html2canvas/1.4.1/html2canvas.min.js"></script>
 </head>
 <body>
     <div id="toast" class="toast"></div>
@@ -276,6 +392,19 @@ HTML_TEMPLATE = """
                             <option value="brief">簡短摘要</option>
                         </select>
                     </div>
+                    <div class="option-group">
+                        <label>轉錄品質</label>
+                        <select name="quality" id="qualitySelect">
+                            <!-- QUALITY_OPTIONS -->
+                        </select>
+                    </div>
+                    <div class="option-group">
+                        <label>轉錄方式</label>
+                        <select name="progressive" id="progressiveSelect">
+                            <option value="false">一次完成</option>
+                            <option value="true">先顯示快速草稿</option>
+                        </select>
+                    </div>
                 </div>
 
                 <button type="submit" class="btn" id="submitBtn">
@@ -299,8 +428,14 @@ HTML_TEMPLATE = """
                         <button class="action-btn" onclick="copyToClipboard('transcript')" title="複製到剪貼簿">
                             <span class="btn-icon">📋</span> 複製
                         </button>
-                        <button class="action-btn" onclick="downloadPDF('transcript')" title="下載 PDF">
-                            <span class="btn-icon">📄</span> 下載 PDF
+                        <button class="action-btn" onclick="downloadExport('transcript', 'pdf')" title="下載 PDF">
+                            <span class="btn-icon">📄</span> PDF
+                        </button>
+                        <button class="action-btn" onclick="downloadExport('transcript', 'docx')" title="下載 Word 文件">
+                            <span class="btn-icon">📝</span> Word
+                        </button>
+                        <button class="action-btn" onclick="downloadExport('transcript', 'srt')" title="下載 SRT 字幕">
+                            <span class="btn-icon">🎬</span> SRT
                         </button>
                     </div>
                 </div>
@@ -314,8 +449,11 @@ HTML_TEMPLATE = """
                         <button class="action-btn" onclick="copyToClipboard('summary')" title="複製到剪貼簿">
                             <span class="btn-icon">📋</span> 複製
                         </button>
-                        <button class="action-btn" onclick="downloadPDF('summary')" title="下載 PDF">
-                            <span class="btn-icon">📄</span> 下載 PDF
+                        <button class="action-btn" onclick="downloadExport('summary', 'pdf')" title="下載 PDF">
+                            <span class="btn-icon">📄</span> PDF
+                        </button>
+                        <button class="action-btn" onclick="downloadExport('summary', 'docx')" title="下載 Word 文件">
+                            <span class="btn-icon">📝</span> Word
                         </button>
                     </div>
                 </div>
@@ -385,13 +523,115 @@ HTML_TEMPLATE = """
             });
         }
 
-        // 預估處理時間（秒）
-        // 參考數據：5分鐘音檔約45秒，30分鐘約150秒，60分鐘約270秒
-        // 公式：處理時間 ≈ 音檔長度(秒) × 0.075 + 20秒（摘要時間）
-        function estimateProcessingTime(audioDurationSecs) {
-            const transcribeTime = audioDurationSecs * 0.075;
-            const summarizeTime = 20;
-            return Math.max(30, transcribeTime + summarizeTime); // 最少 30 秒
+        // 秒數格式化為 m:ss
+        function formatClock(totalSecs) {
+            const mins = Math.floor(totalSecs / 60);
+            const secs = Math.floor(totalSecs % 60);
+            return `${mins}:${secs.toString().padStart(2, '0')}`;
+        }
+
+        // 完成時只取畫面需要的欄位，不重複傳送純文字逐字稿
+        const RESULT_FIELDS = 'transcript_with_timestamps,summary,language,meeting_id,stt';
+
+        // 秒數格式化為逐字稿時間戳 MM:SS
+        function formatTimestamp(totalSecs) {
+            const mins = Math.floor(totalSecs / 60);
+            const secs = Math.floor(totalSecs % 60);
+            return `${mins.toString().padStart(2, '0')}:${secs.toString().padStart(2, '0')}`;
+        }
+
+        function setProgress(percent) {
+            progressBar.style.width = Math.min(100, percent).toFixed(1) + '%';
+        }
+
+        // 訂閱任務事件（Server-Sent Events），依實際處理階段更新畫面
+        // 任務完成時 resolve 處理結果，失敗或取消時 reject
+        function followJob(jobId, audioDuration, onProgress, onEstimate) {
+            return new Promise((resolve, reject) => {
+                const source = new EventSource(`/jobs/${jobId}/events?fields=${RESULT_FIELDS}`);
+                let duration = audioDuration;
+                // 顯示草稿後，完整轉錄的分段只更新進度，完成時再整段取代草稿
+                let draftShown = false;
+
+                const on = (type, handler) => source.addEventListener(type, (e) => handler(JSON.parse(e.data)));
+
+                on('queued', (data) => {
+                    statusText.textContent = data.position > 1
+                        ? `上傳完成，排隊中（第 ${data.position} 位，預估等待 ${formatClock(data.wait_seconds)}）...`
+                        : '上傳完成，等待處理...';
+                });
+                on('estimate', (data) => {
+                    onEstimate(data.remaining_seconds);
+                });
+                on('running', () => {
+                    statusText.textContent = '正在進行語音轉文字...';
+                });
+                on('decoded', (data) => {
+                    duration = data.duration;
+                });
+                const showSegment = (data) => {
+                    const line = `[${formatTimestamp(data.start)} - ${formatTimestamp(data.end)}] ${data.text}`;
+                    transcriptResult.insertAdjacentHTML('beforeend', formatTranscript(line));
+                    transcriptSection.classList.add('show');
+                };
+                on('draft_segment', (data) => {
+                    showSegment(data);
+                    // 草稿佔進度條的前 20%
+                    setProgress(duration ? (data.end / duration) * 20 : 0);
+                    onProgress(`草稿已轉錄至 ${formatClock(data.end)} / ${formatClock(duration)}`);
+                });
+                on('draft', () => {
+                    draftShown = true;
+                    statusText.textContent = '草稿已完成，正在以完整模型重新轉錄...';
+                });
+                on('draft_summary', (data) => {
+                    summaryResult.innerHTML = formatSummary(data.summary);
+                    summarySection.classList.add('show');
+                });
+                on('segment', (data) => {
+                    if (draftShown) {
+                        setProgress(20 + (duration ? (data.end / duration) * 70 : 0));
+                        onProgress(`完整轉錄至 ${formatClock(data.end)} / ${formatClock(duration)}`);
+                        return;
+                    }
+                    showSegment(data);
+                    // 轉錄階段佔進度條的 90%
+                    setProgress(duration ? (data.end / duration) * 90 : 0);
+                    onProgress(`已轉錄至 ${formatClock(data.end)} / ${formatClock(duration)}`);
+                });
+                on('transcribed', () => {
+                    setProgress(90);
+                });
+                on('summarizing', () => {
+                    statusText.textContent = '正在生成摘要...';
+                    onProgress('逐字稿已完成，摘要生成中');
+                    summaryResult.textContent = '';
+                });
+                on('summary_token', (data) => {
+                    // 生成中先以純文字顯示，完成後再套用格式
+                    summaryResult.textContent += data.text;
+                    summarySection.classList.add('show');
+                });
+                on('completed', (data) => {
+                    source.close();
+                    resolve(data.result);
+                });
+                on('failed', (data) => {
+                    source.close();
+                    reject(new Error(data.error || '處理失敗'));
+                });
+                on('cancelled', () => {
+                    source.close();
+                    reject(new Error('任務已取消'));
+                });
+
+                // 連線中斷時瀏覽器會自動以 Last-Event-ID 重連，只有連線被關閉才視為失敗
+                source.onerror = () => {
+                    if (source.readyState === EventSource.CLOSED) {
+                        reject(new Error('與伺服器的連線中斷'));
+                    }
+                };
+            });
         }
 
         // 表單提交
@@ -406,102 +646,92 @@ HTML_TEMPLATE = """
             // 重置顯示
             transcriptSection.classList.remove('show');
             summarySection.classList.remove('show');
+            transcriptResult.innerHTML = '';
+            summaryResult.innerHTML = '';
             status.className = 'status show processing';
-            statusText.textContent = '分析音檔中...';
+            statusText.textContent = '上傳音檔中...';
             progressText.textContent = '';
             submitBtn.disabled = true;
             submitBtn.innerHTML = '<span class="loader"></span>處理中...';
 
             // 顯示進度條
             progressContainer.style.display = 'block';
-            progressBar.style.width = '0%';
+            setProgress(0);
 
             const formData = new FormData();
             const audioFile = fileInput.files[0];
             formData.append('file', audioFile);
             formData.append('style', document.getElementById('styleSelect').value);
+            formData.append('quality', document.getElementById('qualitySelect').value);
+            formData.append('progressive', document.getElementById('progressiveSelect').value);
+            formData.append('draft_summary', document.getElementById('progressiveSelect').value);
 
-            // 獲取音檔長度並預估處理時間
+            // 音檔長度用於計算轉錄進度，伺服器解碼後會以實際長度更新
             const audioDuration = await getAudioDuration(audioFile);
-            const estimatedTime = estimateProcessingTime(audioDuration);
-            const audioDurationMins = Math.floor(audioDuration / 60);
-            const audioDurationSecs = Math.floor(audioDuration % 60);
-
-            let progressTimer = null;
-            let seconds = 0;
-            let currentProgress = 0;
+            const startTime = Date.now();
+            let stageText = `音檔長度: ${formatClock(audioDuration)}`;
+            // 伺服器依實測處理速度估算的完成時間
+            let finishAt = null;
+            const elapsed = () => (Date.now() - startTime) / 1000;
+            const renderProgress = () => {
+                let text = `已處理 ${formatClock(elapsed())} | ${stageText}`;
+                if (finishAt !== null) {
+                    text += ` | 預估剩餘 ${formatClock(Math.max(0, (finishAt - Date.now()) / 1000))}`;
+                }
+                progressText.textContent = text;
+            };
+            renderProgress();
+            const progressTimer = setInterval(renderProgress, 1000);
 
             try {
-                statusText.textContent = '正在進行語音轉文字...';
-                progressText.textContent = `音檔長度: ${audioDurationMins}:${audioDurationSecs.toString().padStart(2, '0')} | 預估處理時間: ${Math.ceil(estimatedTime)} 秒`;
-
-                // 進度條動畫：根據預估時間平滑增長到 95%
-                const progressIncrement = 95 / estimatedTime; // 每秒增加的百分比
-                progressTimer = setInterval(() => {
-                    seconds++;
-                    if (currentProgress < 95) {
-                        // 使用非線性增長，前期快後期慢
-                        const targetProgress = Math.min(95, (seconds / estimatedTime) * 95);
-                        currentProgress += (targetProgress - currentProgress) * 0.3 + 0.5;
-                        currentProgress = Math.min(95, currentProgress);
-                        progressBar.style.width = currentProgress.toFixed(1) + '%';
-                    }
-
-                    // 更新狀態文字
-                    const mins = Math.floor(seconds / 60);
-                    const secs = seconds % 60;
-                    const remaining = Math.max(0, Math.ceil(estimatedTime - seconds));
-
-                    if (currentProgress < 80) {
-                        statusText.textContent = '正在進行語音轉文字...';
-                    } else {
-                        statusText.textContent = '正在生成摘要...';
-                    }
-
-                    progressText.textContent = `已處理 ${mins}:${secs.toString().padStart(2, '0')} | 預估剩餘 ${remaining} 秒 | ${currentProgress.toFixed(0)}%`;
-                }, 1000);
-
-                const response = await fetch('/process', {
+                const response = await fetch('/jobs', {
                     method: 'POST',
                     body: formData
                 });
+                const job = await response.json();
 
-                clearInterval(progressTimer);
+                if (!job.success) {
+                    throw new Error(job.error || '建立任務失敗');
+                }
 
-                const result = await response.json();
+                const result = await followJob(job.id, audioDuration, (text) => {
+                    stageText = text;
+                    renderProgress();
+                }, (remainingSeconds) => {
+                    finishAt = Date.now() + remainingSeconds * 1000;
+                    renderProgress();
+                });
 
-                if (result.success) {
-                    // 完成進度條動畫
-                    progressBar.style.transition = 'width 0.5s ease';
-                    progressBar.style.width = '100%';
+                clearInterval(progressTimer);
 
-                    status.className = 'status show success';
-                    statusText.textContent = '處理完成！';
-                    const finalMins = Math.floor(seconds / 60);
-                    const finalSecs = seconds % 60;
-                    progressText.textContent = `完成！總耗時 ${finalMins}:${finalSecs.toString().padStart(2, '0')} | 語言: ${result.language || '自動偵測'}`;
+                // 完成進度條動畫
+                progressBar.style.transition = 'width 0.5s ease';
+                setProgress(100);
 
-                    // 儲存原始文字（用於複製和 PDF）
-                    window.rawTranscript = result.transcript_with_timestamps || result.transcript;
-                    window.rawSummary = result.summary;
+                status.className = 'status show success';
+                statusText.textContent = '處理完成！';
+                const sttModel = result.stt ? ` | 轉錄模型: ${result.stt.model}` : '';
+                progressText.textContent = `完成！總耗時 ${formatClock(elapsed())} | 語言: ${result.language || '自動偵測'}${sttModel}`;
 
-                    // 顯示帶時間軸的逐字稿
-                    transcriptResult.innerHTML = formatTranscript(window.rawTranscript);
-                    transcriptSection.classList.add('show');
+                // 儲存原始文字（用於複製）與會議 ID（用於下載）
+                window.rawTranscript = result.transcript_with_timestamps;
+                window.rawSummary = result.summary;
+                window.meetingId = result.meeting_id;
 
-                    summaryResult.innerHTML = formatSummary(window.rawSummary);
-                    summarySection.classList.add('show');
+                // 以完整結果取代逐段顯示的逐字稿
+                transcriptResult.innerHTML = formatTranscript(window.rawTranscript);
+                transcriptSection.classList.add('show');
 
-                    // 隱藏進度條
-                    setTimeout(() => {
-                        progressContainer.style.display = 'none';
-                        progressBar.style.transition = '';
-                    }, 1000);
-                } else {
-                    throw new Error(result.error || '處理失敗');
-                }
+                summaryResult.innerHTML = formatSummary(window.rawSummary);
+                summarySection.classList.add('show');
+
+                // 隱藏進度條
+                setTimeout(() => {
+                    progressContainer.style.display = 'none';
+                    progressBar.style.transition = '';
+                }, 1000);
             } catch (error) {
-                if (progressTimer) clearInterval(progressTimer);
+                clearInterval(progressTimer);
                 progressContainer.style.display = 'none';
                 status.className = 'status show error';
                 statusText.textContent = '處理失敗';
@@ -566,112 +796,13 @@ HTML_TEMPLATE = """
             }
         }
 
-        // 下載 PDF
-        async function downloadPDF(type) {
-            const text = type === 'transcript' ? window.rawTranscript : window.rawSummary;
-            const title = type === 'transcript' ? '會議逐字稿' : '會議摘要';
-            const filename = type === 'transcript' ? '逐字稿.pdf' : '摘要.pdf';
-
-            if (!text) {
+        // 下載由伺服器產生的 PDF / Word / 字幕檔
+        function downloadExport(type, format) {
+            if (!window.meetingId) {
                 showToast('沒有可下載的內容');
                 return;
             }
-
-            showToast('正在生成 PDF...');
-
-            try {
-                const { jsPDF } = window.jspdf;
-                const pdf = new jsPDF('p', 'mm', 'a4');
-                const pageWidth = 210;
-                const pageHeight = 297;
-                const margin = 20;
-                const contentWidth = pageWidth - (margin * 2);
-                const maxContentHeight = pageHeight - (margin * 2) - 60; // 預留標題空間
-
-                // 將文字按行分割
-                const lines = text.split('\\n');
-                const firstPageLines = 35; // 第一頁（有標題）約 35 行
-                const otherPageLines = 42; // 其他頁約 42 行，盡量排滿
-
-                // 計算總頁數
-                let remainingLines = lines.length;
-                let totalPages = 1;
-                remainingLines -= firstPageLines;
-                if (remainingLines > 0) {
-                    totalPages += Math.ceil(remainingLines / otherPageLines);
-                }
-
-                let currentLine = 0;
-                const now = new Date();
-                const dateStr = now.toLocaleString('zh-TW');
-
-                for (let page = 0; page < totalPages; page++) {
-                    if (page > 0) pdf.addPage();
-
-                    const linesForThisPage = page === 0 ? firstPageLines : otherPageLines;
-
-                    // 建立該頁的臨時容器
-                    const tempDiv = document.createElement('div');
-                    tempDiv.style.cssText = `
-                        position: absolute;
-                        left: -9999px;
-                        top: 0;
-                        width: 750px;
-                        padding: 25px 30px;
-                        background: white;
-                        font-family: -apple-system, BlinkMacSystemFont, "Microsoft JhengHei", "微軟正黑體", "PingFang TC", sans-serif;
-                        font-size: 13px;
-                        line-height: 1.6;
-                    `;
-
-                    const startLine = currentLine;
-                    const endLine = Math.min(currentLine + linesForThisPage, lines.length);
-                    currentLine = endLine;
-                    const pageContent = lines.slice(startLine, endLine).join('\\n');
-
-                    // 第一頁顯示標題
-                    const headerHtml = page === 0 ? `
-                        <div style="text-align: center; margin-bottom: 15px;">
-                            <h1 style="font-size: 22px; color: #333; margin-bottom: 8px;">${title}</h1>
-                            <p style="color: #666; font-size: 11px;">產生時間：${dateStr} | 世德會議助理</p>
-                        </div>
-                        <hr style="border: none; border-top: 2px solid #667eea; margin: 15px 0;">
-                    ` : '';
-
-                    tempDiv.innerHTML = `
-                        ${headerHtml}
-                        <div style="white-space: pre-wrap; color: #333; font-size: 13px;">${pageContent.replace(/</g, '&lt;').replace(/>/g, '&gt;')}</div>
-                        <div style="text-align: center; margin-top: 20px; color: #999; font-size: 10px;">
-                            第 ${page + 1} / ${totalPages} 頁
-                        </div>
-                    `;
-
-                    document.body.appendChild(tempDiv);
-
-                    // 使用 html2canvas 轉換為圖片
-                    const canvas = await html2canvas(tempDiv, {
-                        scale: 2,
-                        useCORS: true,
-                        logging: false,
-                        backgroundColor: '#ffffff'
-                    });
-
-                    document.body.removeChild(tempDiv);
-
-                    // 添加圖片到 PDF
-                    const imgData = canvas.toDataURL('image/jpeg', 0.92);
-                    const imgWidth = pageWidth - 10;
-                    const imgHeight = (canvas.height * imgWidth) / canvas.width;
-
-                    pdf.addImage(imgData, 'JPEG', 5, 5, imgWidth, Math.min(imgHeight, pageHeight - 10));
-                }
-
-                pdf.save(filename);
-                showToast('PDF 已下載！');
-            } catch (err) {
-                console.error('PDF 生成失敗:', err);
-                showToast('PDF 生成失敗，請稍後再試');
-            }
+            window.location.href = `/meetings/${window.meetingId}/export?content=${type}&format=${format}`;
         }
     </script>
 </body>
@@ -679,28 +810,525 @@ HTML_TEMPLATE = """
 """
 
 
+# 預設分級名稱在選單中顯示的說明
+TIER_LABELS = {"high": "最準確", "balanced": "平衡", "fast": "最快速"}
+
+
+def quality_options() -> str:
+    """轉錄品質選單的選項，依目前後端的模型分級產生"""
+    options = ['<option value="auto">自動（依排隊狀況）</option>']
+    for tier in get_tiers():
+        label = f"{TIER_LABELS.get(tier.name, tier.name)}（{tier.model}）"
+        options.append(f'<option value="{html.escape(tier.name)}">{html.escape(label)}</option>')
+    return "\n".join(" " * 28 + option for option in options).lstrip()
+
+
+# 分級由環境變數決定，啟動時產生一次即可
+INDEX_HTML = HTML_TEMPLATE.replace("<!-- QUALITY_OPTIONS -->", quality_options())
+
+
 @app.get("/", response_class=HTMLResponse)
 async def home():
     """首頁"""
-    return HTML_TEMPLATE
+    return INDEX_HTML
 
 
 @app.get("/health")
 async def health_check():
     """健康檢查"""
     ollama_status = check_ollama_status()
+    # SQLite 查詢會阻塞，且寫入者持有資料庫時可能等待更久，不在事件迴圈中執行
+    store_stats = await asyncio.to_thread(meeting_store.stats) if STORE_ENABLED else None
     return {
         "status": "ok",
-        "ollama": ollama_status
+        "ollama": ollama_status,
+        "queue": scheduler.stats(),
+        "cache": {
+            "transcripts": transcript_cache.stats(),
+            "summaries": summary_cache.stats(),
+            "exports": export_cache.stats()
+        },
+        "throughput": throughput.snapshot(),
+        "store": store_stats,
+        "stt": stt_warmup.status(),
+        "residency": model_residency.status()
+    }
+
+
+@app.get("/health/live")
+async def liveness():
+    """存活檢查：行程可回應即為存活，不檢查模型與外部服務"""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """
+    就緒檢查：STT 模型已預熱、Ollama 可連線並已安裝摘要模型，且摘要模型預載已結束時回傳 200，否則 503
+    """
+    ollama_status = check_ollama_status()
+    model_installed = DEFAULT_MODEL in ollama_status["models"]
+    ready = (
+        stt_warmup.ready and model_residency.ready
+        and ollama_status["available"] and model_installed
+    )
+    return JSONResponse({
+        "ready": ready,
+        "stt": stt_warmup.status(),
+        "residency": model_residency.status(),
+        "ollama": {
+            "available": ollama_status["available"],
+            "model": DEFAULT_MODEL,
+            "model_installed": model_installed
+        }
+    }, status_code=200 if ready else 503)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus 指標"""
+    content, content_type = render_metrics()
+    return Response(content, media_type=content_type)
+
+
+def estimate_processing(
+    duration: float,
+    model: str = DEFAULT_MODEL,
+    stt_model: str = None,
+    draft_model: str = None,
+    extra_styles: int = 0,
+    stt_cached: bool = False
+) -> dict:
+    """
+    依實測處理速度估算一個音檔的處理耗時（不含排隊）
+
+    Args:
+        duration: 音訊長度（秒）
+        model: 摘要使用的 Ollama 模型
+        stt_model: 轉錄使用的 STT 模型，None 表示預設模型
+        draft_model: 兩階段轉錄的草稿模型，None 表示不產生草稿
+        extra_styles: 另外生成的摘要風格數
+        stt_cached: 逐字稿已在快取中（不需轉錄）
+
+    Returns:
+        dict: transcribe_seconds、summarize_seconds、total_seconds；
+            有草稿時另含 draft_seconds（草稿完成的秒數，已計入 transcribe_seconds）
+    """
+    backend = get_backend(model=stt_model)
+    transcribe_seconds = 0.0 if stt_cached else estimate_transcribe_seconds(backend.model, duration, backend.name)
+    draft_seconds = None
+    if draft_model is not None:
+        draft_seconds = estimate_transcribe_seconds(draft_model, duration, backend.name)
+        transcribe_seconds += draft_seconds
+
+    tokens = throughput.transcript_tokens(duration)
+    if tokens > MAP_REDUCE_THRESHOLD_TOKENS:
+        # 長逐字稿先分段摘要，最後彙整各段筆記
+        chunks = math.ceil(tokens / MAP_CHUNK_TOKENS)
+        rounds = math.ceil(chunks / MAP_CONCURRENCY)
+        map_seconds = rounds * throughput.generation_seconds(model, MAP_CHUNK_TOKENS)
+        if PIPELINE_SUMMARY:
+            # 分段摘要與轉錄同時進行，只有超出轉錄時間的部分會延後完成
+            map_seconds = max(0.0, map_seconds - transcribe_seconds)
+        notes_tokens = int(chunks * throughput.output_tokens(model))
+        summarize_seconds = map_seconds + throughput.generation_seconds(model, notes_tokens)
+    else:
+        summarize_seconds = throughput.generation_seconds(model, tokens)
+    # 其他風格沿用共用開頭的 KV 快取，只需生成各自的輸出
+    summarize_seconds += extra_styles * throughput.generation_seconds(model, 0)
+
+    estimate = {
+        "transcribe_seconds": transcribe_seconds,
+        "summarize_seconds": summarize_seconds,
+        "total_seconds": transcribe_seconds + summarize_seconds,
     }
+    if draft_seconds is not None:
+        estimate["draft_seconds"] = draft_seconds
+    return estimate
+
+
+def run_pipeline(
+    job,
+    file_path: str,
+    style: str,
+    audio_sha256: str,
+    regenerate: bool = False,
+    stt: Optional[dict] = None,
+    draft: Optional[dict] = None,
+    draft_summary: bool = False,
+    extra_styles: tuple = ()
+) -> dict:
+    """
+    在工作執行緒中執行：轉錄 + 摘要，並記錄各階段事件
+
+    stt 為 choose_tier() 的結果，None 表示使用預設的 STT 模型。
+    draft 為 draft_tier() 的結果時進行兩階段轉錄：先以快速模型產生草稿放在 job.draft，
+    再以 stt 的模型重新轉錄；draft_summary 為 True 時另外在背景對草稿產生摘要。
+    extra_styles 為 style 之外要一併生成的摘要風格，與 style 共用相同的 prompt 開頭
+    """
+    stt_model = stt["model"] if stt else None
+    draft_model = draft["model"] if draft else None
+    pipelined = PipelinedSummarizer(use_cache=not regenerate) if PIPELINE_SUMMARY else None
+
+    def on_event(event_type: str, **data):
+        job.emit(event_type, **data)
+        if event_type == "decoded":
+            # 以實際長度更新預估，排在後面的任務也會跟著修正等待時間
+            job.estimated_seconds = estimate_processing(
+                data["duration"], stt_model=stt_model, draft_model=draft_model,
+                extra_styles=len(extra_styles)
+            )["total_seconds"]
+            job.emit("estimate", **scheduler.eta(job.id))
+        if pipelined is not None and event_type == "segment":
+            pipelined.add_segment(data["text"])
+
+    def summarize_draft():
+        # 與完整轉錄同時進行：STT 與 LLM 使用不同的資源
+        for event in summarize_stream(
+            job.draft["transcript"],
+            style=style,
+            use_cache=not regenerate,
+            segments=job.draft["segments"]
+        ):
+            if event["type"] == "done" and not job.finished:
+                job.draft["summary"] = event["summary"]
+                job.emit("draft_summary", summary=event["summary"])
+
+    def on_draft(result: dict):
+        job.draft = {
+            "transcript": result["text"],
+            "segments": result["segments"],
+            "language": result.get("language", "unknown"),
+            "stt": draft,
+        }
+        job.emit("draft", language=job.draft["language"], segments=len(result["segments"]), stt=draft)
+        job.check_cancelled()
+        if draft_summary and result["text"].strip():
+            threading.Thread(target=summarize_draft, name=f"draft-summary-{job.id}", daemon=True).start()
+
+    job.emit("transcribing")
+    try:
+        if draft is not None:
+            result = transcribe_progressive(
+                file_path,
+                draft_model,
+                audio_hash=audio_sha256,
+                model=stt_model,
+                on_event=on_event,
+                on_draft=on_draft
+            )
+        else:
+            result = transcribe(file_path, audio_hash=audio_sha256, model=stt_model, on_event=on_event)
+        transcript = result["text"]
+
+        if not transcript.strip():
+            raise ValueError("轉錄結果為空，請確認音檔內容")
+
+        job.emit(
+            "transcribed",
+            language=result.get("language", "unknown"),
+            segments=len(result.get("segments", []))
+        )
+        segments = result.get("segments", [])
+        if segments:
+            throughput.record_transcript(segments[-1].get("end", 0), estimate_tokens(transcript))
+        job.check_cancelled()
+    except BaseException:
+        if pipelined is not None:
+            pipelined.close()
+        raise
+
+    job.emit("summarizing", style=style)
+    summary_start = time.perf_counter()
+    if pipelined is not None:
+        events = pipelined.stream(transcript, style=style, extra_styles=extra_styles)
+    else:
+        events = summarize_styles_stream(
+            transcript,
+            [style] + [name for name in extra_styles if name != style],
+            use_cache=not regenerate,
+            segments=result.get("segments")
+        )
+
+    summary = ""
+    summary_stats = None
+    summaries = {}
+    for event in events:
+        if event["style"] != style:
+            # 其他風格不逐 token 串流，完成時整份送出
+            if event["type"] != "token":
+                summaries[event["style"]] = event.get("summary", event.get("error"))
+                job.emit("style_summary", style=event["style"], summary=summaries[event["style"]])
+            continue
+        if event["type"] == "token":
+            job.emit("summary_token", text=event["text"])
+            continue
+        if event["type"] == "done":
+            summary = event["summary"]
+            summary_stats = event["stats"]
+        else:
+            summary = event["error"]
+        summaries[style] = summary
+        SUMMARY_SECONDS.labels(model=DEFAULT_MODEL, style=style).observe(time.perf_counter() - summary_start)
+
+    meeting_id = None
+    if STORE_ENABLED:
+        # 寫入失敗不影響本次結果，只是之後無法搜尋到這場會議
+        try:
+            meeting_store.save_meeting(
+                job.id,
+                transcript,
+                summary if summary_stats is not None else None,
+                result.get("segments", []),
+                filename=job.info.get("filename"),
+                audio_sha256=audio_sha256,
+                style=style,
+                language=result.get("language", "unknown")
+            )
+            meeting_id = job.id
+            job.emit("stored", meeting_id=meeting_id)
+        except Exception as e:
+            record_error("store", e)
+            job.emit("store_failed", error=str(e))
+
+    # 只保存精簡的分段，transcript 與 segments 共用同一份文字，帶時間軸文字在回應時才產生
+    return {
+        "transcript": transcript,
+        "segments": result["segments"],
+        "summary": summary,
+        "summary_stats": summary_stats,
+        "language": result.get("language", "unknown"),
+        "audio_sha256": audio_sha256,
+        "meeting_id": meeting_id,
+        # 實際使用的 STT 模型分級與選擇原因
+        "stt": {key: stt[key] for key in ("tier", "backend", "model", "reason")} if stt else None,
+        # 要求多種風格時，各風格的摘要（含 style）
+        "summaries": summaries if extra_styles else None
+    }
+
+
+def parse_fields(fields: Optional[str], allowed: tuple) -> Optional[tuple]:
+    """解析以逗號分隔的欄位清單，未指定時回傳 None；含不支援的欄位時丟出 ValueError"""
+    if not fields:
+        return None
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"不支援的欄位: {', '.join(unknown)}，可用欄位: {', '.join(allowed)}")
+    return names
+
+
+def bad_request_response(e: ValueError) -> JSONResponse:
+    return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+
+
+def render_result(
+    result: dict,
+    fields: Optional[tuple] = None,
+    segments_offset: int = 0,
+    segments_limit: Optional[int] = None
+) -> dict:
+    """
+    將任務結果轉為回應內容
+
+    Args:
+        result: run_pipeline 的結果；批次任務等其他結果原樣回傳
+        fields: 要回傳的欄位，None 表示 DEFAULT_RESULT_FIELDS
+        segments_offset: segments 欄位的起始分段
+        segments_limit: segments 欄位最多回傳的分段數，None 表示全部
+    """
+    segments = result.get("segments") if isinstance(result, dict) else None
+    if not isinstance(segments, Segments):
+        return result
+    data = {}
+    for name in fields or DEFAULT_RESULT_FIELDS:
+        if name == "segments":
+            data["segments"] = segments.to_columns(segments_offset, segments_limit)
+        elif name == "transcript_with_timestamps":
+            data[name] = segments.timestamped_text()
+        else:
+            data[name] = result.get(name)
+    return data
+
+
+def render_job(
+    job: Job,
+    fields: Optional[tuple] = None,
+    segments_offset: int = 0,
+    segments_limit: Optional[int] = None
+) -> dict:
+    """任務狀態的回應內容，結果與草稿經 render_result 轉為可 JSON 序列化的形式"""
+    data = job.to_dict()
+    for name in ("result", "draft"):
+        if name in data:
+            data[name] = render_result(data[name], fields, segments_offset, segments_limit)
+    return data
+
+
+def sse_event(event_type: str, data: dict, event_id: int = None) -> str:
+    """格式化一則 Server-Sent Event"""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+async def save_upload(file: UploadFile, file_path: Path = None) -> StoredUpload:
+    """
+    以固定大小區塊串流寫入上傳檔案，同時計算 SHA-256
+
+    記憶體用量與檔案大小無關；超過上限時刪除已寫入的部分並丟出 UploadTooLargeError。
+    file_path 未指定時以隨機檔名存放於 UPLOAD_DIR。
+    """
+    if file_path is None:
+        file_id = str(uuid.uuid4())[:8]
+        file_ext = Path(file.filename).suffix
+        file_path = UPLOAD_DIR / f"{file_id}{file_ext}"
+
+    digest = hashlib.sha256()
+    size = 0
+    start = time.perf_counter()
+    try:
+        with open(file_path, "wb") as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadTooLargeError()
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        file_path.unlink(missing_ok=True)
+        raise
+
+    UPLOAD_SECONDS.observe(time.perf_counter() - start)
+    UPLOAD_BYTES.observe(size)
+    return StoredUpload(file_path, file.filename, digest.hexdigest(), size)
+
+
+def submit_job(
+    upload: StoredUpload,
+    style: str,
+    regenerate: bool = False,
+    quality: str = AUTO,
+    progressive: bool = False,
+    draft_summary: bool = False,
+    extra_styles: tuple = ()
+):
+    """
+    提交處理任務，任務結束後自動清理暫存檔案
+
+    依要求的品質、音訊長度與目前的排隊時間選擇 STT 模型分級；品質不存在時丟出 ValueError。
+    progressive 為 True 且選定的分級不是最快的一級時，先以最快的分級產生草稿；
+    extra_styles 為 style 之外要一併生成的摘要風格
+    """
+    try:
+        duration = guess_duration(str(upload.path))
+        stt = choose_tier(duration, quality, scheduler.estimate_wait(), audio_hash=upload.sha256)
+        draft = draft_tier(stt) if progressive else None
+        info = {"filename": upload.filename, "size": upload.size, "style": style, "stt_tier": stt["tier"]}
+        if draft is not None:
+            info["draft_tier"] = draft["tier"]
+        if extra_styles:
+            info["styles"] = list(extra_styles)
+        job = scheduler.submit(
+            run_pipeline,
+            str(upload.path),
+            style,
+            upload.sha256,
+            regenerate,
+            stt,
+            draft,
+            draft_summary,
+            tuple(extra_styles),
+            finalizer=lambda: upload.path.unlink(missing_ok=True),
+            info=info,
+            estimated_seconds=estimate_processing(
+                duration, stt_model=stt["model"], draft_model=draft and draft["model"],
+                extra_styles=len(extra_styles), stt_cached=stt["cached"]
+            )["total_seconds"]
+        )
+    except BaseException:
+        upload.path.unlink(missing_ok=True)
+        raise
+    STT_TIER_CHOICES.labels(tier=stt["tier"], reason=stt["reason"]).inc()
+    return job
+
+
+def batch_key(files: List[tuple]) -> str:
+    """依 [(檔名, 內容 SHA256), ...] 產生批次輸出目錄名稱，與上傳順序無關"""
+    digest = hashlib.sha256()
+    for name, sha256 in sorted(files):
+        digest.update(f"{name}\0{sha256}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def run_batch_job(job, batch_dir: Path, key: str, style: str, regenerate: bool = False) -> dict:
+    """
+    在工作執行緒中執行：展開上傳的音檔與壓縮檔後批次處理
+
+    批次任務與一般任務共用排程器的一個工作者名額，因此轉錄與摘要各只用一個執行緒，
+    不另外佔用 MAX_WORKERS 以外的 CPU；需要更高並行度時改用 batch.py 命令列。
+    """
+    output_dir = BATCH_OUTPUT_DIR / key
+    recordings = collect_recordings(batch_dir / "files", batch_dir / "extracted")
+    if not recordings:
+        raise ValueError("未找到可處理的音檔")
+    job.emit("batch_started", files=[str(relative) for _, relative in recordings])
+    files = run_batch(
+        recordings,
+        output_dir,
+        style=style,
+        stt_workers=1,
+        llm_workers=1,
+        force=regenerate,
+        on_event=job.emit,
+        check_cancelled=job.check_cancelled
+    )
+    return {"output_dir": str(output_dir), "files": files}
+
+
+def queue_full_response(e: QueueFullError) -> JSONResponse:
+    return JSONResponse(
+        {"success": False, "error": str(e)},
+        status_code=429,
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+def upload_too_large_response(e: UploadTooLargeError) -> JSONResponse:
+    return JSONResponse({"success": False, "error": str(e)}, status_code=413)
 
 
 @app.post("/process")
 async def process_audio(
     file: UploadFile = File(...),
-    style: str = Form("meeting")
+    style: str = Form("meeting"),
+    regenerate: bool = Form(False),
+    fields: Optional[str] = Form(None),
+    quality: str = Form(AUTO),
+    progressive: bool = Form(False),
+    draft_summary: bool = Form(False),
+    styles: Optional[str] = Form(None)
 ):
-    """處理音檔：轉錄 + 摘要"""
+    """
+    處理音檔：轉錄 + 摘要（同步等待結果）
+
+    styles 為 style 之外要一併生成的摘要風格（以逗號分隔），結果放在 summaries
+
+    progressive 為 True 時草稿完成即回傳草稿與任務 ID，完整結果由 GET /jobs/{id} 或事件串流取得
+    """
+    try:
+        selected = parse_fields(fields, RESULT_FIELDS)
+        check_quality(quality)
+        extra_styles = parse_styles(styles or "")
+    except ValueError as e:
+        return bad_request_response(e)
 
     # 檢查 Ollama
     ollama_status = check_ollama_status()
@@ -710,54 +1338,435 @@ async def process_audio(
             "error": "Ollama 服務未啟動，請執行: ollama serve"
         })
 
-    # 儲存上傳檔案
-    file_id = str(uuid.uuid4())[:8]
-    file_ext = Path(file.filename).suffix
-    file_path = UPLOAD_DIR / f"{file_id}{file_ext}"
+    try:
+        upload = await save_upload(file)
+        job = submit_job(upload, style, regenerate, quality, progressive, draft_summary, extra_styles)
+    except QueueFullError as e:
+        return queue_full_response(e)
+    except UploadTooLargeError as e:
+        return upload_too_large_response(e)
+    except Exception as e:
+        return JSONResponse({
+            "success": False,
+            "error": str(e)
+        })
 
     try:
-        content = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(content)
+        if progressive:
+            while job.draft is None and not job.future.done():
+                await asyncio.sleep(EVENT_POLL_INTERVAL)
+            if job.draft is not None and not job.finished:
+                # 之後用戶端斷線也不取消任務，完整結果仍會產生
+                return JSONResponse({
+                    "success": True,
+                    "draft": True,
+                    "job_id": job.id,
+                    **render_result(job.draft, selected)
+                }, headers={"Location": f"/jobs/{job.id}"})
+        await asyncio.wrap_future(job.future)
+    except asyncio.CancelledError:
+        # 用戶端中斷連線時一併取消任務（任務本身已被取消則照常回應）
+        if not job.future.cancelled():
+            scheduler.cancel(job.id)
+            raise
+    except Exception:
+        pass
+
+    if job.state != COMPLETED:
+        return JSONResponse({
+            "success": False,
+            "error": job.error or "任務已取消"
+        })
 
-        # 語音轉文字 (使用執行緒池避免阻塞)
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(executor, transcribe, str(file_path))
-        transcript = result["text"]
-        language = result.get("language", "unknown")
+    return JSONResponse({"success": True, **render_result(job.result, selected)})
 
-        if not transcript.strip():
-            return JSONResponse({
-                "success": False,
-                "error": "轉錄結果為空，請確認音檔內容"
-            })
 
-        # 生成摘要 (使用執行緒池避免阻塞)
-        summarize_fn = partial(summarize, transcript, style=style)
-        summary = await loop.run_in_executor(executor, summarize_fn)
+@app.post("/jobs")
+async def create_job(
+    file: UploadFile = File(...),
+    style: str = Form("meeting"),
+    regenerate: bool = Form(False),
+    quality: str = Form(AUTO),
+    progressive: bool = Form(False),
+    draft_summary: bool = Form(False),
+    styles: Optional[str] = Form(None)
+):
+    """建立非同步處理任務，立即回傳任務 ID"""
+    try:
+        check_quality(quality)
+        extra_styles = parse_styles(styles or "")
+    except ValueError as e:
+        return bad_request_response(e)
 
+    ollama_status = check_ollama_status()
+    if not ollama_status["available"]:
         return JSONResponse({
-            "success": True,
-            "transcript": transcript,
-            "transcript_with_timestamps": result.get("timestamped_text", ""),
-            "summary": summary,
-            "language": language
-        })
+            "success": False,
+            "error": "Ollama 服務未啟動，請執行: ollama serve"
+        }, status_code=503)
 
-    except Exception as e:
+    try:
+        upload = await save_upload(file)
+        job = submit_job(upload, style, regenerate, quality, progressive, draft_summary, extra_styles)
+    except QueueFullError as e:
+        return queue_full_response(e)
+    except UploadTooLargeError as e:
+        return upload_too_large_response(e)
+
+    return JSONResponse(
+        {"success": True, **render_job(job)},
+        status_code=202,
+        headers={"Location": f"/jobs/{job.id}"}
+    )
+
+
+@app.post("/batch")
+async def create_batch_job(
+    files: List[UploadFile] = File(...),
+    style: str = Form("meeting"),
+    regenerate: bool = Form(False)
+):
+    """建立批次處理任務：可上傳多個音檔或 zip/tar 壓縮檔，立即回傳任務 ID"""
+
+    ollama_status = check_ollama_status()
+    if not ollama_status["available"]:
         return JSONResponse({
             "success": False,
-            "error": str(e)
-        })
-    finally:
-        # 清理暫存檔案
-        if file_path.exists():
-            file_path.unlink()
+            "error": "Ollama 服務未啟動，請執行: ollama serve"
+        }, status_code=503)
+
+    batch_dir = UPLOAD_DIR / f"batch-{str(uuid.uuid4())[:8]}"
+    (batch_dir / "files").mkdir(parents=True)
+    try:
+        names = []
+        uploads = []
+        for file in files:
+            # 只保留檔名，避免上傳名稱中的路徑跳出批次目錄
+            name = Path(file.filename or "").name
+            if not name or name in names:
+                name = f"{len(names)}-{name or 'upload'}"
+            uploads.append(await save_upload(file, batch_dir / "files" / name))
+            names.append(name)
+            # 未帶 Content-Length 的請求不會被中介層攔下，在此累計實際寫入的大小
+            if sum(upload.size for upload in uploads) > MAX_BATCH_UPLOAD_BYTES:
+                raise batch_too_large_error()
+        key = batch_key([(name, upload.sha256) for name, upload in zip(names, uploads)])
+        job = scheduler.submit(
+            run_batch_job,
+            batch_dir,
+            key,
+            style,
+            regenerate,
+            finalizer=lambda: shutil.rmtree(batch_dir, ignore_errors=True),
+            info={"batch": True, "files": names, "style": style, "batch_key": key}
+        )
+    except QueueFullError as e:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        return queue_full_response(e)
+    except UploadTooLargeError as e:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        return upload_too_large_response(e)
+    except BaseException:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        raise
+
+    return JSONResponse(
+        {"success": True, **render_job(job)},
+        status_code=202,
+        headers={"Location": f"/jobs/{job.id}"}
+    )
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    fields: Optional[str] = Query(None, description="以逗號分隔的結果欄位"),
+    segments_offset: int = Query(0, ge=0),
+    segments_limit: Optional[int] = Query(None, ge=1)
+):
+    """查詢任務狀態與結果"""
+    try:
+        selected = parse_fields(fields, RESULT_FIELDS)
+    except ValueError as e:
+        return bad_request_response(e)
+    job = scheduler.get(job_id)
+    if job is None:
+        return JSONResponse({
+            "success": False,
+            "error": "找不到任務"
+        }, status_code=404)
+    data = {"success": True, **render_job(job, selected, segments_offset, segments_limit)}
+    if not job.finished:
+        data["eta"] = scheduler.eta(job_id)
+    return data
+
+
+@app.get("/jobs/{job_id}/eta")
+async def job_eta(job_id: str):
+    """估算任務的開始與完成時間"""
+    job = scheduler.get(job_id)
+    eta = scheduler.eta(job_id) if job is not None else None
+    if eta is None:
+        return JSONResponse({
+            "success": False,
+            "error": "找不到任務"
+        }, status_code=404)
+    return {"success": True, "state": job.state, **eta}
+
+
+@app.get("/eta")
+async def estimate_upload(
+    duration: float = Query(..., gt=0, description="音訊長度（秒）"),
+    model: str = Query(DEFAULT_MODEL),
+    quality: str = Query(AUTO, description="轉錄品質：auto 或模型分級名稱"),
+    progressive: bool = Query(False, description="是否先以快速模型產生草稿")
+):
+    """估算現在上傳一個指定長度的音檔，需要排隊與處理的時間，以及會使用的 STT 模型分級"""
+    wait_seconds = scheduler.estimate_wait()
+    try:
+        stt = choose_tier(duration, quality, wait_seconds)
+    except ValueError as e:
+        return bad_request_response(e)
+    draft = draft_tier(stt) if progressive else None
+    processing = estimate_processing(duration, model, stt["model"], draft and draft["model"])
+    return {
+        "success": True,
+        "stt": {key: stt[key] for key in ("tier", "backend", "model", "reason")},
+        "draft_stt": draft,
+        "wait_seconds": wait_seconds,
+        **processing,
+        "finish_seconds": wait_seconds + processing["total_seconds"],
+        "queue": scheduler.stats()
+    }
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(
+    job_id: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description="completed 事件中結果的欄位")
+):
+    """以 Server-Sent Events 串流任務的處理階段事件，任務結束後關閉"""
+    try:
+        selected = parse_fields(fields, RESULT_FIELDS)
+    except ValueError as e:
+        return bad_request_response(e)
+    job = scheduler.get(job_id)
+    if job is None:
+        return JSONResponse({
+            "success": False,
+            "error": "找不到任務"
+        }, status_code=404)
+
+    # 斷線重連時從上次收到的事件之後繼續
+    last_event_id = request.headers.get("last-event-id", "")
+    start = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+
+    async def stream():
+        index = start
+        idle = 0.0
+        while True:
+            events = job.events[index:]
+            for event in events:
+                if "result" in event:
+                    event = {**event, "result": render_result(event["result"], selected)}
+                yield sse_event(event["type"], event, event["seq"])
+            index += len(events)
+
+            if job.finished and index >= len(job.events):
+                break
+            if await request.is_disconnected():
+                break
+
+            idle = 0.0 if events else idle + EVENT_POLL_INTERVAL
+            if idle >= EVENT_KEEPALIVE_INTERVAL:
+                idle = 0.0
+                yield ": keepalive\n\n"
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def store_disabled_response() -> JSONResponse:
+    return JSONResponse({
+        "success": False,
+        "error": "會議紀錄資料庫未啟用（MEETING_STORE_ENABLED=0）"
+    }, status_code=503)
+
+
+@app.get("/search")
+async def search_meetings(
+    q: str = Query(..., min_length=1, description="搜尋詞，多個詞以空白分隔"),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """跨會議全文搜尋逐字稿與摘要，回傳命中的會議與分段時間（毫秒）"""
+    if not STORE_ENABLED:
+        return store_disabled_response()
+    results = await asyncio.to_thread(meeting_store.search, q, limit)
+    return {"success": True, "query": q, "results": results}
+
+
+@app.get("/meetings")
+async def list_meetings(
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """列出已保存的會議（由新到舊）"""
+    if not STORE_ENABLED:
+        return store_disabled_response()
+    meetings = await asyncio.to_thread(meeting_store.list_meetings, limit, offset)
+    return {"success": True, "meetings": meetings}
+
+
+@app.get("/meetings/{meeting_id}")
+async def get_meeting(
+    meeting_id: str,
+    fields: Optional[str] = Query(None, description="以逗號分隔的欄位"),
+    segments_offset: int = Query(0, ge=0),
+    segments_limit: Optional[int] = Query(None, ge=1)
+):
+    """取得會議的逐字稿、分段與摘要；分段以列式陣列回傳，可分頁"""
+    if not STORE_ENABLED:
+        return store_disabled_response()
+    try:
+        selected = parse_fields(fields, MEETING_FIELDS) or MEETING_FIELDS
+    except ValueError as e:
+        return bad_request_response(e)
+    meeting = await asyncio.to_thread(
+        meeting_store.get_meeting,
+        meeting_id,
+        segments_offset=segments_offset,
+        segments_limit=segments_limit,
+        with_segments="segments" in selected
+    )
+    if meeting is None:
+        return JSONResponse({
+            "success": False,
+            "error": "找不到會議"
+        }, status_code=404)
+    data = {name: meeting[name] for name in selected if name != "segments"}
+    if "segments" in selected:
+        segments = meeting["segments"]
+        data["segments"] = {
+            "total": meeting["segment_count"],
+            "offset": segments_offset,
+            "start_ms": [segment["start_ms"] for segment in segments],
+            "end_ms": [segment["end_ms"] for segment in segments],
+            "text": [segment["text"] for segment in segments],
+        }
+    return {"success": True, **data}
+
+
+@app.get("/meetings/{meeting_id}/export")
+async def export_meeting_file(
+    meeting_id: str,
+    content: str = Query("transcript", description="transcript 或 summary"),
+    format: str = Query("pdf", description="pdf、docx、srt、vtt、txt 或 md")
+):
+    """匯出逐字稿或摘要，同一會議與格式只產生一次，之後直接由快取檔案串流"""
+    if not STORE_ENABLED:
+        return store_disabled_response()
+    if format not in CONTENT_FORMATS.get(content, ()):
+        return JSONResponse({
+            "success": False,
+            "error": f"不支援的匯出格式: {content}.{format}"
+        }, status_code=400)
+    meeting = await asyncio.to_thread(meeting_store.get_meeting, meeting_id)
+    if meeting is None:
+        return JSONResponse({
+            "success": False,
+            "error": "找不到會議"
+        }, status_code=404)
+    path = await asyncio.to_thread(export_meeting, meeting, content, format)
+    return FileResponse(
+        path,
+        media_type=MEDIA_TYPES[format],
+        filename=download_name(meeting, content, format)
+    )
+
+
+@app.delete("/meetings/{meeting_id}")
+async def delete_meeting(meeting_id: str):
+    """刪除已保存的會議"""
+    if not STORE_ENABLED:
+        return store_disabled_response()
+    if not await asyncio.to_thread(meeting_store.delete_meeting, meeting_id):
+        return JSONResponse({
+            "success": False,
+            "error": "找不到會議"
+        }, status_code=404)
+    return {"success": True}
+
+
+@app.post("/summarize")
+async def summarize_text(
+    text: str = Form(...),
+    styles: str = Form("meeting"),
+    model: str = Form(DEFAULT_MODEL),
+    regenerate: bool = Form(False)
+):
+    """對文字一次生成多種風格的摘要（以逗號分隔），各風格共用相同的 prompt 開頭"""
+    try:
+        names = parse_styles(styles)
+    except ValueError as e:
+        return bad_request_response(e)
+    summaries = await asyncio.to_thread(
+        summarize_styles, text, names, model=model, use_cache=not regenerate
+    )
+    return {"success": True, "summaries": summaries}
+
+
+@app.post("/summarize/stream")
+async def summarize_text_stream(
+    text: str = Form(...),
+    style: str = Form("meeting"),
+    model: str = Form(DEFAULT_MODEL),
+    regenerate: bool = Form(False),
+    styles: Optional[str] = Form(None)
+):
+    """
+    對文字生成摘要，以 Server-Sent Events 逐 token 回傳
+
+    指定 styles（以逗號分隔）時依序生成多種風格，取代 style，每個事件帶有 style 欄位
+    """
+    try:
+        names = parse_styles(styles) if styles else None
+    except ValueError as e:
+        return bad_request_response(e)
+
+    def stream():
+        # 同步產生器由 Starlette 放在執行緒池中逐項讀取，不會阻塞事件迴圈
+        if names:
+            events = summarize_styles_stream(text, names, model=model, use_cache=not regenerate)
+        else:
+            events = summarize_stream(text, model=model, style=style, use_cache=not regenerate)
+        for event in events:
+            yield sse_event(event["type"], event)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """取消任務"""
+    job = scheduler.cancel(job_id)
+    if job is None:
+        return JSONResponse({
+            "success": False,
+            "error": "找不到任務"
+        }, status_code=404)
+    if job.finished and job.state != CANCELLED:
+        return JSONResponse({
+            "success": False,
+            "error": "任務已結束，無法取消",
+            **render_job(job)
+        }, status_code=409)
+    return {"success": True, **render_job(job)}
 
 
 if __name__ == "__main__":
     print("檢查 Ollama 服務狀態...")
-    status = check_ollama_status()
+    status = check_ollama_status(refresh=True)
 
     if not status["available"]:
         print("⚠️  警告: Ollama 服務未啟動")
@@ -0,0 +1,117 @@
+"""
+音訊解碼模組
+每個音檔只以 ffmpeg 解碼一次為 16 kHz 單聲道 float32 PCM 檔，
+之後以記憶體映射提供零複製的陣列視圖給 STT 後端與分段轉錄的各個工作行程
+"""
+
+import os
+import time
+import uuid
+import wave
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from metrics import DECODE_SECONDS
+from stt_backends import SAMPLE_RATE
+
+
+# 解碼後 PCM 檔的暫存目錄（每小時音訊約 230 MB）
+PCM_DIR = Path(os.environ.get("MEETING_PCM_DIR", tempfile.gettempdir()))
+
+PCM_DTYPE = np.float32
+
+# 無法從標頭取得長度時假設的位元率（bytes/秒，約 128 kbps）
+ASSUMED_BYTES_PER_SECOND = 16000
+
+
+def open_pcm(pcm_path: str, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+    """
+    以記憶體映射開啟 PCM 檔並回傳 [start, end) 取樣範圍的視圖
+
+    使用 copy-on-write 模式：讀取不複製資料，後端若就地修改陣列只影響自己的行程。
+    """
+    if os.path.getsize(pcm_path) == 0:
+        return np.zeros(0, dtype=PCM_DTYPE)
+    return np.memmap(pcm_path, dtype=PCM_DTYPE, mode="c")[start:end]
+
+
+class DecodedAudio:
+    """
+    已解碼的音訊
+
+    samples 為整段音訊的記憶體映射陣列；多個行程以 path 與取樣範圍
+    各自映射同一個檔案，由作業系統共用分頁快取，不會各自佔用一份記憶體。
+    """
+
+    def __init__(self, path: Path, owned: bool = True):
+        self.path = Path(path)
+        self.owned = owned
+        self.samples = open_pcm(str(self.path))
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / SAMPLE_RATE
+
+    def close(self):
+        # 先釋放映射再刪除檔案
+        self.samples = None
+        if self.owned:
+            self.path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "DecodedAudio":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def decode_audio(audio_path: str, directory: Path = None) -> DecodedAudio:
+    """
+    以 ffmpeg 將音檔解碼為 16 kHz 單聲道 float32 PCM 檔
+
+    ffmpeg 直接寫入磁碟，解碼過程不會把整段音訊讀入記憶體。
+    回傳的 DecodedAudio 關閉時刪除 PCM 檔。
+
+    Raises:
+        RuntimeError: ffmpeg 解碼失敗
+    """
+    directory = Path(directory or PCM_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    pcm_path = directory / f"meeting-{uuid.uuid4().hex[:12]}.f32"
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-y", "-i", audio_path,
+        "-f", "f32le", "-ac", "1", "-acodec", "pcm_f32le", "-ar", str(SAMPLE_RATE), str(pcm_path)
+    ]
+    start = time.perf_counter()
+    try:
+        subprocess.run(cmd, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        pcm_path.unlink(missing_ok=True)
+        raise RuntimeError(f"音檔解碼失敗: {e.stderr.decode(errors='ignore').strip()}") from e
+    except BaseException:
+        pcm_path.unlink(missing_ok=True)
+        raise
+    DECODE_SECONDS.observe(time.perf_counter() - start)
+    return DecodedAudio(pcm_path)
+
+
+def guess_duration(audio_path: str) -> float:
+    """
+    不解碼地粗估音檔長度（秒），用於排隊時的預估；WAV 讀取標頭，其他格式以檔案大小推算
+    """
+    try:
+        with wave.open(audio_path, "rb") as f:
+            return f.getnframes() / float(f.getframerate())
+    except (wave.Error, EOFError, OSError):
+        pass
+    try:
+        return os.path.getsize(audio_path) / ASSUMED_BYTES_PER_SECOND
+    except OSError:
+        return 0.0
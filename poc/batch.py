@@ -0,0 +1,351 @@
+"""
+批次處理模組
+一次處理整個目錄或壓縮檔中的錄音：轉錄與摘要分屬兩組工作者同時進行，
+每個檔案輸出逐字稿、分段與摘要，重跑時略過已完成的檔案
+"""
+
+import os
+import json
+import tarfile
+import zipfile
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+
+from cache import hash_file
+from stt import transcribe
+from summarizer import summarize_stream, DEFAULT_MODEL
+
+
+# 同時轉錄的檔案數；長音檔另外會由分段行程池平行轉錄
+BATCH_STT_WORKERS = int(os.environ.get("MEETING_BATCH_STT_WORKERS", "2"))
+# 同時生成摘要的檔案數
+BATCH_LLM_WORKERS = int(os.environ.get("MEETING_BATCH_LLM_WORKERS", "2"))
+# 一次批次中所有壓縮檔解壓後的總大小與項目數上限，在解壓前依壓縮檔目錄檢查，避免壓縮炸彈塞滿磁碟
+BATCH_MAX_EXTRACT_MB = int(os.environ.get("MEETING_BATCH_MAX_EXTRACT_MB", "8192"))
+BATCH_MAX_EXTRACT_BYTES = BATCH_MAX_EXTRACT_MB * 1024 * 1024
+BATCH_MAX_ENTRIES = int(os.environ.get("MEETING_BATCH_MAX_ENTRIES", "10000"))
+
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".flac", ".ogg", ".webm", ".mp4", ".aac"}
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+# 批次狀態
+COMPLETED = "completed"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+def is_archive(path: Path) -> bool:
+    return path.name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def find_recordings(directory: Path) -> List[Path]:
+    """遞迴列出目錄中的音檔（略過隱藏檔），依路徑排序"""
+    return sorted(
+        path for path in Path(directory).rglob("*")
+        if path.is_file()
+        and path.suffix.lower() in AUDIO_EXTENSIONS
+        and not any(part.startswith(".") for part in path.relative_to(directory).parts)
+    )
+
+
+def extract_archive(
+    archive: Path,
+    destination: Path,
+    max_bytes: int = BATCH_MAX_EXTRACT_BYTES,
+    max_entries: int = BATCH_MAX_ENTRIES
+) -> tuple:
+    """
+    解壓縮 zip / tar 壓縮檔
+
+    解壓前先依壓縮檔目錄加總解壓後的大小與項目數，超過上限時不解壓任何內容。
+
+    Returns:
+        tuple: (解壓後的位元組數, 項目數)
+
+    Raises:
+        ValueError: 壓縮檔內含指向目的目錄之外的路徑，或解壓後的大小、項目數超過上限
+    """
+    destination = Path(destination).resolve()
+
+    def check(names: List[str], total: int):
+        for name in names:
+            if not (destination / name).resolve().is_relative_to(destination):
+                raise ValueError(f"壓縮檔內含不安全的路徑: {name}")
+        if len(names) > max_entries:
+            raise ValueError(f"壓縮檔 {archive.name} 的項目過多（上限 {max_entries}）")
+        if total > max_bytes:
+            raise ValueError(
+                f"壓縮檔 {archive.name} 解壓後過大（上限 {max_bytes // (1024 * 1024)} MB）"
+            )
+
+    if archive.name.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive) as f:
+            names = [info.filename for info in f.infolist()]
+            total = sum(info.file_size for info in f.infolist())
+            check(names, total)
+            f.extractall(destination)
+    else:
+        with tarfile.open(archive) as f:
+            members = [m for m in f.getmembers() if m.isfile() or m.isdir()]
+            names = [m.name for m in members]
+            total = sum(m.size for m in members if m.isfile())
+            check(names, total)
+            f.extractall(destination, members=members)
+    return total, len(names)
+
+
+def collect_recordings(source: Path, workdir: Path) -> List[tuple]:
+    """
+    展開輸入來源為待處理的音檔清單
+
+    Args:
+        source: 目錄、壓縮檔或單一音檔；目錄中的壓縮檔也會展開
+        workdir: 解壓縮用的暫存目錄
+
+    Returns:
+        list: [(音檔路徑, 相對名稱), ...]，相對名稱決定輸出檔的位置
+
+    Raises:
+        ValueError: 壓縮檔路徑不安全，或所有壓縮檔解壓後合計超過
+            BATCH_MAX_EXTRACT_BYTES / BATCH_MAX_ENTRIES
+    """
+    source = Path(source)
+    if source.is_file():
+        if not is_archive(source):
+            return [(source, Path(source.name))]
+        root = Path(workdir) / source.name
+        extract_archive(source, root)
+        return [(path, path.relative_to(root)) for path in find_recordings(root)]
+
+    recordings = [(path, path.relative_to(source)) for path in find_recordings(source)]
+    # 上限由所有壓縮檔共用，避免以多個小壓縮檔繞過
+    max_bytes, max_entries = BATCH_MAX_EXTRACT_BYTES, BATCH_MAX_ENTRIES
+    for archive in sorted(p for p in source.rglob("*") if p.is_file() and is_archive(p)):
+        relative = archive.relative_to(source)
+        root = Path(workdir) / relative
+        size, entries = extract_archive(archive, root, max_bytes, max_entries)
+        max_bytes -= size
+        max_entries -= entries
+        recordings.extend((path, relative / path.relative_to(root)) for path in find_recordings(root))
+    return recordings
+
+
+def output_paths(output_dir: Path, relative: Path) -> dict:
+    """單一音檔的輸出檔路徑；<名稱>.json 最後寫入，作為完成標記"""
+    base = Path(output_dir) / relative
+    return {
+        "transcript": base.with_name(base.name + ".transcript.txt"),
+        "segments": base.with_name(base.name + ".segments.json"),
+        "summary": base.with_name(base.name + ".summary.md"),
+        "result": base.with_name(base.name + ".json"),
+    }
+
+
+def _write_text(path: Path, text: str):
+    # 先寫暫存檔再改名，中斷時不會留下寫一半的輸出
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # 暫存檔名不固定，同一輸出目錄上同時執行的批次不會互相覆寫暫存檔
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_completed(paths: dict, audio_sha256: str, style: str, model: str) -> Optional[dict]:
+    """讀取先前的完成標記；音檔內容、風格與模型都相同才視為已完成"""
+    try:
+        with open(paths["result"], "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (previous.get("audio_sha256"), previous.get("style"), previous.get("model")) != (
+        audio_sha256, style, model
+    ):
+        return None
+    return previous
+
+
+def run_batch(
+    recordings: List[tuple],
+    output_dir: Path,
+    style: str = "meeting",
+    model: str = DEFAULT_MODEL,
+    stt_workers: int = BATCH_STT_WORKERS,
+    llm_workers: int = BATCH_LLM_WORKERS,
+    force: bool = False,
+    on_event: Callable[..., None] = None,
+    check_cancelled: Callable[[], None] = None
+) -> List[dict]:
+    """
+    批次轉錄並摘要
+
+    轉錄與摘要各有一組工作者：一個檔案轉錄完成後立即排入摘要，
+    同時下一個檔案繼續轉錄，讓 CPU (Whisper) 與 Ollama 同時保持忙碌。
+
+    Args:
+        recordings: collect_recordings() 的結果
+        output_dir: 輸出目錄，保留輸入的相對路徑
+        style: 摘要風格
+        model: Ollama 模型名稱
+        stt_workers: 同時轉錄的檔案數
+        llm_workers: 同時生成摘要的檔案數
+        force: 忽略已完成的輸出與快取，全部重新處理
+        on_event: 進度回呼，呼叫方式為 on_event(事件類型, **資料)；
+            事件為 file_skipped、file_transcribed、file_completed、file_failed
+        check_cancelled: 在各檔案之間呼叫，丟出例外即中止批次
+
+    Returns:
+        list: 依輸入順序，每個檔案一筆 {"file", "status", "outputs", "language", "summary", "error"}
+    """
+    def emit(event_type: str, **data):
+        if on_event is not None:
+            on_event(event_type, **data)
+
+    def cancelled():
+        if check_cancelled is not None:
+            check_cancelled()
+
+    results = [None] * len(recordings)
+
+    def record(index: int, status: str, paths: dict, **data):
+        results[index] = {
+            "file": str(recordings[index][1]),
+            "status": status,
+            "outputs": {key: str(path) for key, path in paths.items()} if status != FAILED else None,
+            **data
+        }
+        emit(f"file_{status}", index=index, file=results[index]["file"], **data)
+
+    def transcribe_stage(index: int):
+        cancelled()
+        path, relative = recordings[index]
+        audio_sha256 = hash_file(str(path))
+        paths = output_paths(output_dir, relative)
+        if not force:
+            previous = load_completed(paths, audio_sha256, style, model)
+            if previous is not None:
+                return paths, audio_sha256, previous, None
+        result = transcribe(str(path), audio_hash=audio_sha256, use_cache=not force)
+        if not result["text"].strip():
+            raise ValueError("轉錄結果為空，請確認音檔內容")
+        _write_text(paths["transcript"], result["segments"].timestamped_text())
+        _write_text(paths["segments"], json.dumps(result["segments"].to_list(), ensure_ascii=False, indent=2))
+        emit("file_transcribed", index=index, file=str(relative), language=result.get("language"))
+        return paths, audio_sha256, None, result
+
+    def summarize_stage(index: int, paths: dict, audio_sha256: str, result: dict):
+        cancelled()
+        summary = None
+        stats = None
+        for event in summarize_stream(
+            result["text"],
+            model=model,
+            style=style,
+            use_cache=not force,
+            segments=result.get("segments")
+        ):
+            if event["type"] == "done":
+                summary, stats = event["summary"], event["stats"]
+            elif event["type"] == "error":
+                raise RuntimeError(event["error"])
+        _write_text(paths["summary"], summary)
+        metadata = {
+            "source": str(recordings[index][1]),
+            "audio_sha256": audio_sha256,
+            "style": style,
+            "model": model,
+            "language": result.get("language", "unknown"),
+            "segments": len(result.get("segments", [])),
+            "summary_stats": stats,
+        }
+        _write_text(paths["result"], json.dumps(metadata, ensure_ascii=False, indent=2))
+        return summary, metadata
+
+    stt_pool = ThreadPoolExecutor(max_workers=max(1, stt_workers), thread_name_prefix="batch-stt")
+    llm_pool = ThreadPoolExecutor(max_workers=max(1, llm_workers), thread_name_prefix="batch-llm")
+    try:
+        transcribing = {stt_pool.submit(transcribe_stage, i): i for i in range(len(recordings))}
+        summarizing = {}
+        for future in as_completed(transcribing):
+            cancelled()
+            index = transcribing[future]
+            try:
+                paths, audio_sha256, previous, result = future.result()
+            except Exception as e:
+                record(index, FAILED, {}, error=str(e))
+                continue
+            if previous is not None:
+                summary = paths["summary"].read_text(encoding="utf-8") if paths["summary"].exists() else ""
+                record(index, SKIPPED, paths, language=previous.get("language"), summary=summary)
+                continue
+            summarizing[llm_pool.submit(summarize_stage, index, paths, audio_sha256, result)] = index
+
+        for future in as_completed(summarizing):
+            cancelled()
+            index = summarizing[future]
+            try:
+                summary, metadata = future.result()
+            except Exception as e:
+                record(index, FAILED, {}, error=str(e))
+                continue
+            record(index, COMPLETED, output_paths(output_dir, recordings[index][1]),
+                   language=metadata["language"], summary=summary)
+    finally:
+        # 中止時不再開始新的檔案，並等待進行中的檔案完成當前階段，
+        # 呼叫端在返回後清除輸入檔時不會有轉錄仍在讀取
+        stt_pool.shutdown(wait=True, cancel_futures=True)
+        llm_pool.shutdown(wait=True, cancel_futures=True)
+
+    return results
+
+
+def process_directory(source: Path, output_dir: Path, **kwargs) -> List[dict]:
+    """展開 source（目錄、壓縮檔或音檔）後執行 run_batch()，參數同 run_batch()"""
+    with tempfile.TemporaryDirectory(prefix="meeting-batch-") as workdir:
+        return run_batch(collect_recordings(source, Path(workdir)), output_dir, **kwargs)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="批次轉錄並摘要目錄或壓縮檔中的錄音")
+    parser.add_argument("source", help="錄音目錄、zip/tar 壓縮檔或單一音檔")
+    parser.add_argument("-o", "--output", default="results", help="輸出目錄（預設 results）")
+    parser.add_argument("--style", default="meeting", choices=["meeting", "article", "brief"])
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Ollama 模型名稱")
+    parser.add_argument("--stt-workers", type=int, default=BATCH_STT_WORKERS, help="同時轉錄的檔案數")
+    parser.add_argument("--llm-workers", type=int, default=BATCH_LLM_WORKERS, help="同時摘要的檔案數")
+    parser.add_argument("--force", action="store_true", help="忽略已完成的輸出，全部重新處理")
+    args = parser.parse_args()
+
+    labels = {
+        "file_transcribed": "轉錄完成",
+        "file_completed": "完成",
+        "file_skipped": "已完成，略過",
+        "file_failed": "失敗",
+    }
+
+    def report(event_type: str, **data):
+        line = f"[{labels[event_type]}] {data['file']}"
+        if event_type == "file_failed":
+            line += f": {data['error']}"
+        print(line, flush=True)
+
+    results = process_directory(
+        Path(args.source),
+        Path(args.output),
+        style=args.style,
+        model=args.model,
+        stt_workers=args.stt_workers,
+        llm_workers=args.llm_workers,
+        force=args.force,
+        on_event=report
+    )
+    counts = {status: sum(r["status"] == status for r in results) for status in (COMPLETED, SKIPPED, FAILED)}
+    print(f"\n共 {len(results)} 個檔案：完成 {counts[COMPLETED]}、略過 {counts[SKIPPED]}、失敗 {counts[FAILED]}")
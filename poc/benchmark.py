@@ -0,0 +1,337 @@
+"""
+端對端效能量測
+以 fake STT 後端與模擬 Ollama 服務啟動完整的 Web 服務，產生合成音檔，
+依設定的並行數呼叫 /process 或 /jobs，輸出延遲百分位數、吞吐量與記憶體高峰，
+並寫入 JSON 供不同版本之間比較
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import wave
+import socket
+import platform
+import resource
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+import numpy as np
+
+from fake_ollama import FakeOllama
+from stt_backends import SAMPLE_RATE
+
+
+def make_wav(path: Path, seconds: float, seed: int = 0):
+    """產生可重現的合成音檔：低音量雜訊疊加隨種子變化的正弦波（16 kHz 單聲道）"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    signal = 0.2 * np.sin(2 * np.pi * (220 + seed % 200) * t) + 0.02 * rng.standard_normal(len(t))
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((np.clip(signal, -1, 1) * 32767).astype(np.int16).tobytes())
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """最近序位法百分位數"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    """執行中行程的記憶體高峰 (VmHWM)，僅 Linux 可用"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def children_peak_rss_mb() -> float:
+    """已結束子行程中最大的記憶體高峰（Linux 以 KB、macOS 以 bytes 回報）"""
+    value = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return value / (1024 * 1024) if sys.platform == "darwin" else value / 1024
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_server(port: int, env: dict, log_path: Path) -> subprocess.Popen:
+    """以子行程啟動 Web 服務並等待健康檢查通過"""
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)],
+            cwd=Path(__file__).parent,
+            env={**os.environ, **env},
+            stdout=log,
+            stderr=subprocess.STDOUT
+        )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"服務啟動失敗，請查看 {log_path}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health/ready", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"服務啟動逾時，請查看 {log_path}")
+
+
+def run_request(client: httpx.Client, mode: str, path: Path, style: str) -> dict:
+    """
+    送出一個請求並等待處理完成
+
+    佇列已滿 (429) 時依 Retry-After 重試，重試等待的時間計入延遲。
+
+    Returns:
+        dict: latency（秒）、success、rejected（被 429 拒絕的次數）、error
+    """
+    start = time.perf_counter()
+    rejected = 0
+    while True:
+        with open(path, "rb") as f:
+            response = client.post(
+                f"/{mode}", files={"file": (path.name, f, "audio/wav")}, data={"style": style}
+            )
+        if response.status_code != 429:
+            break
+        rejected += 1
+        time.sleep(float(response.headers.get("Retry-After", "1")))
+
+    data = response.json()
+    if mode == "jobs" and data.get("success"):
+        job_id = data["id"]
+        while data.get("state") not in ("completed", "failed", "cancelled"):
+            time.sleep(0.1)
+            data = client.get(f"/jobs/{job_id}").json()
+        success = data["state"] == "completed"
+        error = data.get("error")
+    else:
+        success = bool(data.get("success"))
+        error = data.get("error")
+
+    return {
+        "latency": time.perf_counter() - start,
+        "success": success,
+        "rejected": rejected,
+        "error": None if success else error,
+    }
+
+
+def summarize_latencies(latencies: List[float]) -> dict:
+    return {
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": sum(latencies) / len(latencies) if latencies else None,
+        "max": max(latencies) if latencies else None,
+    }
+
+
+def run_benchmark(
+    requests: int = 20,
+    concurrency: int = 4,
+    durations: List[float] = (60,),
+    mode: str = "process",
+    style: str = "meeting",
+    stt_rtf: float = 0.05,
+    llm_latency: float = 0.5,
+    tokens_per_second: float = 30.0,
+    output_tokens: int = 200,
+    max_workers: int = 2,
+    use_cache: bool = False,
+    server_env: Optional[dict] = None
+) -> dict:
+    """
+    執行一次效能量測
+
+    Args:
+        requests: 請求總數
+        concurrency: 同時送出的請求數
+        durations: 合成音檔長度（秒），依序循環使用
+        mode: process（同步等待結果）或 jobs（建立任務後輪詢）
+        style: 摘要風格
+        stt_rtf: fake STT 的即時率
+        llm_latency / tokens_per_second / output_tokens: 模擬 Ollama 的首個 token 延遲、生成速度與輸出長度
+        max_workers: 服務同時執行的任務數 (MEETING_MAX_WORKERS)
+        use_cache: 是否啟用逐字稿與摘要快取（預設關閉，每個請求都完整處理）
+        server_env: 額外傳給服務的環境變數
+
+    Returns:
+        dict: 設定、延遲統計、吞吐量、記憶體高峰與錯誤摘要
+    """
+    fake = FakeOllama(llm_latency, tokens_per_second, output_tokens)
+    ollama_url = fake.start()
+
+    with tempfile.TemporaryDirectory(prefix="meeting-bench-") as workdir:
+        workdir = Path(workdir)
+        files = []
+        for i in range(requests):
+            duration = durations[i % len(durations)]
+            path = workdir / f"audio-{i:03d}-{int(duration)}s.wav"
+            make_wav(path, duration, seed=i)
+            files.append((path, duration))
+
+        port = free_port()
+        env = {
+            "MEETING_STT_BACKEND": "fake",
+            "MEETING_FAKE_STT_RTF": str(stt_rtf),
+            "MEETING_OLLAMA_URL": ollama_url,
+            "MEETING_OLLAMA_URLS": ollama_url,
+            "MEETING_CACHE_DIR": str(workdir / "cache"),
+            "MEETING_PCM_DIR": str(workdir / "pcm"),
+            # 合成音檔的會議紀錄不寫入正式資料庫
+            "MEETING_DB_PATH": str(workdir / "meetings.db"),
+            "MEETING_MAX_WORKERS": str(max_workers),
+            "MEETING_MAX_QUEUE_DEPTH": str(max(8, requests)),
+            **({} if use_cache else {"MEETING_TRANSCRIPT_CACHE_MB": "0", "MEETING_SUMMARY_CACHE_MB": "0"}),
+            **(server_env or {}),
+        }
+        server = start_server(port, env, workdir / "server.log")
+        server_rss = None
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    results = list(pool.map(lambda item: run_request(client, mode, item[0], style), files))
+                wall_time = time.perf_counter() - start
+                metrics_text = client.get("/metrics").text
+            server_rss = peak_rss_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+            fake.stop()
+        if server_rss is None:
+            server_rss = children_peak_rss_mb()
+
+    successes = [r for r in results if r["success"]]
+    audio_seconds = sum(duration for r, (_, duration) in zip(results, files) if r["success"])
+    errors = {}
+    for r in results:
+        if not r["success"]:
+            errors[r["error"] or "unknown"] = errors.get(r["error"] or "unknown", 0) + 1
+
+    return {
+        "config": {
+            "requests": requests,
+            "concurrency": concurrency,
+            "durations": list(durations),
+            "mode": mode,
+            "style": style,
+            "stt_rtf": stt_rtf,
+            "llm_latency": llm_latency,
+            "tokens_per_second": tokens_per_second,
+            "output_tokens": output_tokens,
+            "max_workers": max_workers,
+            "use_cache": use_cache,
+        },
+        "environment": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.time(),
+        },
+        "wall_time": wall_time,
+        "completed": len(successes),
+        "failed": len(results) - len(successes),
+        "rejected": sum(r["rejected"] for r in results),
+        "throughput": {
+            "requests_per_second": len(successes) / wall_time if wall_time else None,
+            "audio_seconds_per_second": audio_seconds / wall_time if wall_time else None,
+        },
+        "latency": summarize_latencies([r["latency"] for r in successes]),
+        "peak_rss_mb": server_rss,
+        "fake_ollama_requests": fake.requests,
+        "errors": errors,
+        "server_metrics": {
+            line.split(" ")[0]: float(line.split(" ")[1])
+            for line in metrics_text.splitlines()
+            if line.startswith(("meeting_job_seconds_sum", "meeting_job_seconds_count",
+                                "meeting_job_wait_seconds_sum", "meeting_job_wait_seconds_count"))
+        },
+    }
+
+
+def print_report(report: dict):
+    latency = report["latency"]
+    throughput = report["throughput"]
+
+    def fmt(value, unit="s"):
+        return "-" if value is None else f"{value:.2f}{unit}"
+
+    print(f"完成 {report['completed']} / 失敗 {report['failed']} / 429 重試 {report['rejected']}，"
+          f"總耗時 {fmt(report['wall_time'])}")
+    print(f"延遲  p50 {fmt(latency['p50'])}  p95 {fmt(latency['p95'])}  p99 {fmt(latency['p99'])}  "
+          f"平均 {fmt(latency['mean'])}  最大 {fmt(latency['max'])}")
+    print(f"吞吐量  {fmt(throughput['requests_per_second'], ' req/s')}  "
+          f"{fmt(throughput['audio_seconds_per_second'], ' 音訊秒/s')}")
+    print(f"服務記憶體高峰  {fmt(report['peak_rss_mb'], ' MB')}")
+    for error, count in report["errors"].items():
+        print(f"錯誤 ({count} 次): {error}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="以 fake STT 與模擬 Ollama 量測服務的端對端效能")
+    parser.add_argument("-n", "--requests", type=int, default=20, help="請求總數")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="同時送出的請求數")
+    parser.add_argument("--durations", default="60,300,900", help="合成音檔長度（秒），以逗號分隔並循環使用")
+    parser.add_argument("--mode", choices=["process", "jobs"], default="process", help="呼叫的端點")
+    parser.add_argument("--style", default="meeting", choices=["meeting", "article", "brief"])
+    parser.add_argument("--stt-rtf", type=float, default=0.05, help="fake STT 的即時率")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="模擬 Ollama 的首個 token 延遲（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=30.0, help="模擬 Ollama 的生成速度")
+    parser.add_argument("--output-tokens", type=int, default=200, help="模擬 Ollama 每次回應的 token 數")
+    parser.add_argument("--max-workers", type=int, default=2, help="服務同時執行的任務數")
+    parser.add_argument("--cache", action="store_true", help="啟用逐字稿與摘要快取")
+    parser.add_argument("-o", "--output", help="結果 JSON 的輸出路徑")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        requests=args.requests,
+        concurrency=args.concurrency,
+        durations=[float(d) for d in args.durations.split(",") if d.strip()],
+        mode=args.mode,
+        style=args.style,
+        stt_rtf=args.stt_rtf,
+        llm_latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        max_workers=args.max_workers,
+        use_cache=args.cache
+    )
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"結果已寫入 {args.output}")
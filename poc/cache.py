@@ -0,0 +1,160 @@
+"""
+磁碟快取模組
+以內容雜湊為鍵的 JSON 快取，依總大小做 LRU 淘汰，可選擇設定存活時間
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+CACHE_DIR = Path(os.environ.get("MEETING_CACHE_DIR", "cache"))
+# 超過此秒數的暫存檔視為寫入中途當機留下的殘檔（其他行程可能正在寫入較新的暫存檔）
+STALE_TMP_SECONDS = 3600
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """以固定大小區塊計算檔案的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    持久化 JSON 快取
+
+    每個項目存成一個檔案，檔案的修改時間即為最後使用時間；
+    總大小超過 max_bytes 時從最久未使用的項目開始刪除。
+    設定 ttl（秒）時，寫入超過 ttl 的項目視為過期。
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, ttl: Optional[float] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # 檔名 -> (大小, 最後使用時間, 寫入時間)
+        self._index: Dict[str, tuple] = {}
+        self._remove_stale_tmp()
+        for entry in self.directory.glob("*.json"):
+            stat = entry.stat()
+            # 寫入時間在讀取時以檔案內容為準，這裡先以修改時間代替
+            self._index[entry.name] = (stat.st_size, stat.st_mtime, stat.st_mtime)
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """將多個鍵值組合成固定長度的雜湊"""
+        raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        name = f"{key}.json"
+        path = self.directory / name
+        with self._lock:
+            if name not in self._index:
+                self.misses += 1
+                return None
+            if self._expired(self._index[name][2]):
+                self._remove(name)
+                self.misses += 1
+                return None
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                created, value = entry["created_at"], entry["value"]
+            except (OSError, ValueError, KeyError, TypeError):
+                # 檔案被外部刪除或損毀，視為未命中
+                self._remove(name)
+                self.misses += 1
+                return None
+            if self._expired(created):
+                self._remove(name)
+                self.misses += 1
+                return None
+
+            now = time.time()
+            os.utime(path, (now, now))
+            self._index[name] = (self._index[name][0], now, created)
+            self.hits += 1
+            return value
+
+    def contains(self, key: str) -> bool:
+        """是否有未過期的項目；不讀取內容，也不計入命中統計與最後使用時間"""
+        with self._lock:
+            entry = self._index.get(f"{key}.json")
+            return entry is not None and not self._expired(entry[2])
+
+    def set(self, key: str, value: Any):
+        name = f"{key}.json"
+        now = time.time()
+        entry = {"created_at": now, "value": value}
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+
+        # 先寫入暫存檔再改名，避免其他讀取者看到寫一半的檔案
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self.directory / name)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        with self._lock:
+            self._index[name] = (len(data), now, now)
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": sum(entry[0] for entry in self._index.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _remove_stale_tmp(self):
+        """刪除寫入中途當機留下的暫存檔；暫存檔不計入總大小，不清除會一直累積"""
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for entry in self.directory.glob("*.tmp"):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    entry.unlink()
+            except OSError:
+                pass
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _remove(self, name: str):
+        # 呼叫端須持有 self._lock
+        self._index.pop(name, None)
+        (self.directory / name).unlink(missing_ok=True)
+
+    def _evict(self):
+        # 呼叫端須持有 self._lock
+        total = sum(entry[0] for entry in self._index.values())
+        if total <= self.max_bytes:
+            return
+        for name, (size, _, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            self._remove(name)
+            total -= size
+            if total <= self.max_bytes:
+                break
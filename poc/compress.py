@@ -0,0 +1,118 @@
+"""
+回應壓縮
+依 Accept-Encoding 以 zstd（需安裝 zstandard）或 gzip 壓縮 JSON、HTML 等文字回應；
+串流回應（SSE、檔案下載）不壓縮，避免緩衝整個串流
+"""
+
+import os
+import gzip
+from typing import Optional
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# 小於此大小（位元組）的回應不壓縮
+COMPRESS_MIN_BYTES = int(os.environ.get("MEETING_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("MEETING_GZIP_LEVEL", "6"))
+ZSTD_LEVEL = int(os.environ.get("MEETING_ZSTD_LEVEL", "3"))
+# 超過此大小的回應改在執行緒中壓縮，不阻塞事件迴圈
+THREAD_COMPRESS_BYTES = 256 * 1024
+
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/plain", "text/markdown", "text/vtt")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """依 Accept-Encoding 選擇編碼，zstd 優先；不接受壓縮時回傳 None"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    if zstandard is not None and "zstd" in accepted:
+        return "zstd"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """
+    ASGI 中介層：整個內容一次送出的回應才壓縮，分多次送出的串流回應與檔案下載
+    （帶有 Content-Disposition 標頭）原樣轉送
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if message["type"] != "http.response.start" and message["type"] != "http.response.body":
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # 等到第一個內容區塊才能判斷是否為串流，先保留標頭
+                start_message = message
+                return
+            if passthrough:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            content_type = headers.get("content-type", "").split(";")[0].strip()
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or "content-disposition" in headers
+                or content_type not in COMPRESSIBLE_TYPES
+                or len(body) < self.minimum_size
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            if len(body) > THREAD_COMPRESS_BYTES:
+                body = await anyio.to_thread.run_sync(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
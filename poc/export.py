@@ -0,0 +1,431 @@
+"""
+匯出模組
+由會議紀錄資料庫的分段與摘要產生 PDF、DOCX、SRT、WebVTT 等檔案，只使用標準函式庫，
+離線環境也能匯出；產生的檔案依內容快取於磁碟
+"""
+
+import io
+import os
+import re
+import time
+import zlib
+import zipfile
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+from cache import CACHE_DIR, DiskCache
+
+
+EXPORT_DIR = CACHE_DIR / "exports"
+EXPORT_CACHE_MB = int(os.environ.get("MEETING_EXPORT_CACHE_MB", "256"))
+# 匯出格式有變動時調整，讓舊的快取檔案失效
+EXPORT_VERSION = 1
+
+MEDIA_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "srt": "application/x-subrip",
+    "vtt": "text/vtt; charset=utf-8",
+    "txt": "text/plain; charset=utf-8",
+    "md": "text/markdown; charset=utf-8",
+}
+# 各內容可匯出的格式（字幕格式需要分段時間，只適用逐字稿）
+CONTENT_FORMATS = {
+    "transcript": ("pdf", "docx", "srt", "vtt", "txt"),
+    "summary": ("pdf", "docx", "md"),
+}
+CONTENT_TITLES = {"transcript": "會議逐字稿", "summary": "會議摘要"}
+
+# 文件段落：(樣式, 文字)，樣式為 title、subtitle、heading、body
+Block = Tuple[str, str]
+
+
+def format_timestamp(ms: int, separator: str = ",") -> str:
+    """毫秒轉為 HH:MM:SS,mmm（SRT）或 HH:MM:SS.mmm（WebVTT）"""
+    seconds, ms = divmod(max(0, int(ms)), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{ms:03d}"
+
+
+def to_srt(segments: List[dict]) -> str:
+    cues = []
+    for index, segment in enumerate(segments, 1):
+        cues.append(
+            f"{index}\n{format_timestamp(segment['start_ms'])} --> "
+            f"{format_timestamp(segment['end_ms'])}\n{segment['text']}\n"
+        )
+    return "\n".join(cues)
+
+
+def to_vtt(segments: List[dict]) -> str:
+    cues = ["WEBVTT\n"]
+    for segment in segments:
+        cues.append(
+            f"{format_timestamp(segment['start_ms'], '.')} --> "
+            f"{format_timestamp(segment['end_ms'], '.')}\n{segment['text']}\n"
+        )
+    return "\n".join(cues)
+
+
+def transcript_lines(segments: List[dict]) -> List[str]:
+    """帶時間軸的逐字稿，每個分段一行"""
+    return [f"[{format_timestamp(s['start_ms'])[:8]}] {s['text']}" for s in segments]
+
+
+def document_blocks(meeting: dict, content: str) -> List[Block]:
+    """將會議內容整理為文件段落（摘要的 Markdown 標題、清單與粗體轉為純文字排版）"""
+    subtitle = time.strftime("%Y-%m-%d %H:%M", time.localtime(meeting["created_at"]))
+    if meeting.get("filename"):
+        subtitle = f"{meeting['filename']} | {subtitle}"
+    blocks = [("title", CONTENT_TITLES[content]), ("subtitle", subtitle)]
+
+    if content == "transcript":
+        blocks.extend(("body", line) for line in transcript_lines(meeting["segments"]))
+        return blocks
+
+    for line in (meeting.get("summary") or "").splitlines():
+        line = line.replace("**", "").rstrip()
+        heading = re.match(r"#{1,6}\s+(.*)", line)
+        if heading:
+            blocks.append(("heading", heading.group(1)))
+        elif re.match(r"\s*[-*]\s+", line):
+            blocks.append(("body", re.sub(r"^(\s*)[-*]\s+", r"\1‧ ", line)))
+        else:
+            blocks.append(("body", line))
+    return blocks
+
+
+# DOCX：只包含必要的三個部分，字型與大小直接設定在文字上，不需要樣式表
+
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" ContentType='
+    '"application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="word/document.xml" Type='
+    '"http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+# 樣式 -> (字級，半點為單位, 粗體, 顏色, 對齊)
+_DOCX_STYLES = {
+    "title": (36, True, "333333", "center"),
+    "subtitle": (18, False, "666666", "center"),
+    "heading": (28, True, "333333", None),
+    "body": (21, False, "333333", None),
+}
+
+
+def to_docx(blocks: List[Block]) -> bytes:
+    paragraphs = []
+    for style, text in blocks:
+        size, bold, color, align = _DOCX_STYLES[style]
+        ppr = f'<w:pPr><w:jc w:val="{align}"/></w:pPr>' if align else ""
+        rpr = (
+            '<w:rPr><w:rFonts w:ascii="Arial" w:hAnsi="Arial" w:eastAsia="Microsoft JhengHei"/>'
+            f'{"<w:b/>" if bold else ""}<w:color w:val="{color}"/>'
+            f'<w:sz w:val="{size}"/><w:szCs w:val="{size}"/></w:rPr>'
+        )
+        run = f'<w:r>{rpr}<w:t xml:space="preserve">{escape(text)}</w:t></w:r>' if text else ""
+        paragraphs.append(f"<w:p>{ppr}{run}</w:p>")
+
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{"".join(paragraphs)}'
+        '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+        '<w:pgMar w:top="1134" w:right="1134" w:bottom="1134" w:left="1134"'
+        ' w:header="567" w:footer="567" w:gutter="0"/></w:sectPr>'
+        '</w:body></w:document>'
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+        docx.writestr("_rels/.rels", _DOCX_RELS)
+        docx.writestr("word/document.xml", document)
+    return buffer.getvalue()
+
+
+# PDF：使用 PDF 閱讀器內建的繁體中文 CID 字型 MSung-Light（不嵌入字型，檔案很小），
+# 文字以 UCS-2 編碼輸出並附 ToUnicode 對照，可選取與搜尋
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4（點）
+PAGE_MARGIN = 56
+# 樣式 -> (字級, 行高, 顏色灰階)
+_PDF_STYLES = {
+    "title": (18, 30, 0.2),
+    "subtitle": (9, 22, 0.4),
+    "heading": (13, 24, 0.2),
+    "body": (10.5, 17, 0.2),
+}
+_PDF_FOOTER_SIZE = 8
+
+
+def _char_width(char: str) -> int:
+    """字寬（1/1000 字級）：ASCII 為半形，其餘為全形"""
+    return 500 if " " <= char <= "~" else 1000
+
+
+def _wrap(text: str, size: float, width: float) -> List[str]:
+    """依字寬折行；英數字詞盡量不從中間斷開"""
+    limit = width * 1000 / size
+    lines, line, used = [], "", 0
+    for token in re.findall(r"[!-~]+|.", text):
+        token_width = sum(_char_width(c) for c in token)
+        if used + token_width > limit and line:
+            lines.append(line.rstrip())
+            line, used = "", 0
+            if token == " ":
+                continue
+        while token_width > limit:
+            # 單一英數字詞超過一行時強制斷開
+            cut, cut_width = 0, 0
+            while cut_width + _char_width(token[cut]) <= limit:
+                cut_width += _char_width(token[cut])
+                cut += 1
+            lines.append(token[:cut])
+            token, token_width = token[cut:], token_width - cut_width
+        line += token
+        used += token_width
+    lines.append(line.rstrip())
+    return lines
+
+
+def _pdf_text(text: str) -> str:
+    """UCS-2 十六進位字串；BMP 以外的字元（如 emoji）無法以 UCS-2 表示，以問號代替"""
+    text = "".join(c if ord(c) <= 0xFFFF else "?" for c in text)
+    return "<" + text.encode("utf-16-be").hex().upper() + ">"
+
+
+def _to_unicode_cmap() -> bytes:
+    ranges = [f"<{high:02X}00> <{high:02X}FF> <{high:02X}00>" for high in range(256)]
+    sections = []
+    for start in range(0, len(ranges), 100):
+        chunk = ranges[start:start + 100]
+        sections.append(f"{len(chunk)} beginbfrange\n" + "\n".join(chunk) + "\nendbfrange")
+    return (
+        "/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n"
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+        "/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n"
+        "1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n"
+        + "\n".join(sections)
+        + "\nendcmap\nCMapName currentdict /CMap defineresource pop\nend\nend\n"
+    ).encode("ascii")
+
+
+def _layout(blocks: List[Block]) -> List[List[tuple]]:
+    """排版為多頁，每頁為 [(樣式, y 座標, 文字)]"""
+    width = PAGE_WIDTH - 2 * PAGE_MARGIN
+    bottom = PAGE_MARGIN + 20  # 保留頁碼空間
+    pages, page = [], []
+    y = PAGE_HEIGHT - PAGE_MARGIN
+    for style, text in blocks:
+        size, leading, _ = _PDF_STYLES[style]
+        for line in _wrap(text, size, width):
+            if y - leading < bottom:
+                pages.append(page)
+                page, y = [], PAGE_HEIGHT - PAGE_MARGIN
+            y -= leading
+            page.append((style, y, line))
+    pages.append(page)
+    return pages
+
+
+def to_pdf(blocks: List[Block]) -> bytes:
+    pages = _layout(blocks)
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    def stream(data: bytes, extra: str = "") -> bytes:
+        data = zlib.compress(data)
+        return (
+            f"<< /Length {len(data)} /Filter /FlateDecode{extra} >>\nstream\n".encode("ascii")
+            + data + b"\nendstream"
+        )
+
+    catalog = add(b"")
+    pages_id = add(b"")
+    descriptor = add(
+        b"<< /Type /FontDescriptor /FontName /MSung-Light /Flags 6 /FontBBox [-160 -249 1015 888]"
+        b" /ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 880 /StemV 93 >>"
+    )
+    cid_font = add(
+        f"<< /Type /Font /Subtype /CIDFontType0 /BaseFont /MSung-Light"
+        f" /CIDSystemInfo << /Registry (Adobe) /Ordering (CNS1) /Supplement 4 >>"
+        f" /FontDescriptor {descriptor} 0 R /DW 1000 /W [1 95 500] >>".encode("ascii")
+    )
+    to_unicode = add(stream(_to_unicode_cmap()))
+    font = add(
+        f"<< /Type /Font /Subtype /Type0 /BaseFont /MSung-Light /Encoding /UniCNS-UCS2-H"
+        f" /DescendantFonts [{cid_font} 0 R] /ToUnicode {to_unicode} 0 R >>".encode("ascii")
+    )
+
+    page_ids = []
+    for number, lines in enumerate(pages, 1):
+        ops = []
+        for style, y, text in lines:
+            size, _, gray = _PDF_STYLES[style]
+            x = PAGE_MARGIN
+            if style in ("title", "subtitle"):
+                x = (PAGE_WIDTH - sum(_char_width(c) for c in text) * size / 1000) / 2
+            ops.append(f"BT /F1 {size} Tf {gray} g {x:.2f} {y:.2f} Td {_pdf_text(text)} Tj ET")
+        footer = f"第 {number} / {len(pages)} 頁"
+        x = (PAGE_WIDTH - sum(_char_width(c) for c in footer) * _PDF_FOOTER_SIZE / 1000) / 2
+        ops.append(f"BT /F1 {_PDF_FOOTER_SIZE} Tf 0.6 g {x:.2f} {PAGE_MARGIN - 20} Td {_pdf_text(footer)} Tj ET")
+        content = add(stream("\n".join(ops).encode("ascii")))
+        page_ids.append(add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}]"
+            f" /Resources << /Font << /F1 {font} 0 R >> >> /Contents {content} 0 R >>".encode("ascii")
+        ))
+
+    objects[catalog - 1] = f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode("ascii")
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("ascii")
+    title = next((text for style, text in blocks if style == "title"), "")
+    info = add(
+        f"<< /Title <FEFF{_pdf_text(title)[1:-1]}> /Producer (Meeting Assistant) >>".encode("ascii")
+    )
+
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(output.tell())
+        output.write(f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n")
+    xref = output.tell()
+    output.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii"))
+    for offset in offsets:
+        output.write(f"{offset:010d} 00000 n \n".encode("ascii"))
+    output.write(
+        f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R /Info {info} 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n".encode("ascii")
+    )
+    return output.getvalue()
+
+
+def render_export(meeting: dict, content: str, fmt: str) -> bytes:
+    """
+    產生匯出檔案內容
+
+    Args:
+        meeting: MeetingStore.get_meeting 的結果
+        content: transcript 或 summary
+        fmt: CONTENT_FORMATS 中該內容支援的格式
+    """
+    if fmt == "srt":
+        return to_srt(meeting["segments"]).encode("utf-8")
+    if fmt == "vtt":
+        return to_vtt(meeting["segments"]).encode("utf-8")
+    if fmt == "txt":
+        return ("\n".join(transcript_lines(meeting["segments"])) + "\n").encode("utf-8")
+    if fmt == "md":
+        return (meeting.get("summary") or "").encode("utf-8")
+    blocks = document_blocks(meeting, content)
+    return to_pdf(blocks) if fmt == "pdf" else to_docx(blocks)
+
+
+class ExportCache:
+    """
+    匯出檔案的磁碟快取
+
+    與 DiskCache 相同以檔案修改時間作為最後使用時間，總大小超過 max_bytes 時淘汰最久未使用的檔案；
+    內容為二進位檔，回傳路徑供回應直接串流。
+    """
+
+    def __init__(self, directory: Path = EXPORT_DIR, max_bytes: int = EXPORT_CACHE_MB * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # 檔名 -> (大小, 最後使用時間)
+        self._index: Dict[str, tuple] = {
+            entry.name: (entry.stat().st_size, entry.stat().st_mtime)
+            for entry in self.directory.iterdir() if not entry.name.endswith(".tmp")
+        }
+
+    @staticmethod
+    def make_key(meeting: dict, content: str, fmt: str) -> str:
+        # 會議重新處理時 created_at 會更新，舊的匯出檔案自然不再使用
+        return DiskCache.make_key(meeting["id"], meeting["created_at"], content, fmt, EXPORT_VERSION)
+
+    def get_or_create(self, key: str, fmt: str, build: Callable[[], bytes]) -> Path:
+        name = f"{key}.{fmt}"
+        path = self.directory / name
+        with self._lock:
+            if name in self._index and path.exists():
+                now = time.time()
+                os.utime(path, (now, now))
+                self._index[name] = (self._index[name][0], now)
+                self.hits += 1
+                return path
+            self.misses += 1
+
+        data = build()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        with self._lock:
+            self._index[name] = (len(data), time.time())
+            self._evict(keep=name)
+        return path
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": sum(entry[0] for entry in self._index.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _evict(self, keep: str):
+        # 呼叫端須持有 self._lock；剛寫入、即將回傳的檔案不淘汰
+        total = sum(entry[0] for entry in self._index.values())
+        for name, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            self._index.pop(name, None)
+            (self.directory / name).unlink(missing_ok=True)
+            total -= size
+
+
+export_cache = ExportCache()
+
+
+def export_meeting(meeting: dict, content: str, fmt: str) -> Path:
+    """取得匯出檔案路徑，未快取時產生"""
+    return export_cache.get_or_create(
+        ExportCache.make_key(meeting, content, fmt), fmt,
+        lambda: render_export(meeting, content, fmt)
+    )
+
+
+def download_name(meeting: dict, content: str, fmt: str) -> str:
+    stem = Path(meeting.get("filename") or meeting["id"]).stem
+    label = "逐字稿" if content == "transcript" else "摘要"
+    return f"{stem}-{label}.{fmt}"
+
@@ -0,0 +1,232 @@
+"""
+模擬 Ollama 服務
+實作 /api/tags、/api/ps 與 /api/generate（含 NDJSON 串流），以可設定的延遲與生成速度回應固定內容，
+並依 keep_alive 模擬模型的載入與卸載，供效能量測與無 GPU 環境的開發測試使用
+"""
+
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+
+DEFAULT_MODELS = ["qwen3:32b-q4_K_M"]
+# 請求未指定 keep_alive 時的卸載時間（與 Ollama 相同為 5 分鐘）
+DEFAULT_KEEP_ALIVE = 300.0
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value) -> float:
+    """將 keep_alive（秒數或 30s、10m、1h）轉為秒數，負值表示不卸載"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip()
+    for unit in ("ms", "s", "m", "h"):
+        if value.endswith(unit):
+            return float(value[:-len(unit)]) * _DURATION_UNITS[unit]
+    return float(value)
+
+
+class FakeOllama:
+    """
+    模擬 Ollama 服務
+
+    Args:
+        first_token_latency: 收到請求到第一個 token 的秒數（模擬 prompt 處理）
+        tokens_per_second: 生成速度，0 表示不等待
+        output_tokens: 每次回應的 token 數
+        models: /api/tags 回報的模型
+        load_seconds: 模型未載入時，請求需額外等待的載入秒數
+    """
+
+    def __init__(
+        self,
+        first_token_latency: float = 0.5,
+        tokens_per_second: float = 30.0,
+        output_tokens: int = 200,
+        models: Optional[List[str]] = None,
+        load_seconds: float = 0.0
+    ):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.models = models or DEFAULT_MODELS
+        self.load_seconds = load_seconds
+        self.requests = 0
+        # 已載入的模型 → 卸載時間（time.time()，None 表示不卸載）
+        self._loaded = {}
+        # 與 Ollama 相同：沿用同一模型上一個 prompt 的共同開頭，prompt_eval_count 只計算其餘部分
+        self._last_prompts = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def tokens(self) -> List[str]:
+        """固定的回應內容，符合摘要格式"""
+        head = ["## 摘要\n", "本次", "會議", "討論", "測試", "內容", "。\n\n", "## 重點\n"]
+        body = [f"- 第 {i} 項重點\n" for i in range(1, max(1, self.output_tokens - len(head)) + 1)]
+        return (head + body)[:self.output_tokens]
+
+    def load(self, model: str, keep_alive) -> float:
+        """模擬載入模型並更新卸載時間，回傳載入耗時（已載入時為 0）"""
+        with self._lock:
+            expires = self._loaded.get(model, 0)
+            loaded = model in self._loaded and (expires is None or expires > time.time())
+        if not loaded:
+            time.sleep(self.load_seconds)
+        seconds = parse_duration(DEFAULT_KEEP_ALIVE if keep_alive is None else keep_alive)
+        with self._lock:
+            if seconds == 0:
+                self._loaded.pop(model, None)
+            else:
+                self._loaded[model] = None if seconds < 0 else time.time() + seconds
+        return 0.0 if loaded else self.load_seconds
+
+    def loaded(self) -> dict:
+        """目前已載入的模型 → 卸載時間"""
+        now = time.time()
+        with self._lock:
+            return {
+                model: expires for model, expires in self._loaded.items()
+                if expires is None or expires > now
+            }
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """在背景執行緒啟動服務，回傳 base URL（port 為 0 時自動選擇可用埠）"""
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _handler(fake: FakeOllama):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, data: dict, status: int = 200):
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _write_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path == "/api/ps":
+                self._send_json({"models": [
+                    {
+                        "name": name,
+                        "expires_at": time.strftime(
+                            "%Y-%m-%dT%H:%M:%SZ", time.gmtime(expires if expires is not None else 2 ** 31 - 1)
+                        ),
+                    }
+                    for name, expires in fake.loaded().items()
+                ]})
+                return
+            if self.path != "/api/tags":
+                self._send_json({"error": "not found"}, 404)
+                return
+            self._send_json({"models": [{"name": name} for name in fake.models]})
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self._send_json({"error": "not found"}, 404)
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            load_seconds = fake.load(request.get("model", ""), request.get("keep_alive"))
+            if "prompt" not in request:
+                # 不帶 prompt 的請求只載入模型
+                self._send_json({
+                    "model": request.get("model", ""),
+                    "response": "",
+                    "done": True,
+                    "done_reason": "load",
+                    "load_duration": int(load_seconds * 1e9),
+                })
+                return
+            prompt = request.get("prompt", "")
+            with fake._lock:
+                fake.requests += 1
+                previous = fake._last_prompts.get(request.get("model"), "")
+                fake._last_prompts[request.get("model")] = prompt
+            cached = len(os.path.commonprefix([previous, prompt]))
+
+            start = time.perf_counter()
+            tokens = fake.tokens()
+            delay = 1.0 / fake.tokens_per_second if fake.tokens_per_second > 0 else 0.0
+            time.sleep(fake.first_token_latency)
+            prompt_done = time.perf_counter()
+            final = {
+                "model": request.get("model", ""),
+                "done": True,
+                "prompt_eval_count": len(prompt) - cached,
+                "eval_count": len(tokens),
+                "load_duration": int(load_seconds * 1e9),
+            }
+
+            if not request.get("stream", True):
+                time.sleep(delay * len(tokens))
+                end = time.perf_counter()
+                self._send_json({
+                    **final,
+                    "response": "".join(tokens),
+                    "prompt_eval_duration": int((prompt_done - start) * 1e9),
+                    "eval_duration": int((end - prompt_done) * 1e9),
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                time.sleep(delay)
+                line = {"model": final["model"], "response": token, "done": False}
+                self._write_chunk(json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n")
+            end = time.perf_counter()
+            final.update({
+                "response": "",
+                "prompt_eval_duration": int((prompt_done - start) * 1e9),
+                "eval_duration": int((end - prompt_done) * 1e9),
+            })
+            self._write_chunk(json.dumps(final).encode("utf-8") + b"\n")
+            self._write_chunk(b"")
+
+    return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="啟動模擬 Ollama 服務")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.5, help="首個 token 延遲（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=30.0, help="生成速度")
+    parser.add_argument("--output-tokens", type=int, default=200, help="每次回應的 token 數")
+    parser.add_argument("--load-seconds", type=float, default=0.0, help="模型未載入時的載入秒數")
+    args = parser.parse_args()
+
+    fake = FakeOllama(
+        args.latency, args.tokens_per_second, args.output_tokens, load_seconds=args.load_seconds
+    )
+    url = fake.start(args.host, args.port)
+    print(f"模擬 Ollama 服務: {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fake.stop()
@@ -0,0 +1,356 @@
+"""
+任務排程模組
+以有界佇列管理背景處理任務，避免長時間請求佔住連線與無限堆積
+"""
+
+import os
+import math
+import time
+import uuid
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import JOB_SECONDS, JOB_WAIT_SECONDS, record_error
+
+
+# 同時執行的任務數（Whisper 很吃資源，不宜過多）
+MAX_WORKERS = int(os.environ.get("MEETING_MAX_WORKERS", "2"))
+# 等待中任務的上限，超過則拒絕（429）
+MAX_QUEUE_DEPTH = int(os.environ.get("MEETING_MAX_QUEUE_DEPTH", "8"))
+# 已結束任務在記憶體中保留的秒數
+JOB_TTL = int(os.environ.get("MEETING_JOB_TTL", "3600"))
+# 任務沒有預估耗時且尚無歷史資料時使用的單一任務耗時（秒）
+DEFAULT_JOB_SECONDS = 60
+
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class QueueFullError(Exception):
+    """佇列已滿，呼叫端應稍後重試"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"佇列已滿，請於 {retry_after} 秒後重試")
+        self.retry_after = retry_after
+
+
+class JobCancelled(Exception):
+    """任務在執行中被取消"""
+
+
+@dataclass
+class Job:
+    """單一處理任務"""
+
+    id: str
+    created_at: float = field(default_factory=time.time)
+    state: str = PENDING
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    # 兩階段轉錄時，完整結果出來之前先提供的草稿結果
+    draft: Any = None
+    error: Optional[str] = None
+    info: dict = field(default_factory=dict)
+    # 預估的處理耗時（秒，不含排隊），可在處理中依實際資料更新
+    estimated_seconds: Optional[float] = None
+    events: List[dict] = field(default_factory=list, repr=False)
+    future: Optional[Future] = field(default=None, repr=False)
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    finalizer: Optional[Callable[[], None]] = field(default=None, repr=False)
+    _events_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def emit(self, event_type: str, **data):
+        """記錄處理階段事件，供 /jobs/{id}/events 串流給用戶端"""
+        with self._events_lock:
+            self.events.append({
+                "seq": len(self.events),
+                "type": event_type,
+                "time": time.time(),
+                **data
+            })
+
+    def check_cancelled(self):
+        """在各處理階段之間呼叫，若已要求取消則中止任務"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def to_dict(self) -> dict:
+        data = {
+            "id": self.id,
+            "state": self.state,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "info": self.info,
+        }
+        if self.state == COMPLETED:
+            data["result"] = self.result
+        elif self.draft is not None:
+            data["draft"] = self.draft
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class JobScheduler:
+    """
+    有界任務排程器
+
+    最多 max_workers 個任務同時執行，另有 max_queue_depth 個任務可排隊等待；
+    超過上限時 submit() 會丟出 QueueFullError。
+    """
+
+    def __init__(
+        self,
+        max_workers: int = MAX_WORKERS,
+        max_queue_depth: int = MAX_QUEUE_DEPTH,
+        job_ttl: int = JOB_TTL
+    ):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.job_ttl = job_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._durations: List[float] = []
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        finalizer: Optional[Callable[[], None]] = None,
+        info: Optional[dict] = None,
+        estimated_seconds: Optional[float] = None,
+        **kwargs
+    ) -> Job:
+        """
+        提交任務，fn 的第一個參數為 Job 本身
+
+        Args:
+            fn: 任務函式，呼叫方式為 fn(job, *args, **kwargs)
+            finalizer: 任務結束（含取消）時呼叫一次，用於清理暫存檔案
+            info: 任務的描述資訊（檔名、大小等），隨狀態一併回傳
+            estimated_seconds: 預估處理耗時，用於計算此任務與其後任務的等待時間
+
+        Raises:
+            QueueFullError: 等待中的任務已達上限
+        """
+        with self._lock:
+            self._prune()
+            if self.queue_depth >= self.max_queue_depth:
+                raise QueueFullError(self._retry_after())
+
+            job = Job(
+                id=uuid.uuid4().hex[:12],
+                info=info or {},
+                finalizer=finalizer,
+                estimated_seconds=estimated_seconds
+            )
+            self._jobs[job.id] = job
+            wait_seconds, _ = self._schedule()[job.id]
+            job.emit("queued", position=self.queue_depth, wait_seconds=wait_seconds, **job.info)
+            job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        取消任務：等待中的任務直接移除，執行中的任務於下一個階段邊界中止
+
+        Returns:
+            Job: 被取消的任務；找不到時回傳 None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            job.cancel_event.set()
+            if job.state == PENDING and job.future.cancel():
+                self._finish(job, CANCELLED)
+        return job
+
+    @property
+    def queue_depth(self) -> int:
+        """等待中的任務數"""
+        return sum(1 for job in self._jobs.values() if job.state == PENDING)
+
+    @property
+    def in_flight(self) -> int:
+        """執行中的任務數"""
+        return sum(1 for job in self._jobs.values() if job.state == RUNNING)
+
+    def retry_after(self) -> int:
+        """估算佇列讓出空位所需秒數"""
+        with self._lock:
+            return self._retry_after()
+
+    def eta(self, job_id: str) -> Optional[dict]:
+        """
+        估算任務的開始與完成時間
+
+        Returns:
+            dict: position（排隊順位，執行中為 0）、wait_seconds（距開始秒數）、
+                remaining_seconds（距完成秒數）、finish_at（預計完成的 Unix 時間）；
+                找不到任務時回傳 None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.finished:
+                return {
+                    "position": 0,
+                    "wait_seconds": 0.0,
+                    "remaining_seconds": 0.0,
+                    "finish_at": job.finished_at,
+                }
+            wait_seconds, remaining_seconds = self._schedule()[job.id]
+            position = self._pending().index(job) + 1 if job.state == PENDING else 0
+        return {
+            "position": position,
+            "wait_seconds": wait_seconds,
+            "remaining_seconds": remaining_seconds,
+            "finish_at": time.time() + remaining_seconds,
+        }
+
+    def estimate_wait(self) -> float:
+        """估算現在提交的新任務需要排隊的秒數"""
+        with self._lock:
+            free = self._worker_free_times(self._pending())
+        return free[0]
+
+    def expected_seconds(self, job: Job) -> float:
+        """任務的預估處理耗時：優先使用任務本身的預估，其次為近期任務的平均耗時"""
+        if job.estimated_seconds is not None:
+            return job.estimated_seconds
+        recent = self._durations[-20:]
+        return sum(recent) / len(recent) if recent else DEFAULT_JOB_SECONDS
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue_depth": self.max_queue_depth,
+                "queue_depth": self.queue_depth,
+                "in_flight": self.in_flight,
+            }
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, kwargs: dict):
+        with self._lock:
+            if job.cancel_event.is_set():
+                self._finish(job, CANCELLED)
+                return job
+            job.state = RUNNING
+            job.started_at = time.time()
+            job.emit(RUNNING)
+            JOB_WAIT_SECONDS.observe(job.started_at - job.created_at)
+
+        try:
+            result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            with self._lock:
+                self._finish(job, CANCELLED)
+        except Exception as e:
+            record_error("job", e)
+            with self._lock:
+                job.error = str(e)
+                self._finish(job, FAILED)
+        else:
+            with self._lock:
+                job.result = result
+                self._finish(job, COMPLETED)
+                self._durations.append(job.finished_at - job.started_at)
+                del self._durations[:-100]
+        return job
+
+    def _finish(self, job: Job, state: str):
+        # 呼叫端須持有 self._lock
+        job.finished_at = time.time()
+        # 先記錄結束事件再變更狀態，讓事件串流看到 finished 時一定已取得最後一個事件
+        if state == COMPLETED:
+            job.emit(state, result=job.result)
+        elif state == FAILED:
+            job.emit(state, error=job.error)
+        else:
+            job.emit(state)
+        job.state = state
+        if job.started_at is not None:
+            JOB_SECONDS.labels(style=job.info.get("style", ""), state=state).observe(
+                job.finished_at - job.started_at
+            )
+        if job.finalizer is not None:
+            finalizer, job.finalizer = job.finalizer, None
+            try:
+                finalizer()
+            except Exception:
+                pass
+
+    def _pending(self) -> List[Job]:
+        # 呼叫端須持有 self._lock；執行緒池依提交順序取出任務
+        return sorted(
+            (job for job in self._jobs.values() if job.state == PENDING),
+            key=lambda job: job.created_at
+        )
+
+    def _schedule(self) -> Dict[str, tuple]:
+        """
+        模擬工作者依序處理執行中與排隊中的任務（呼叫端須持有 self._lock）
+
+        Returns:
+            dict: {job_id: (距開始秒數, 距完成秒數)}
+        """
+        times = {}
+        self._worker_free_times(self._pending(), times)
+        return times
+
+    def _worker_free_times(self, pending: List[Job], times: Optional[dict] = None) -> List[float]:
+        # 呼叫端須持有 self._lock；回傳處理完 pending 後各工作者空出的時間（由早到晚）
+        now = time.time()
+        free = []
+        for job in self._jobs.values():
+            if job.state == RUNNING:
+                # 已超出預估的任務視為即將完成
+                remaining = max(1.0, self.expected_seconds(job) - (now - job.started_at))
+                free.append(remaining)
+                if times is not None:
+                    times[job.id] = (0.0, remaining)
+        free.extend([0.0] * max(0, self.max_workers - len(free)))
+        heapq.heapify(free)
+        for job in pending:
+            start = heapq.heappop(free)
+            finish = start + self.expected_seconds(job)
+            if times is not None:
+                times[job.id] = (start, finish)
+            heapq.heappush(free, finish)
+        return sorted(free)
+
+    def _retry_after(self) -> int:
+        # 呼叫端須持有 self._lock；佇列已滿時，最早開始執行的排隊任務會讓出一個空位
+        return max(1, math.ceil(self._worker_free_times([])[0]))
+
+    def _prune(self):
+        # 呼叫端須持有 self._lock
+        cutoff = time.time() - self.job_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
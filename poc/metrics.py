@@ -0,0 +1,139 @@
+"""
+Prometheus 指標
+各處理階段的耗時分布、計數與佇列狀態，由 /metrics 端點輸出
+"""
+
+from typing import Callable, Dict, List
+
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+# 會議錄音從數秒到數小時，耗時分布的區間涵蓋到一小時
+DURATION_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+SIZE_BUCKETS = tuple(mb * 1024 * 1024 for mb in (1, 5, 10, 50, 100, 500, 1000, 2000))
+RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200)
+
+UPLOAD_SECONDS = Histogram(
+    "meeting_upload_seconds", "上傳檔案寫入磁碟的耗時", buckets=DURATION_BUCKETS
+)
+UPLOAD_BYTES = Histogram(
+    "meeting_upload_bytes", "上傳檔案大小", buckets=SIZE_BUCKETS
+)
+DECODE_SECONDS = Histogram(
+    "meeting_decode_seconds", "ffmpeg 解碼音檔的耗時", buckets=DURATION_BUCKETS
+)
+TRANSCRIBE_SECONDS = Histogram(
+    "meeting_transcribe_seconds", "語音轉文字耗時（不含解碼，未命中快取）",
+    ["backend", "model", "mode"], buckets=DURATION_BUCKETS
+)
+AUDIO_SECONDS = Counter(
+    "meeting_audio_seconds", "已轉錄的音訊總長度（秒，未命中快取）", ["backend", "model"]
+)
+STT_TIER_CHOICES = Counter(
+    "meeting_stt_tier_choices", "任務使用的 STT 模型分級", ["tier", "reason"]
+)
+OLLAMA_MODEL_LOADS = Counter(
+    "meeting_ollama_model_loads", "預載與保溫送出的 Ollama 模型載入請求數", ["model", "reason"]
+)
+LLM_TTFT_SECONDS = Histogram(
+    "meeting_llm_time_to_first_token_seconds", "LLM 串流生成的首個 token 延遲",
+    ["model"], buckets=LATENCY_BUCKETS
+)
+LLM_GENERATION_SECONDS = Histogram(
+    "meeting_llm_generation_seconds", "單次 LLM 生成的耗時（含 prompt 處理）",
+    ["model"], buckets=DURATION_BUCKETS
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "meeting_llm_tokens_per_second", "LLM 生成速度（token/秒）", ["model"], buckets=RATE_BUCKETS
+)
+SUMMARY_SECONDS = Histogram(
+    "meeting_summary_seconds", "摘要階段耗時（含分段筆記與彙整）",
+    ["model", "style"], buckets=DURATION_BUCKETS
+)
+JOB_SECONDS = Histogram(
+    "meeting_job_seconds", "任務從開始執行到結束的耗時",
+    ["style", "state"], buckets=DURATION_BUCKETS
+)
+JOB_WAIT_SECONDS = Histogram(
+    "meeting_job_wait_seconds", "任務排隊等待的時間", buckets=DURATION_BUCKETS
+)
+ERRORS = Counter(
+    "meeting_errors", "處理錯誤次數", ["stage", "type"]
+)
+
+
+def record_error(stage: str, error: BaseException):
+    ERRORS.labels(stage=stage, type=type(error).__name__).inc()
+
+
+class StatsCollector:
+    """
+    在抓取時讀取各元件既有的統計（快取命中、佇列深度、Ollama 節點狀態），
+    不需要在每個呼叫點重複計數
+    """
+
+    def __init__(self):
+        self.caches: Dict[str, Callable[[], dict]] = {}
+        self.queue: Callable[[], dict] = None
+        self.ollama: Callable[[], dict] = None
+
+    def collect(self) -> List:
+        metrics = []
+
+        if self.caches:
+            requests = CounterMetricFamily(
+                "meeting_cache_requests", "快取查詢次數", labels=["cache", "result"]
+            )
+            size = GaugeMetricFamily("meeting_cache_bytes", "快取目前的總大小", labels=["cache"])
+            entries = GaugeMetricFamily("meeting_cache_entries", "快取項目數", labels=["cache"])
+            for name, stats_fn in self.caches.items():
+                stats = stats_fn()
+                requests.add_metric([name, "hit"], stats["hits"])
+                requests.add_metric([name, "miss"], stats["misses"])
+                size.add_metric([name], stats["bytes"])
+                entries.add_metric([name], stats["entries"])
+            metrics.extend([requests, size, entries])
+
+        if self.queue is not None:
+            stats = self.queue()
+            metrics.append(GaugeMetricFamily("meeting_queue_depth", "排隊中的任務數", value=stats["queue_depth"]))
+            metrics.append(GaugeMetricFamily("meeting_jobs_in_flight", "執行中的任務數", value=stats["in_flight"]))
+            metrics.append(GaugeMetricFamily("meeting_max_workers", "同時執行的任務上限", value=stats["max_workers"]))
+
+        if self.ollama is not None:
+            endpoints = self.ollama().get("endpoints", [])
+            available = GaugeMetricFamily("meeting_ollama_up", "Ollama 節點是否可用", labels=["endpoint"])
+            in_flight = GaugeMetricFamily(
+                "meeting_ollama_in_flight", "送往 Ollama 節點的進行中請求數", labels=["endpoint"]
+            )
+            failures = CounterMetricFamily(
+                "meeting_ollama_failures", "Ollama 節點連線失敗次數", labels=["endpoint"]
+            )
+            loaded = GaugeMetricFamily(
+                "meeting_ollama_model_loaded", "模型是否已載入 Ollama 節點的記憶體", labels=["endpoint", "model"]
+            )
+            cold_starts = CounterMetricFamily(
+                "meeting_ollama_cold_starts", "生成請求遇到模型冷啟動的次數", labels=["endpoint", "model"]
+            )
+            for endpoint in endpoints:
+                available.add_metric([endpoint["url"]], 1 if endpoint["available"] else 0)
+                in_flight.add_metric([endpoint["url"]], endpoint["in_flight"])
+                failures.add_metric([endpoint["url"]], endpoint["failures"])
+                for model in set(endpoint["models"]) | set(endpoint["loaded"]):
+                    loaded.add_metric([endpoint["url"], model], 1 if model in endpoint["loaded"] else 0)
+                for model, count in endpoint["cold_starts"].items():
+                    cold_starts.add_metric([endpoint["url"], model], count)
+            metrics.extend([available, in_flight, failures, loaded, cold_starts])
+
+        return metrics
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def render() -> tuple:
+    """回傳 (Prometheus 文字格式內容, Content-Type)"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
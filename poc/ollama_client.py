@@ -0,0 +1,397 @@
+"""
+Ollama 連線模組
+管理一組 Ollama 節點：共用具連線池的非同步 HTTP client、依負載與已載入模型分派請求、
+連線失敗時自動改送其他節點，並在背景定期檢查各節點狀態
+"""
+
+import os
+import json
+import time
+import queue
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Union
+
+import httpx
+
+
+OLLAMA_URL = os.environ.get("MEETING_OLLAMA_URL", "http://192.168.1.213:11434")
+# 多個節點以逗號分隔，未設定時只使用 MEETING_OLLAMA_URL
+OLLAMA_URLS = [
+    url.strip() for url in os.environ.get("MEETING_OLLAMA_URLS", OLLAMA_URL).split(",") if url.strip()
+]
+# 健康檢查間隔（秒），同時也是被剔除節點重新探測的間隔
+HEALTH_INTERVAL = float(os.environ.get("MEETING_OLLAMA_HEALTH_INTERVAL", "10"))
+# 每個節點的連線池大小（保持連線的最大數量）
+POOL_SIZE = int(os.environ.get("MEETING_OLLAMA_POOL_SIZE", "8"))
+
+# 模型閒置多久後由 Ollama 卸載：單一值套用到所有模型，「模型=時間」指定個別模型，以逗號分隔，
+# 例如 30m,qwen3:32b-q4_K_M=2h；時間格式同 Ollama 的 keep_alive（10m、1h、-1 表示不卸載）
+KEEP_ALIVE = os.environ.get("MEETING_OLLAMA_KEEP_ALIVE", "30m")
+# 回應的 load_duration 超過此秒數視為冷啟動（模型需要重新載入）
+COLD_START_SECONDS = float(os.environ.get("MEETING_OLLAMA_COLD_START_SECONDS", "1.0"))
+
+# 大模型推理需要時間，讀取逾時較長；連線逾時維持短，服務不在時快速失敗
+REQUEST_TIMEOUT = httpx.Timeout(120, connect=5)
+HEALTH_TIMEOUT = httpx.Timeout(5)
+# 32B 模型從磁碟載入可能需要數分鐘
+LOAD_TIMEOUT = httpx.Timeout(600, connect=5)
+
+# 記住最近多少個共用 prompt 開頭各自送往哪個節點
+AFFINITY_SIZE = 256
+
+
+class NoAvailableEndpointError(httpx.ConnectError):
+    """所有 Ollama 節點都無法連線"""
+
+    def __init__(self):
+        super().__init__("沒有可用的 Ollama 節點")
+
+
+def parse_keep_alive(value: str) -> tuple:
+    """
+    解析 MEETING_OLLAMA_KEEP_ALIVE
+
+    Returns:
+        tuple: (預設值, {模型: 值})；純數字轉為秒數，其他原樣交給 Ollama 解析
+    """
+    default = None
+    per_model = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        # 模型名稱含冒號（qwen3:32b），以最後一個等號分隔
+        model, sep, duration = item.rpartition("=")
+        duration = duration.strip()
+        duration = int(duration) if duration.lstrip("-").isdigit() else duration
+        if sep:
+            per_model[model.strip()] = duration
+        else:
+            default = duration
+    return default, per_model
+
+
+_default_keep_alive, _model_keep_alive = parse_keep_alive(KEEP_ALIVE)
+
+
+def keep_alive(model: str) -> Optional[Union[str, int]]:
+    """模型的 keep_alive；None 表示使用 Ollama 伺服器的設定"""
+    return _model_keep_alive.get(model, _default_keep_alive)
+
+
+class OllamaEndpoint:
+    """單一 Ollama 節點的連線與狀態（只在 client 的事件迴圈內存取）"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.available = True  # 尚未檢查前先假設可用，連線失敗時會立即剔除
+        self.models: List[str] = []
+        # 已載入記憶體的模型 → 預計卸載時間（/api/ps 的 expires_at）
+        self.loaded: Dict[str, Optional[str]] = {}
+        # 各模型的冷啟動次數
+        self.cold_starts: Dict[str, int] = {}
+        self.checked_at: Optional[float] = None
+        self.in_flight = 0
+        self.failures = 0
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=POOL_SIZE,
+                    max_keepalive_connections=POOL_SIZE
+                )
+            )
+        return self._client
+
+    def mark_failed(self):
+        self.available = False
+        self.failures += 1
+
+    def record_load(self, model: str, response: dict, request: bool = True) -> float:
+        """
+        依回應的 load_duration 記錄模型已載入，回傳載入秒數
+
+        request 為 True（一般生成請求）且載入超過 COLD_START_SECONDS 時計為一次冷啟動；
+        預載與保溫請求本來就可能觸發載入，不計入
+        """
+        seconds = response.get("load_duration", 0) / 1e9
+        self.loaded.setdefault(model, None)
+        if request and seconds >= COLD_START_SECONDS:
+            self.cold_starts[model] = self.cold_starts.get(model, 0) + 1
+        return seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.base_url,
+            "available": self.available,
+            "models": list(self.models),
+            "loaded": dict(self.loaded),
+            "cold_starts": dict(self.cold_starts),
+            "in_flight": self.in_flight,
+            "failures": self.failures,
+            "checked_at": self.checked_at,
+        }
+
+
+class OllamaClient:
+    """
+    共用的 Ollama client
+
+    httpx.AsyncClient 在專屬的背景事件迴圈上執行：
+    - 非同步呼叫端以 await asyncio.wrap_future(client.run(coro)) 使用
+    - 同步呼叫端（工作執行緒、CLI）以 client.call(coro) 或 iter_sync() 使用
+    兩者共用同一組連線池。
+
+    每個請求送往「已載入該模型、且進行中請求最少」的可用節點；
+    連線失敗的節點會被剔除並改送下一個節點，之後由背景健康檢查探測恢復。
+    帶有 affinity 的請求優先送往上次處理相同 affinity 的節點，讓共用 prompt 開頭的請求
+    沿用該節點已計算的 KV 快取。
+    """
+
+    def __init__(self, base_urls: Optional[List[str]] = None):
+        self.endpoints = [OllamaEndpoint(url) for url in (base_urls or OLLAMA_URLS)]
+        self._affinity: "OrderedDict[str, OllamaEndpoint]" = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.RLock()
+        self._monitor = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="ollama-client", daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro):
+        """在 client 的事件迴圈上排程 coroutine，回傳 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def call(self, coro):
+        """同步執行 coroutine 並等待結果"""
+        return self.run(coro).result()
+
+    def iter_sync(self, agen: AsyncIterator) -> Iterator:
+        """將 async iterator 轉為同步 iterator，供工作執行緒逐項讀取"""
+        items = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put(item)
+            except BaseException as e:
+                items.put(e)
+            finally:
+                items.put(done)
+
+        future = self.run(pump())
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # 呼叫端提前停止讀取時中止串流，釋放連線
+            future.cancel()
+
+    def pick_endpoint(
+        self,
+        model: Optional[str] = None,
+        exclude=(),
+        affinity: Optional[str] = None
+    ) -> OllamaEndpoint:
+        """
+        選擇節點：affinity 對應的節點可用時直接使用；否則優先 model 已在記憶體中的可用節點，
+        其次已安裝 model 的可用節點、任何可用節點，都沒有時才嘗試目前被剔除的節點（可能已恢復）；同一級中選進行中請求最少者
+
+        Raises:
+            NoAvailableEndpointError: exclude 之外已無節點
+        """
+        candidates = [ep for ep in self.endpoints if ep not in exclude]
+        if not candidates:
+            raise NoAvailableEndpointError()
+
+        pinned = self._affinity.get(affinity) if affinity else None
+        if pinned is not None and pinned in candidates and pinned.available:
+            self._affinity.move_to_end(affinity)
+            return pinned
+
+        available = [ep for ep in candidates if ep.available]
+        loaded = [ep for ep in available if model and model in ep.loaded]
+        with_model = [ep for ep in available if model and model in ep.models]
+        tier = loaded or with_model or available or candidates
+        endpoint = min(tier, key=lambda ep: ep.in_flight)
+        if affinity:
+            self._affinity[affinity] = endpoint
+            self._affinity.move_to_end(affinity)
+            while len(self._affinity) > AFFINITY_SIZE:
+                self._affinity.popitem(last=False)
+        return endpoint
+
+    async def generate(
+        self,
+        model: str,
+        prompt: str,
+        options: dict,
+        affinity: Optional[str] = None
+    ) -> dict:
+        """呼叫 /api/generate（非串流），回傳完整回應；連線失敗時改送其他節點"""
+        tried = []
+        while True:
+            endpoint = self.pick_endpoint(model, exclude=tried, affinity=affinity)
+            endpoint.in_flight += 1
+            try:
+                response = await endpoint.http().post("/api/generate", json=self._request(
+                    model, prompt, options, stream=False
+                ))
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                endpoint.mark_failed()
+                tried.append(endpoint)
+                continue
+            finally:
+                endpoint.in_flight -= 1
+            response.raise_for_status()
+            result = response.json()
+            endpoint.record_load(model, result)
+            return result
+
+    async def generate_stream(
+        self,
+        model: str,
+        prompt: str,
+        options: dict,
+        affinity: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """
+        呼叫 /api/generate（串流），逐一產生 NDJSON chunk
+
+        尚未收到任何內容前的連線失敗會改送其他節點；串流開始後的錯誤直接丟出。
+        """
+        tried = []
+        while True:
+            endpoint = self.pick_endpoint(model, exclude=tried, affinity=affinity)
+            endpoint.in_flight += 1
+            started = False
+            try:
+                async with endpoint.http().stream("POST", "/api/generate", json=self._request(
+                    model, prompt, options, stream=True
+                )) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if line:
+                            started = True
+                            chunk = json.loads(line)
+                            if chunk.get("done"):
+                                endpoint.record_load(model, chunk)
+                            yield chunk
+                return
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if started:
+                    raise
+                endpoint.mark_failed()
+                tried.append(endpoint)
+            finally:
+                endpoint.in_flight -= 1
+
+    async def load(self, endpoint: OllamaEndpoint, model: str, options: Optional[dict] = None) -> float:
+        """
+        要求節點載入模型（不帶 prompt 的 /api/generate），已載入時只會延長卸載時間
+
+        Args:
+            options: 影響載入的參數（num_ctx 等），須與之後的生成請求相同，否則 Ollama 會重新載入
+
+        Returns:
+            float: 載入秒數，模型原本已在記憶體中時接近 0
+        """
+        request = {"model": model}
+        if options:
+            request["options"] = options
+        if keep_alive(model) is not None:
+            request["keep_alive"] = keep_alive(model)
+        endpoint.in_flight += 1
+        try:
+            response = await endpoint.http().post("/api/generate", json=request, timeout=LOAD_TIMEOUT)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            endpoint.mark_failed()
+            raise
+        finally:
+            endpoint.in_flight -= 1
+        response.raise_for_status()
+        return endpoint.record_load(model, response.json(), request=False)
+
+    def _request(self, model: str, prompt: str, options: dict, stream: bool) -> dict:
+        request = {"model": model, "prompt": prompt, "stream": stream, "options": options}
+        if keep_alive(model) is not None:
+            request["keep_alive"] = keep_alive(model)
+        return request
+
+    async def _probe(self, endpoint: OllamaEndpoint):
+        try:
+            response = await endpoint.http().get("/api/tags", timeout=HEALTH_TIMEOUT)
+            response.raise_for_status()
+            endpoint.models = [m.get("name", "") for m in response.json().get("models", [])]
+            endpoint.available = True
+        except Exception:
+            endpoint.available = False
+            endpoint.models = []
+            endpoint.loaded = {}
+        else:
+            # 舊版 Ollama 沒有 /api/ps，此時沿用由生成回應推得的載入狀態
+            try:
+                response = await endpoint.http().get("/api/ps", timeout=HEALTH_TIMEOUT)
+                response.raise_for_status()
+                endpoint.loaded = {
+                    m.get("name", ""): m.get("expires_at") for m in response.json().get("models", [])
+                }
+            except Exception:
+                pass
+        endpoint.checked_at = time.time()
+
+    async def refresh_status(self) -> dict:
+        """同時查詢所有節點的 /api/tags 與 /api/ps 並更新狀態"""
+        await asyncio.gather(*(self._probe(ep) for ep in self.endpoints))
+        return self.status()
+
+    def status(self) -> dict:
+        """
+        回傳最近一次健康檢查的結果，不做任何網路請求
+
+        available 為任一節點可用；models 為所有可用節點模型的聯集。
+        """
+        endpoints = [ep.to_dict() for ep in self.endpoints]
+        models = []
+        for ep in endpoints:
+            if ep["available"]:
+                models.extend(m for m in ep["models"] if m not in models)
+        checked = [ep["checked_at"] for ep in endpoints if ep["checked_at"] is not None]
+        return {
+            "available": any(ep["available"] and ep["checked_at"] for ep in endpoints),
+            "models": models,
+            "checked_at": max(checked) if checked else None,
+            "endpoints": endpoints,
+        }
+
+    def start_health_monitor(self, interval: float = HEALTH_INTERVAL):
+        """啟動背景健康檢查（重複呼叫不會啟動第二個）"""
+        async def monitor():
+            while True:
+                await self.refresh_status()
+                await asyncio.sleep(interval)
+
+        with self._lock:
+            if self._monitor is None:
+                self._monitor = self.run(monitor())
+
+
+ollama = OllamaClient()
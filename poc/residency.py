@@ -0,0 +1,203 @@
+"""
+Ollama 模型常駐管理
+服務啟動時在各節點預先載入摘要模型，並在上班時段定期送出保溫請求延長 keep_alive，
+第一個使用者不必等待 32B 模型從磁碟載入；下班後停止保溫，模型閒置一段時間即由 Ollama 卸載
+"""
+
+import os
+import time
+import asyncio
+import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from metrics import OLLAMA_MODEL_LOADS, record_error
+from ollama_client import OllamaClient, keep_alive, ollama
+from summarizer import DEFAULT_MODEL, NUM_CTX
+
+
+# 啟動時預先載入的模型，以逗號分隔；設為空字串停用預載與保溫
+PRELOAD_MODELS = [
+    model.strip() for model in os.environ.get("MEETING_OLLAMA_PRELOAD", DEFAULT_MODEL).split(",")
+    if model.strip()
+]
+# 保溫時段（本機時間，可跨午夜，例如 22:00-02:00）；設為空字串停用保溫
+WARM_HOURS = os.environ.get("MEETING_OLLAMA_WARM_HOURS", "09:00-18:00")
+# 保溫的星期（ISO，1 為星期一），範圍或逗號分隔，例如 1-5 或 1,3,5
+WARM_DAYS = os.environ.get("MEETING_OLLAMA_WARM_DAYS", "1-5")
+# 保溫請求的間隔（秒），應短於 keep_alive
+WARM_INTERVAL = float(os.environ.get("MEETING_OLLAMA_WARM_INTERVAL", "240"))
+
+# 預載狀態
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+DISABLED = "disabled"
+
+# 載入原因
+PRELOAD = "preload"
+KEEP_WARM = "keep_warm"
+
+
+def parse_hours(value: str) -> Optional[Tuple[int, int]]:
+    """將 HH:MM-HH:MM 解析為 (開始分鐘, 結束分鐘)；空字串回傳 None"""
+    if not value.strip():
+        return None
+    start, end = (
+        sum(int(part) * factor for part, factor in zip(item.strip().split(":"), (60, 1)))
+        for item in value.split("-", 1)
+    )
+    return start, end
+
+
+def parse_days(value: str) -> Set[int]:
+    """將 1-5 或 1,3,5 解析為 ISO 星期集合"""
+    days = set()
+    for item in value.split(","):
+        first, _, last = item.strip().partition("-")
+        if first:
+            days.update(range(int(first), int(last or first) + 1))
+    return days
+
+
+_warm_hours = parse_hours(WARM_HOURS)
+_warm_days = parse_days(WARM_DAYS)
+
+
+def in_warm_hours(now: Optional[datetime.datetime] = None) -> bool:
+    """目前是否在保溫時段內"""
+    if _warm_hours is None:
+        return False
+    now = now or datetime.datetime.now()
+    minute = now.hour * 60 + now.minute
+    start, end = _warm_hours
+    if start <= end:
+        within = start <= minute < end
+    else:
+        # 跨午夜的時段，凌晨的部分屬於前一天
+        within = minute >= start or minute < end
+        if minute < end:
+            now -= datetime.timedelta(days=1)
+    return within and now.isoweekday() in _warm_days
+
+
+class ModelResidency:
+    """在 Ollama client 的事件迴圈上預載模型並於上班時段保溫"""
+
+    def __init__(self, client: OllamaClient = ollama, models: Optional[List[str]] = None):
+        self.client = client
+        self.models = PRELOAD_MODELS if models is None else models
+        self.state = PENDING if self.models else DISABLED
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # 模型 → {節點: 預載秒數}
+        self.load_seconds: Dict[str, Dict[str, float]] = {}
+        self.pings = 0
+        self.last_ping: Optional[float] = None
+        self._task = None
+
+    @property
+    def ready(self) -> bool:
+        """
+        預載是否已結束（未啟用時視為就緒）
+
+        預載失敗仍視為就緒：請求可以照常處理，只是第一次使用時需要等待載入
+        """
+        return self.state not in (PENDING, LOADING)
+
+    def start(self):
+        """啟動背景預載與保溫（重複呼叫不會重複執行）"""
+        if self.state == DISABLED or self._task is not None:
+            return
+        self.state = LOADING
+        self.started_at = time.time()
+        self._task = self.client.run(self._run())
+
+    async def _run(self):
+        try:
+            await self.preload()
+        except Exception as e:
+            record_error("preload", e)
+            self.error = str(e)
+            self.state = FAILED
+        else:
+            self.state = READY
+        finally:
+            self.finished_at = time.time()
+
+        if _warm_hours is None:
+            return
+        while True:
+            await asyncio.sleep(WARM_INTERVAL)
+            if in_warm_hours():
+                try:
+                    await self.keep_warm()
+                except Exception as e:
+                    record_error("keep_warm", e)
+
+    def _targets(self, model: str) -> list:
+        """已安裝此模型的可用節點"""
+        return [ep for ep in self.client.endpoints if ep.available and model in ep.models]
+
+    async def _load(self, endpoint, model: str, reason: str) -> float:
+        # 以與摘要請求相同的上下文長度載入，第一個摘要請求不必重新載入
+        seconds = await self.client.load(endpoint, model, {"num_ctx": NUM_CTX})
+        OLLAMA_MODEL_LOADS.labels(model=model, reason=reason).inc()
+        return seconds
+
+    async def preload(self):
+        """
+        在所有已安裝模型的可用節點上載入模型
+
+        Raises:
+            RuntimeError: 某個模型沒有任何節點安裝
+        """
+        missing = []
+        for model in self.models:
+            targets = self._targets(model)
+            if not targets:
+                missing.append(model)
+                continue
+            seconds = await asyncio.gather(*(self._load(ep, model, PRELOAD) for ep in targets))
+            self.load_seconds[model] = {
+                ep.base_url: round(s, 2) for ep, s in zip(targets, seconds)
+            }
+        if missing:
+            raise RuntimeError(f"沒有可用節點安裝模型: {', '.join(missing)}")
+
+    async def keep_warm(self):
+        """
+        送出不帶 prompt 的請求延長 keep_alive（已卸載時會重新載入）；
+        有進行中請求的節點不需要保溫，生成請求本身就會延長 keep_alive
+        """
+        loads = [
+            self._load(ep, model, KEEP_WARM)
+            for model in self.models
+            for ep in self._targets(model)
+            if ep.in_flight == 0
+        ]
+        await asyncio.gather(*loads)
+        self.pings += len(loads)
+        self.last_ping = time.time()
+
+    def status(self) -> dict:
+        status = {
+            "state": self.state,
+            "models": list(self.models),
+            "keep_alive": {model: keep_alive(model) for model in self.models},
+            "warm_hours": WARM_HOURS or None,
+            "warm_days": sorted(_warm_days),
+            "warming": in_warm_hours(),
+            "load_seconds": self.load_seconds,
+            "pings": self.pings,
+            "last_ping": self.last_ping,
+        }
+        if self.started_at is not None:
+            status["seconds"] = round((self.finished_at or time.time()) - self.started_at, 2)
+        if self.error:
+            status["error"] = self.error
+        return status
+
+
+model_residency = ModelResidency()
@@ -0,0 +1,123 @@
+"""
+逐字稿分段的精簡表示
+所有分段的文字串接成一個字串，時間與文字位置以平行陣列保存；
+不保留 Whisper 分段中的 token、logprob 等欄位，長會議的記憶體用量與快取大小都小很多
+"""
+
+from array import array
+from typing import Iterable, Iterator, Optional, Union
+
+
+def format_timestamped_text(segments: Iterable[dict]) -> str:
+    """將分段資訊格式化為 [MM:SS - MM:SS] 文字 的多行字串"""
+    lines = []
+    for segment in segments:
+        start = segment.get("start", 0)
+        end = segment.get("end", 0)
+        text = segment.get("text", "").strip()
+
+        # 格式化時間戳
+        start_str = f"{int(start // 60):02d}:{int(start % 60):02d}"
+        end_str = f"{int(end // 60):02d}:{int(end % 60):02d}"
+
+        lines.append(f"[{start_str} - {end_str}] {text}")
+
+    return "\n".join(lines)
+
+
+class Segments:
+    """
+    列式儲存的分段：text 為所有分段文字的串接（即完整逐字稿），
+    第 i 段的文字為 text[offsets[i]:offsets[i + 1]]，時間為 starts[i]、ends[i]（秒）
+
+    逐項讀取時產生 {"start", "end", "text"} 字典，可直接取代原本的分段清單。
+    """
+
+    __slots__ = ("text", "starts", "ends", "offsets")
+
+    def __init__(self, text: str = "", starts=(), ends=(), offsets=(0,)):
+        self.text = text
+        self.starts = array("d", starts)
+        self.ends = array("d", ends)
+        self.offsets = array("q", offsets)
+
+    @classmethod
+    def from_list(cls, segments: Iterable[dict]) -> "Segments":
+        """由分段清單建立，只保留時間與文字"""
+        starts, ends, offsets, texts = [], [], [0], []
+        for segment in segments:
+            text = segment.get("text", "")
+            starts.append(segment.get("start", 0))
+            ends.append(segment.get("end", 0))
+            texts.append(text)
+            offsets.append(offsets[-1] + len(text))
+        return cls("".join(texts), starts, ends, offsets)
+
+    @classmethod
+    def from_value(cls, value: Union["Segments", dict, list, None]) -> "Segments":
+        """由 Segments、to_dict() 的結果或分段清單（舊版快取）建立"""
+        if isinstance(value, Segments):
+            return value
+        if isinstance(value, dict):
+            return cls(value["text"], value["start"], value["end"], value["offsets"])
+        return cls.from_list(value or [])
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __bool__(self) -> bool:
+        return len(self.starts) > 0
+
+    def __getitem__(self, index: int) -> dict:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("segment index out of range")
+        return {"start": self.starts[index], "end": self.ends[index], "text": self.text_at(index)}
+
+    def __iter__(self) -> Iterator[dict]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def text_at(self, index: int) -> str:
+        return self.text[self.offsets[index]:self.offsets[index + 1]]
+
+    @property
+    def duration(self) -> float:
+        return self.ends[-1] if self else 0.0
+
+    def to_dict(self) -> dict:
+        """可 JSON 序列化的完整內容（快取格式）"""
+        return {
+            "text": self.text,
+            "start": self.starts.tolist(),
+            "end": self.ends.tolist(),
+            "offsets": self.offsets.tolist(),
+        }
+
+    def to_columns(self, offset: int = 0, limit: Optional[int] = None) -> dict:
+        """
+        API 回應用的列式分段
+
+        Args:
+            offset: 起始分段
+            limit: 最多回傳的分段數，None 表示到結尾
+
+        Returns:
+            dict: total（分段總數）、offset，與等長的 start、end（秒）、text 陣列
+        """
+        end = len(self) if limit is None else min(len(self), offset + limit)
+        indices = range(offset, end)
+        return {
+            "total": len(self),
+            "offset": offset,
+            "start": [self.starts[i] for i in indices],
+            "end": [self.ends[i] for i in indices],
+            "text": [self.text_at(i).strip() for i in indices],
+        }
+
+    def to_list(self) -> list:
+        return list(self)
+
+    def timestamped_text(self) -> str:
+        return format_timestamped_text(self)
@@ -0,0 +1,271 @@
+"""
+會議紀錄資料庫
+將逐字稿分段與摘要保存於 SQLite，並以 FTS5 建立全文索引，可跨會議搜尋並取得分段時間
+"""
+
+import os
+import re
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+
+DB_PATH = Path(os.environ.get("MEETING_DB_PATH", "data/meetings.db"))
+# 處理完成的任務是否寫入資料庫
+STORE_ENABLED = os.environ.get("MEETING_STORE_ENABLED", "1") == "1"
+
+# 中日韓文字沒有空白分詞；索引與查詢時在每個字之間加入空白，
+# 以 unicode61 斷成單字 token，查詢詞再以片語 (phrase) 比對連續的字，任意長度的詞都能命中
+_CJK_RE = re.compile(r"([぀-ヿ㐀-䶿一-鿿豈-﫿가-힯])")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    filename TEXT,
+    audio_sha256 TEXT,
+    style TEXT,
+    language TEXT,
+    duration_ms INTEGER,
+    transcript TEXT,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS meetings_created_at ON meetings (created_at);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    meeting_id TEXT NOT NULL REFERENCES meetings (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_meeting ON segments (meeting_id, position);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5 (
+    tokens, tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5 (
+    meeting_id UNINDEXED, tokens, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def index_text(text: str) -> str:
+    """將文字轉為索引用的 token 字串（中日韓文字逐字分開）"""
+    return _CJK_RE.sub(r" \1 ", text)
+
+
+def build_query(query: str) -> Optional[str]:
+    """
+    將使用者輸入轉為 FTS5 查詢：以空白分隔的每個詞都須出現（AND），詞內的字須連續（片語）
+
+    Returns:
+        str: FTS5 MATCH 語法；輸入沒有可搜尋的內容時回傳 None
+    """
+    phrases = []
+    for term in query.split():
+        tokens = index_text(term).split()
+        if tokens:
+            phrases.append('"' + " ".join(tokens).replace('"', '""') + '"')
+    return " AND ".join(phrases) if phrases else None
+
+
+class MeetingStore:
+    """SQLite 會議紀錄資料庫（每次操作使用獨立連線，可在多個執行緒中使用）"""
+
+    def __init__(self, path: Path = DB_PATH):
+        self.path = Path(path)
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with self._init_lock:
+            if not self._initialized:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with sqlite3.connect(self.path) as conn:
+                    conn.execute("PRAGMA journal_mode = WAL")
+                    conn.executescript(SCHEMA)
+                self._initialized = True
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save_meeting(
+        self,
+        meeting_id: str,
+        transcript: str,
+        summary: str,
+        segments: list,
+        filename: Optional[str] = None,
+        audio_sha256: Optional[str] = None,
+        style: Optional[str] = None,
+        language: Optional[str] = None,
+        created_at: Optional[float] = None
+    ):
+        """寫入（或覆寫）一場會議的逐字稿、分段與摘要"""
+        duration = segments[-1].get("end", 0) if segments else 0
+        with self._connect() as conn:
+            self._delete(conn, meeting_id)
+            conn.execute(
+                "INSERT INTO meetings (id, created_at, filename, audio_sha256, style, language,"
+                " duration_ms, transcript, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (meeting_id, created_at or time.time(), filename, audio_sha256, style, language,
+                 int(duration * 1000), transcript, summary)
+            )
+            for position, segment in enumerate(segments):
+                text = segment.get("text", "").strip()
+                cursor = conn.execute(
+                    "INSERT INTO segments (meeting_id, position, start_ms, end_ms, text)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (meeting_id, position, int(segment.get("start", 0) * 1000),
+                     int(segment.get("end", 0) * 1000), text)
+                )
+                conn.execute(
+                    "INSERT INTO segments_fts (rowid, tokens) VALUES (?, ?)",
+                    (cursor.lastrowid, index_text(text))
+                )
+            conn.execute(
+                "INSERT INTO summaries_fts (meeting_id, tokens) VALUES (?, ?)",
+                (meeting_id, index_text(summary or ""))
+            )
+
+    def get_meeting(
+        self,
+        meeting_id: str,
+        segments_offset: int = 0,
+        segments_limit: Optional[int] = None,
+        with_segments: bool = True
+    ) -> Optional[dict]:
+        """
+        取得會議資料
+
+        Args:
+            meeting_id: 會議 ID
+            segments_offset: 起始分段
+            segments_limit: 最多讀取的分段數，None 表示全部
+            with_segments: False 時不讀取分段（segments 為空清單）
+
+        Returns:
+            dict: meetings 表的欄位、segment_count（分段總數）與 segments [{start_ms, end_ms, text}]；
+                找不到時回傳 None
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM meetings WHERE id = ?", (meeting_id,)).fetchone()
+            if row is None:
+                return None
+            count = conn.execute(
+                "SELECT COUNT(*) FROM segments WHERE meeting_id = ?", (meeting_id,)
+            ).fetchone()[0]
+            segments = []
+            if with_segments:
+                segments = conn.execute(
+                    "SELECT start_ms, end_ms, text FROM segments WHERE meeting_id = ?"
+                    " ORDER BY position LIMIT ? OFFSET ?",
+                    (meeting_id, -1 if segments_limit is None else segments_limit, segments_offset)
+                ).fetchall()
+        return {
+            **dict(row),
+            "segment_count": count,
+            "segments": [dict(segment) for segment in segments],
+        }
+
+    def list_meetings(self, limit: int = 20, offset: int = 0) -> List[dict]:
+        """依建立時間由新到舊列出會議（不含逐字稿全文）"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, created_at, filename, style, language, duration_ms, summary"
+                " FROM meetings ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete_meeting(self, meeting_id: str) -> bool:
+        with self._connect() as conn:
+            return self._delete(conn, meeting_id)
+
+    def search(self, query: str, limit: int = 20, segments_per_meeting: int = 5) -> List[dict]:
+        """
+        全文搜尋逐字稿分段與摘要
+
+        Args:
+            query: 搜尋詞，以空白分隔的多個詞須同時出現在同一分段（或摘要）中
+            limit: 最多回傳的會議數
+            segments_per_meeting: 每場會議最多回傳的命中分段數
+
+        Returns:
+            list: 依相關度排序的會議，每筆含 id、filename、created_at、duration_ms、
+                summary_match（摘要是否命中）、matches（命中分段數）
+                與 segments [{start_ms, end_ms, text}]（依時間排序）
+        """
+        match = build_query(query)
+        if match is None:
+            return []
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT s.meeting_id, s.start_ms, s.end_ms, s.text, bm25(segments_fts) AS rank"
+                " FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid"
+                " WHERE segments_fts MATCH ? ORDER BY rank",
+                (match,)
+            ).fetchall()
+            summary_ids = [
+                row["meeting_id"] for row in conn.execute(
+                    "SELECT meeting_id FROM summaries_fts WHERE summaries_fts MATCH ? ORDER BY rank",
+                    (match,)
+                )
+            ]
+
+            # 以最佳分段的分數排序會議；只有摘要命中的會議排在後面
+            meetings = {}
+            for row in rows:
+                meeting = meetings.setdefault(row["meeting_id"], {"rank": row["rank"], "segments": []})
+                meeting["segments"].append({
+                    "start_ms": row["start_ms"], "end_ms": row["end_ms"], "text": row["text"]
+                })
+            for meeting_id in summary_ids:
+                meetings.setdefault(meeting_id, {"rank": 0.0, "segments": []})
+
+            ordered = sorted(meetings.items(), key=lambda item: item[1]["rank"])[:limit]
+            results = []
+            for meeting_id, found in ordered:
+                row = conn.execute(
+                    "SELECT id, created_at, filename, duration_ms FROM meetings WHERE id = ?",
+                    (meeting_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                results.append({
+                    **dict(row),
+                    "summary_match": meeting_id in summary_ids,
+                    "matches": len(found["segments"]),
+                    "segments": sorted(
+                        found["segments"][:segments_per_meeting], key=lambda s: s["start_ms"]
+                    ),
+                })
+        return results
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            meetings = conn.execute("SELECT COUNT(*) FROM meetings").fetchone()[0]
+            segments = conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return {"meetings": meetings, "segments": segments, "path": str(self.path)}
+
+    def _delete(self, conn: sqlite3.Connection, meeting_id: str) -> bool:
+        conn.execute(
+            "DELETE FROM segments_fts WHERE rowid IN (SELECT id FROM segments WHERE meeting_id = ?)",
+            (meeting_id,)
+        )
+        conn.execute("DELETE FROM summaries_fts WHERE meeting_id = ?", (meeting_id,))
+        conn.execute("DELETE FROM segments WHERE meeting_id = ?", (meeting_id,))
+        return conn.execute("DELETE FROM meetings WHERE id = ?", (meeting_id,)).rowcount > 0
+
+
+meeting_store = MeetingStore()
@@ -1,78 +1,408 @@
 """
 語音轉文字模組 (Speech-to-Text)
-使用 mlx-whisper 進行 Apple Silicon 優化的語音識別
+依設定使用 mlx-whisper (Apple Silicon) 或 faster-whisper (Linux CPU) 進行語音識別
 """
 
-import mlx_whisper
+import os
+import time
+import threading
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
 
+from audio import DecodedAudio, decode_audio, open_pcm
+from cache import CACHE_DIR, DiskCache, hash_file
+from metrics import AUDIO_SECONDS, TRANSCRIBE_SECONDS
+from segments import Segments
+from stt_backends import SAMPLE_RATE, STT_BACKEND, get_backend
+from throughput import throughput
 
-def transcribe(audio_path: str, language: str = None) -> dict:
-    """
-    將音檔轉換為文字
 
-    Args:
-        audio_path: 音檔路徑 (支援 mp3, wav, m4a 等格式)
-        language: 語言代碼，None 表示自動偵測
+# 逐字稿快取：同一音檔換摘要風格重送時不必重跑 Whisper
+TRANSCRIPT_CACHE_MB = int(os.environ.get("MEETING_TRANSCRIPT_CACHE_MB", "1024"))
+transcript_cache = DiskCache(CACHE_DIR / "transcripts", TRANSCRIPT_CACHE_MB * 1024 * 1024)
+
+# 分段平行轉錄：長音檔切成重疊的視窗，交由行程池同時轉錄。
+# 每個工作行程各自載入一份模型；mlx 的所有行程共用同一顆 GPU，平行沒有加速，預設不分段
+STT_CHUNK_WORKERS = int(os.environ.get(
+    "MEETING_STT_CHUNK_WORKERS",
+    "1" if STT_BACKEND == "mlx" else str(min(4, max(1, (os.cpu_count() or 1) // 2)))
+))
+# 超過此長度（秒）才分段
+STT_CHUNK_THRESHOLD = float(os.environ.get("MEETING_STT_CHUNK_THRESHOLD", "900"))
+# 每個視窗的長度與相鄰視窗的重疊（秒）
+STT_CHUNK_SECONDS = float(os.environ.get("MEETING_STT_CHUNK_SECONDS", "300"))
+STT_CHUNK_OVERLAP = float(os.environ.get("MEETING_STT_CHUNK_OVERLAP", "10"))
+if not 0 <= STT_CHUNK_OVERLAP < STT_CHUNK_SECONDS:
+    raise ValueError(
+        f"MEETING_STT_CHUNK_OVERLAP ({STT_CHUNK_OVERLAP}) 必須介於 0 與 "
+        f"MEETING_STT_CHUNK_SECONDS ({STT_CHUNK_SECONDS}) 之間"
+    )
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def transcript_key(audio_hash: str, backend: str, model: str, language: str = None) -> str:
+    """逐字稿快取的鍵：同一音檔以不同模型或語言轉錄的結果分開保存"""
+    return DiskCache.make_key(audio_hash, backend, model, language)
+
+
+def is_transcript_cached(audio_hash: str, backend: str = None, model: str = None, language: str = None) -> bool:
+    """此音檔以指定模型轉錄的結果是否已在快取中"""
+    stt_backend = get_backend(backend, model)
+    return transcript_cache.contains(transcript_key(audio_hash, stt_backend.name, stt_backend.model, language))
+
+
+def use_chunked(duration: float) -> bool:
+    """依設定判斷此長度（秒）的音檔是否分段平行轉錄"""
+    return STT_CHUNK_WORKERS > 1 and duration > STT_CHUNK_THRESHOLD
+
+
+def split_windows(num_samples: int) -> list:
+    """
+    計算重疊視窗的取樣範圍
 
     Returns:
-        dict: 包含 text (完整文字)、segments (分段資訊) 和 timestamped_text (帶時間軸文字)
+        list: [(start_sample, end_sample), ...]
     """
-    # 使用 MLX 優化的 Whisper large-v3 模型
-    result = mlx_whisper.transcribe(
-        audio_path,
-        path_or_hf_repo="mlx-community/whisper-large-v3-mlx",
-        language=language,  # None = 自動偵測語言
-        verbose=False
-    )
+    window = int(STT_CHUNK_SECONDS * SAMPLE_RATE)
+    step = window - int(STT_CHUNK_OVERLAP * SAMPLE_RATE)
+    windows = []
+    start = 0
+    while True:
+        end = min(start + window, num_samples)
+        windows.append((start, end))
+        if end >= num_samples:
+            break
+        start += step
+    return windows
 
-    # 產生帶時間軸的文字
-    segments = result.get("segments", [])
-    timestamped_lines = []
-    for segment in segments:
-        start = segment.get("start", 0)
-        end = segment.get("end", 0)
+
+def _merge_window(i: int, windows: list, result: dict, merged: list) -> list:
+    """
+    將第 i 個視窗的分段併入 merged，回傳新加入的分段
+
+    分段時間加上視窗起點換算為絕對時間；重疊區以中點為界，
+    中點之前採用前一個視窗的分段、之後採用後一個視窗的分段，
+    並移除界線兩側文字重複的分段。
+    """
+    start, end = windows[i]
+    offset = start / SAMPLE_RATE
+    # 與前後視窗重疊區的中點（絕對時間）
+    lower = (start + windows[i - 1][1]) / 2 / SAMPLE_RATE if i > 0 else float("-inf")
+    upper = (windows[i + 1][0] + end) / 2 / SAMPLE_RATE if i + 1 < len(windows) else float("inf")
+
+    added = []
+    for segment in result.get("segments", []):
+        segment = dict(segment)
+        segment["start"] = segment.get("start", 0) + offset
+        segment["end"] = segment.get("end", 0) + offset
+        middle = (segment["start"] + segment["end"]) / 2
+        if not lower <= middle < upper:
+            continue
         text = segment.get("text", "").strip()
+        if merged and text and text == merged[-1].get("text", "").strip():
+            continue
+        segment["id"] = len(merged)
+        merged.append(segment)
+        added.append(segment)
+    return added
+
 
-        # 格式化時間戳
-        start_str = f"{int(start // 60):02d}:{int(start % 60):02d}"
-        end_str = f"{int(end // 60):02d}:{int(end % 60):02d}"
+def merge_windows(windows: list, results: list) -> dict:
+    """合併各視窗的轉錄結果，分段時間為絕對時間"""
+    segments = []
+    for i, result in enumerate(results):
+        _merge_window(i, windows, result, segments)
+    return _merged_result(segments, results)
 
-        timestamped_lines.append(f"[{start_str} - {end_str}] {text}")
 
+def _merged_result(segments: list, results: list) -> dict:
+    languages = Counter(r.get("language") for r in results if r.get("language"))
     return {
-        "text": result["text"],
-        "language": result.get("language", "unknown"),
+        "text": "".join(segment.get("text", "") for segment in segments),
+        "language": languages.most_common(1)[0][0] if languages else "unknown",
         "segments": segments,
-        "timestamped_text": "\n".join(timestamped_lines)
     }
 
 
-def transcribe_with_timestamps(audio_path: str) -> str:
+def _get_pool() -> ProcessPoolExecutor:
+    # 行程池跨請求共用，避免每次重新載入模型；使用 spawn 避免 fork 帶入執行緒狀態
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=STT_CHUNK_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def _transcribe_window(
+    backend_name: str,
+    model: str,
+    pcm_path: str,
+    start: int,
+    end: int,
+    language: str
+) -> dict:
+    # 在子行程中執行：自行映射 PCM 檔的取樣範圍，不經由 pickle 傳送音訊資料
+    audio = open_pcm(pcm_path, start, end)
+    return get_backend(backend_name, model).transcribe(audio, language=language)
+
+
+def _warmup_worker(backend_name: str, model: str):
+    # 在行程池的工作行程中執行
+    get_backend(backend_name, model).warmup()
+
+
+def warmup(backend: str = None, models: list = None, pool: bool = False):
     """
-    帶時間戳的轉錄，適合長音檔
+    載入並預熱 STT 模型
+
+    Args:
+        backend: STT 後端名稱
+        models: 要預熱的模型，None 表示只預熱預設模型
+        pool: 啟用分段平行轉錄時，另外對行程池送出與工作行程數相同的預熱工作，
+            讓各工作行程在第一個請求之前就載入好自己的模型（每個行程各佔一份模型記憶體）
+    """
+    for model in models or [None]:
+        stt_backend = get_backend(backend, model)
+        stt_backend.warmup()
+        if pool and STT_CHUNK_WORKERS > 1:
+            pool = _get_pool()
+            futures = [
+                pool.submit(_warmup_worker, stt_backend.name, stt_backend.model)
+                for _ in range(STT_CHUNK_WORKERS)
+            ]
+            for future in futures:
+                future.result()
+
+
+def transcribe_chunked(
+    audio: DecodedAudio,
+    language: str = None,
+    backend: str = None,
+    model: str = None,
+    on_segment: Callable[[dict], None] = None
+) -> dict:
+    """
+    將已解碼音訊切成重疊視窗平行轉錄後合併
+
+    Args:
+        audio: decode_audio() 的結果
+        language: 語言代碼，None 表示各視窗自動偵測
+        backend: STT 後端名稱
+        model: 模型名稱，None 表示使用後端預設模型
+        on_segment: 每個視窗依序完成時對其分段逐一呼叫
 
     Returns:
-        str: 帶時間戳的文字
+        dict: 與後端 transcribe() 相同結構，時間為絕對時間
     """
-    result = mlx_whisper.transcribe(
-        audio_path,
-        path_or_hf_repo="mlx-community/whisper-large-v3-mlx",
-        verbose=False
-    )
+    stt_backend = get_backend(backend, model)
+    windows = split_windows(len(audio))
+    if len(windows) == 1:
+        return stt_backend.transcribe(audio.samples, language=language, on_segment=on_segment)
 
-    lines = []
-    for segment in result.get("segments", []):
-        start = segment.get("start", 0)
-        end = segment.get("end", 0)
-        text = segment.get("text", "").strip()
+    pool = _get_pool()
+    futures = [
+        pool.submit(
+            _transcribe_window, stt_backend.name, stt_backend.model, str(audio.path), start, end, language
+        )
+        for start, end in windows
+    ]
 
-        # 格式化時間戳
-        start_str = f"{int(start // 60):02d}:{int(start % 60):02d}"
-        end_str = f"{int(end // 60):02d}:{int(end % 60):02d}"
+    # 依視窗順序合併，前面的視窗完成即可先送出其分段
+    segments = []
+    results = []
+    for i, future in enumerate(futures):
+        results.append(future.result())
+        for segment in _merge_window(i, windows, results[-1], segments):
+            if on_segment is not None:
+                on_segment(segment)
+    return _merged_result(segments, results)
 
-        lines.append(f"[{start_str} - {end_str}] {text}")
 
-    return "\n".join(lines)
+def _segment_callback(on_event: Callable[..., None], event_type: str) -> Callable[[dict], None]:
+    """將後端的分段回呼轉為 on_event(event_type, start, end, text)"""
+    def on_segment(segment: dict):
+        if on_event is not None:
+            on_event(
+                event_type,
+                start=segment.get("start", 0),
+                end=segment.get("end", 0),
+                text=segment.get("text", "").strip()
+            )
+    return on_segment
+
+
+def _load_cached(cache_key: str, on_segment: Callable[[dict], None]) -> Optional[dict]:
+    """讀取逐字稿快取，命中時對各分段呼叫 on_segment"""
+    cached = transcript_cache.get(cache_key)
+    if cached is None:
+        return None
+    segments = Segments.from_value(cached["segments"])
+    for segment in segments:
+        on_segment(segment)
+    return {"text": segments.text, "language": cached.get("language", "unknown"), "segments": segments}
+
+
+def _transcribe_decoded(
+    audio: DecodedAudio,
+    stt_backend,
+    language: str,
+    chunked: bool,
+    on_segment: Callable[[dict], None]
+) -> dict:
+    """以指定後端轉錄已解碼音訊，並記錄處理速度與指標"""
+    use_chunks = use_chunked(audio.duration) if chunked is None else chunked
+    start = time.perf_counter()
+    if use_chunks:
+        result = transcribe_chunked(
+            audio, language=language, backend=stt_backend.name, model=stt_backend.model,
+            on_segment=on_segment
+        )
+    else:
+        result = stt_backend.transcribe(audio.samples, language=language, on_segment=on_segment)
+    elapsed = time.perf_counter() - start
+    throughput.record_stt(stt_backend.name, stt_backend.model, audio.duration, elapsed, use_chunks)
+    TRANSCRIBE_SECONDS.labels(
+        backend=stt_backend.name,
+        model=stt_backend.model,
+        mode="chunked" if use_chunks else "single"
+    ).observe(elapsed)
+    AUDIO_SECONDS.labels(backend=stt_backend.name, model=stt_backend.model).inc(audio.duration)
+
+    # 只保留分段的時間與文字，完整逐字稿即為分段文字的串接，不另存一份
+    segments = Segments.from_list(result.get("segments", []))
+    return {"text": segments.text, "language": result.get("language", "unknown"), "segments": segments}
+
+
+def _store_cached(cache_key: str, result: dict):
+    transcript_cache.set(cache_key, {"language": result["language"], "segments": result["segments"].to_dict()})
+
+
+def transcribe(
+    audio_path: str,
+    language: str = None,
+    audio_hash: str = None,
+    use_cache: bool = True,
+    backend: str = None,
+    model: str = None,
+    chunked: bool = None,
+    on_event: Callable[..., None] = None
+) -> dict:
+    """
+    將音檔轉換為文字
+
+    Args:
+        audio_path: 音檔路徑 (支援 mp3, wav, m4a 等格式)
+        language: 語言代碼，None 表示自動偵測
+        audio_hash: 音檔內容的 SHA-256，None 時自動計算
+        use_cache: 是否使用逐字稿快取
+        backend: STT 後端名稱，None 表示使用 MEETING_STT_BACKEND 設定
+        model: 模型名稱，None 表示使用 MEETING_STT_MODEL 或後端預設值
+        chunked: True 強制分段平行轉錄、False 不分段；None 表示 MEETING_STT_CHUNK_WORKERS > 1 時
+            對超過 MEETING_STT_CHUNK_THRESHOLD 秒的音檔自動分段
+        on_event: 進度回呼，呼叫方式為 on_event(事件類型, **資料)；
+            事件包含 decoded (duration，快取命中時不送出) 與每個分段的 segment (start, end, text)
+
+    Returns:
+        dict: 包含 text (完整文字)、language 與 segments (Segments，帶時間軸文字可由
+            segments.timestamped_text() 取得)
+    """
+    stt_backend = get_backend(backend, model)
+    on_segment = _segment_callback(on_event, "segment")
+
+    if use_cache:
+        if audio_hash is None:
+            audio_hash = hash_file(audio_path)
+        cache_key = transcript_key(audio_hash, stt_backend.name, stt_backend.model, language)
+        cached = _load_cached(cache_key, on_segment)
+        if cached is not None:
+            return cached
+
+    # 只解碼一次，後端與分段轉錄都讀取同一份記憶體映射的 PCM，不再各自呼叫 ffmpeg
+    with decode_audio(audio_path) as audio:
+        if on_event is not None:
+            on_event("decoded", duration=audio.duration)
+        result = _transcribe_decoded(audio, stt_backend, language, chunked, on_segment)
+
+    if use_cache:
+        _store_cached(cache_key, result)
+    return result
+
+
+def transcribe_progressive(
+    audio_path: str,
+    draft_model: str,
+    language: str = None,
+    audio_hash: str = None,
+    use_cache: bool = True,
+    backend: str = None,
+    model: str = None,
+    chunked: bool = None,
+    on_event: Callable[..., None] = None,
+    on_draft: Callable[[dict], None] = None
+) -> dict:
+    """
+    兩階段轉錄：先以快速模型產生草稿，再以完整模型重新轉錄
+
+    兩次轉錄共用同一份解碼後的 PCM。完整模型的結果已在快取中時直接回傳，不產生草稿。
+
+    Args:
+        audio_path: 音檔路徑
+        draft_model: 產生草稿的快速模型
+        language, audio_hash, use_cache, backend, model, chunked: 同 transcribe()，model 為完整模型
+        on_event: 進度回呼；草稿階段的分段以 draft_segment 送出，完整轉錄的分段以 segment 送出
+        on_draft: 草稿完成時以與 transcribe() 相同結構的結果呼叫
+
+    Returns:
+        dict: 完整模型的轉錄結果，結構同 transcribe()
+    """
+    final_backend = get_backend(backend, model)
+    draft_backend = get_backend(backend, draft_model)
+    on_draft_segment = _segment_callback(on_event, "draft_segment")
+    on_segment = _segment_callback(on_event, "segment")
+
+    if use_cache:
+        if audio_hash is None:
+            audio_hash = hash_file(audio_path)
+        cache_key = transcript_key(audio_hash, final_backend.name, final_backend.model, language)
+        cached = _load_cached(cache_key, on_segment)
+        if cached is not None:
+            return cached
+        draft_key = transcript_key(audio_hash, draft_backend.name, draft_backend.model, language)
+
+    with decode_audio(audio_path) as audio:
+        if on_event is not None:
+            on_event("decoded", duration=audio.duration)
+
+        draft = _load_cached(draft_key, on_draft_segment) if use_cache else None
+        if draft is None:
+            draft = _transcribe_decoded(audio, draft_backend, language, chunked, on_draft_segment)
+            if use_cache:
+                _store_cached(draft_key, draft)
+        if on_draft is not None:
+            on_draft(draft)
+
+        result = _transcribe_decoded(audio, final_backend, language, chunked, on_segment)
+
+    if use_cache:
+        _store_cached(cache_key, result)
+    return result
+
+
+def transcribe_with_timestamps(audio_path: str) -> str:
+    """
+    帶時間戳的轉錄，適合長音檔
+
+    Returns:
+        str: 帶時間戳的文字
+    """
+    return transcribe(audio_path)["segments"].timestamped_text()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,248 @@
+"""
+語音轉文字後端
+將 Whisper 推理實作抽象化，依設定選擇 Apple Silicon (MLX) 或 Linux CPU (faster-whisper) 後端
+"""
+
+import os
+import time
+import wave
+import threading
+from typing import Callable, Dict, Optional
+
+
+# 後端名稱：mlx / faster-whisper / fake
+STT_BACKEND = os.environ.get("MEETING_STT_BACKEND", "mlx")
+# 模型名稱，未設定時使用各後端預設的 large-v3
+STT_MODEL = os.environ.get("MEETING_STT_MODEL")
+# faster-whisper 使用的 CPU 執行緒數，0 表示由 CTranslate2 自行決定
+STT_CPU_THREADS = int(os.environ.get("MEETING_STT_CPU_THREADS", "0"))
+# fake 後端模擬的即時率（處理秒數 / 音訊秒數），0 表示立即完成
+FAKE_STT_RTF = float(os.environ.get("MEETING_FAKE_STT_RTF", "0"))
+
+# Whisper 輸入取樣率
+SAMPLE_RATE = 16000
+# 預熱時轉錄的靜音長度（秒）
+WARMUP_SECONDS = 1.0
+
+
+class STTBackend:
+    """
+    語音轉文字後端介面
+
+    子類別實作 transcribe()，回傳與 mlx_whisper.transcribe 相同的結構：
+    {"text": str, "language": str, "segments": [{"start", "end", "text", ...}]}
+
+    audio 可為音檔路徑，或已解碼的 16 kHz 單聲道 float32 numpy 陣列。
+    on_segment 會依時間順序對每個分段呼叫一次；支援逐段輸出的後端在分段產生時立即呼叫，
+    其餘後端在轉錄完成後依序呼叫。
+
+    推理套件在 load() 或第一次 transcribe() 時才匯入，匯入本模組不會載入模型。
+    """
+
+    name = "base"
+    default_model = ""
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model or self.default_model
+
+    def load(self):
+        """匯入推理套件並載入模型權重（首次使用時會下載），重複呼叫不會重複載入"""
+
+    def warmup(self):
+        """載入模型後轉錄一小段靜音，讓權重、運算核心與快取都就緒"""
+        import numpy as np
+
+        self.load()
+        self.transcribe(np.zeros(int(SAMPLE_RATE * WARMUP_SECONDS), dtype=np.float32))
+
+    def transcribe(
+        self,
+        audio,
+        language: Optional[str] = None,
+        on_segment: Optional[Callable[[dict], None]] = None
+    ) -> dict:
+        raise NotImplementedError
+
+
+def _replay_segments(result: dict, on_segment: Optional[Callable[[dict], None]]) -> dict:
+    # 不支援逐段輸出的後端在完成後補送分段事件
+    if on_segment is not None:
+        for segment in result.get("segments", []):
+            on_segment(segment)
+    return result
+
+
+class MLXWhisperBackend(STTBackend):
+    """mlx-whisper 後端，針對 Apple Silicon 優化"""
+
+    name = "mlx"
+    default_model = "mlx-community/whisper-large-v3-mlx"
+
+    def load(self):
+        # mlx-whisper 在第一次 transcribe() 時載入並快取權重，預熱轉錄會完成下載與載入
+        import mlx_whisper  # noqa: F401
+
+    def transcribe(
+        self,
+        audio,
+        language: Optional[str] = None,
+        on_segment: Optional[Callable[[dict], None]] = None
+    ) -> dict:
+        import mlx_whisper
+
+        result = mlx_whisper.transcribe(
+            audio,
+            path_or_hf_repo=self.model,
+            language=language,  # None = 自動偵測語言
+            verbose=False
+        )
+        return _replay_segments(result, on_segment)
+
+
+class FasterWhisperBackend(STTBackend):
+    """faster-whisper (CTranslate2) 後端，以 int8 量化在 x86 CPU 上推理"""
+
+    name = "faster-whisper"
+    default_model = "large-v3"
+
+    def __init__(self, model: Optional[str] = None):
+        super().__init__(model)
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        self._load()
+
+    def _load(self):
+        # 模型載入耗時且佔記憶體，整個行程共用一份
+        with self._lock:
+            if self._model is None:
+                from faster_whisper import WhisperModel
+
+                self._model = WhisperModel(
+                    self.model,
+                    device="cpu",
+                    compute_type="int8",
+                    cpu_threads=STT_CPU_THREADS
+                )
+        return self._model
+
+    def transcribe(
+        self,
+        audio,
+        language: Optional[str] = None,
+        on_segment: Optional[Callable[[dict], None]] = None
+    ) -> dict:
+        segments_iter, info = self._load().transcribe(
+            audio,
+            language=language,
+            beam_size=5,
+            vad_filter=True
+        )
+
+        # faster-whisper 以產生器逐段解碼，可在每段完成時立即回報
+        segments = []
+        for segment in segments_iter:
+            segments.append({
+                "id": segment.id,
+                "seek": segment.seek,
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "tokens": list(segment.tokens),
+                "temperature": segment.temperature,
+                "avg_logprob": segment.avg_logprob,
+                "compression_ratio": segment.compression_ratio,
+                "no_speech_prob": segment.no_speech_prob,
+            })
+            if on_segment is not None:
+                on_segment(segments[-1])
+
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "language": info.language,
+            "segments": segments,
+        }
+
+
+class FakeBackend(STTBackend):
+    """
+    不做推理的輕量後端，供測試與效能量測使用
+
+    依音檔長度（陣列以取樣數計算，WAV 以標頭計算，其他格式視為 60 秒）
+    每 5 秒產生一段固定文字；設定 MEETING_FAKE_STT_RTF 時依即時率逐段等待，
+    模擬真實後端的處理時間。
+    """
+
+    name = "fake"
+    default_model = "fake"
+    segment_seconds = 5.0
+    # 模擬較小模型的速度：處理時間為 MEETING_FAKE_STT_RTF 乘上此比例
+    model_costs = {"fake": 1.0, "fake-turbo": 0.35, "fake-small": 0.15}
+
+    def transcribe(
+        self,
+        audio,
+        language: Optional[str] = None,
+        on_segment: Optional[Callable[[dict], None]] = None
+    ) -> dict:
+        if not isinstance(audio, str):
+            duration = len(audio) / float(SAMPLE_RATE)
+        else:
+            try:
+                with wave.open(audio, "rb") as f:
+                    duration = f.getnframes() / float(f.getframerate())
+            except (wave.Error, EOFError):
+                duration = 60.0
+
+        rtf = FAKE_STT_RTF * self.model_costs.get(self.model, 1.0)
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(start + self.segment_seconds, duration)
+            if rtf > 0:
+                time.sleep((end - start) * rtf)
+            segments.append({
+                "id": len(segments),
+                "start": start,
+                "end": end,
+                "text": f" 第 {len(segments) + 1} 段測試內容。",
+            })
+            if on_segment is not None:
+                on_segment(segments[-1])
+            start = end
+
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "language": language or "zh",
+            "segments": segments,
+        }
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (MLXWhisperBackend, FasterWhisperBackend, FakeBackend)
+}
+
+_instances: Dict[tuple, STTBackend] = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(name: Optional[str] = None, model: Optional[str] = None) -> STTBackend:
+    """
+    取得 STT 後端實例（同名稱與模型共用同一個實例）
+
+    Args:
+        name: 後端名稱，None 表示使用 MEETING_STT_BACKEND
+        model: 模型名稱，None 表示使用 MEETING_STT_MODEL 或後端預設值
+    """
+    name = name or STT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"未知的 STT 後端: {name}（可用: {', '.join(BACKENDS)}）")
+    model = model or STT_MODEL
+
+    with _instances_lock:
+        key = (name, model)
+        if key not in _instances:
+            _instances[key] = BACKENDS[name](model)
+        return _instances[key]
@@ -3,40 +3,87 @@
 使用 Ollama API 呼叫本地 LLM 生成結構化摘要
 """
 
-import requests
-import json
-from typing import Optional
+import os
+import re
+import time
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from cache import CACHE_DIR, DiskCache
+from metrics import LLM_GENERATION_SECONDS, LLM_TOKENS_PER_SECOND, LLM_TTFT_SECONDS, record_error
+from ollama_client import ollama
+from throughput import throughput
 
 
-OLLAMA_API_URL = "http://192.168.1.213:11434/api/generate"
 DEFAULT_MODEL = "qwen3:32b-q4_K_M"
 
+# 上下文長度（prompt + 輸出的 token 數）；Ollama 預設只有 2048 或 4096，超過的 prompt 會被無聲截斷
+NUM_CTX = int(os.environ.get("MEETING_OLLAMA_NUM_CTX", "16384"))
+NUM_PREDICT = 2048
 
-def summarize(
-    text: str,
-    model: str = DEFAULT_MODEL,
-    style: str = "meeting"
-) -> str:
-    """
-    生成文字摘要
+DEFAULT_OPTIONS = {
+    "temperature": 0.3,  # 降低隨機性以獲得更一致的輸出
+    "num_predict": NUM_PREDICT,  # 最大輸出長度
+    "num_ctx": NUM_CTX
+}
 
-    Args:
-        text: 要摘要的文字內容
-        model: Ollama 模型名稱
-        style: 摘要風格 ('meeting', 'article', 'brief')
+# 摘要快取：相同 prompt、模型與生成參數不重複呼叫 LLM
+SUMMARY_CACHE_MB = int(os.environ.get("MEETING_SUMMARY_CACHE_MB", "64"))
+SUMMARY_CACHE_TTL = int(os.environ.get("MEETING_SUMMARY_CACHE_TTL", str(7 * 24 * 3600)))
+summary_cache = DiskCache(
+    CACHE_DIR / "summaries",
+    SUMMARY_CACHE_MB * 1024 * 1024,
+    ttl=SUMMARY_CACHE_TTL
+)
 
-    Returns:
-        str: 結構化的摘要內容
-    """
 
-    # 根據風格選擇不同的 prompt
-    prompts = {
-        "meeting": f"""你是一位專業的會議記錄助手。請將以下會議/對話內容整理成結構化摘要。
+# prompt 中逐字稿以外的部分（角色說明、風格或分段筆記指示）預留的 token 數
+PROMPT_OVERHEAD_TOKENS = 512
+# 單次 prompt 可放入的逐字稿 token 數：上下文扣除輸出長度與指示
+INPUT_TOKENS = NUM_CTX - NUM_PREDICT - PROMPT_OVERHEAD_TOKENS
+if INPUT_TOKENS <= 0:
+    raise ValueError(
+        f"MEETING_OLLAMA_NUM_CTX ({NUM_CTX}) 須大於輸出長度與指示的 {NUM_PREDICT + PROMPT_OVERHEAD_TOKENS} token"
+    )
+
+# 分段摘要（map-reduce）：逐字稿估計超過此 token 數時自動啟用，預設為整個可用的輸入長度
+MAP_REDUCE_THRESHOLD_TOKENS = min(
+    int(os.environ.get("MEETING_MAP_REDUCE_THRESHOLD_TOKENS", str(INPUT_TOKENS))), INPUT_TOKENS
+)
+# 每一段送進 LLM 的 token 上限，預設為可用輸入長度的一半，讓長逐字稿能切成多段平行產生筆記
+MAP_CHUNK_TOKENS = min(
+    int(os.environ.get("MEETING_MAP_CHUNK_TOKENS", str(INPUT_TOKENS // 2))), INPUT_TOKENS
+)
+# 同時摘要的段數
+MAP_CONCURRENCY = int(os.environ.get("MEETING_MAP_CONCURRENCY", "2"))
+
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+_WORD_RE = re.compile(r"[A-Za-z0-9]+")
+_SENTENCE_RE = re.compile(r"[^。！？!?\n]+[。！？!?\n]*")
+
+
+class EmptyResponseError(Exception):
+    """Ollama 回應中沒有生成內容"""
+
+
+def estimate_tokens(text: str) -> int:
+    """粗估 token 數：中日文字每字約 1 token，英數單字每字約 1.3 token"""
+    cjk = len(_CJK_RE.findall(text))
+    words = len(_WORD_RE.findall(text))
+    return cjk + int(words * 1.3) + 1
+
+
+# 所有風格共用的 prompt 開頭：逐字稿放在最前面、風格指示放在最後，
+# 同一份逐字稿換風格時 Ollama 可沿用已計算的 KV 快取，只需處理後面的指示
+PROMPT_PREFIX = """你是一位專業的會議記錄助手。以下是一份會議/對話的內容：
 
-內容：
 {text}
 
-請用以下格式輸出（使用繁體中文）：
+"""
+
+STYLE_INSTRUCTIONS = {
+    "meeting": """請將上述內容整理成結構化摘要，用以下格式輸出（使用繁體中文）：
 
 ## 摘要
 （2-3 句話概述主要內容）
@@ -54,73 +101,516 @@ def summarize(
 （如果有做出決定，列出來；如果沒有，可以省略此段）
 """,
 
-        "article": f"""請將以下內容整理成簡潔的摘要（繁體中文）：
-
-內容：
-{text}
-
-請輸出：
+    "article": """請將上述內容整理成簡潔的摘要（繁體中文），輸出：
 1. 一段話摘要（約 100 字）
 2. 3-5 個關鍵詞
 """,
 
-        "brief": f"""請用 3 句話以內摘要以下內容（繁體中文）：
-
-{text}
+    "brief": """請用 3 句話以內摘要上述內容（繁體中文）。
 """
-    }
+}
+
+STYLES = tuple(STYLE_INSTRUCTIONS)
+
+
+def build_prefix(text: str) -> str:
+    """所有風格共用的 prompt 開頭"""
+    return PROMPT_PREFIX.format(text=text)
+
+
+def build_prompt(text: str, style: str = "meeting") -> str:
+    """
+    依摘要風格產生 prompt
+
+    Args:
+        text: 要摘要的文字內容
+        style: 摘要風格 ('meeting', 'article', 'brief')，未知風格視為 'meeting'
+
+    Returns:
+        str: 完整的 prompt（共用開頭 + 風格指示）
+    """
+    return build_prefix(text) + STYLE_INSTRUCTIONS.get(style, STYLE_INSTRUCTIONS["meeting"])
+
+
+def parse_styles(styles: str) -> List[str]:
+    """解析以逗號分隔的摘要風格，含不支援的風格時丟出 ValueError"""
+    names = list(dict.fromkeys(name.strip() for name in styles.split(",") if name.strip()))
+    unknown = [name for name in names if name not in STYLES]
+    if unknown:
+        raise ValueError(f"不支援的摘要風格: {', '.join(unknown)}，可用風格: {', '.join(STYLES)}")
+    return names
+
+
+def summarize(
+    text: str,
+    model: str = DEFAULT_MODEL,
+    style: str = "meeting",
+    options: Optional[dict] = None,
+    use_cache: bool = True,
+    segments: Optional[list] = None
+) -> str:
+    """
+    生成文字摘要
+
+    逐字稿超過 MEETING_MAP_REDUCE_THRESHOLD_TOKENS 時自動改用分段摘要（map-reduce）。
+
+    Args:
+        text: 要摘要的文字內容
+        model: Ollama 模型名稱
+        style: 摘要風格 ('meeting', 'article', 'brief')
+        options: Ollama 生成參數，會覆蓋 DEFAULT_OPTIONS 中的同名項目
+        use_cache: 是否使用摘要快取；False 時強制重新生成（結果仍會寫入快取）
+        segments: 逐字稿分段（含 text），分段摘要時依分段邊界切分；None 時依句子切分
+
+    Returns:
+        str: 結構化的摘要內容
+    """
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+
+    try:
+        text = _summary_input(text, model, options, use_cache, segments)
+        return _generate(build_prompt(text, style), model, options, use_cache, prefix_affinity(text, model))
+    except Exception as e:
+        record_error("summarize", e)
+        return error_message(e)
+
 
-    prompt = prompts.get(style, prompts["meeting"])
+def summarize_stream(
+    text: str,
+    model: str = DEFAULT_MODEL,
+    style: str = "meeting",
+    options: Optional[dict] = None,
+    use_cache: bool = True,
+    segments: Optional[list] = None
+) -> Iterator[dict]:
+    """
+    串流生成文字摘要，參數與 summarize() 相同
+
+    長逐字稿的分段筆記（map 階段）不串流，只有最後彙整的摘要逐 token 輸出。
+
+    Yields:
+        dict: 依序為
+            {"type": "token", "text": str}：新生成的文字片段
+            {"type": "done", "summary": str, "stats": dict}：完成，stats 含首個 token 延遲與生成速度
+            {"type": "error", "error": str}：失敗（取代 done）
+    """
+    options = {**DEFAULT_OPTIONS, **(options or {})}
 
     try:
-        response = requests.post(
-            OLLAMA_API_URL,
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.3,  # 降低隨機性以獲得更一致的輸出
-                    "num_predict": 2048  # 最大輸出長度
-                }
-            },
-            timeout=120  # 較長的超時時間，因為大模型推理需要時間
+        text = _summary_input(text, model, options, use_cache, segments)
+        yield from _stream_generate(
+            build_prompt(text, style), model, options, use_cache, prefix_affinity(text, model)
         )
+    except Exception as e:
+        record_error("summarize", e)
+        yield {"type": "error", "error": error_message(e)}
+
+
+def summarize_styles(
+    text: str,
+    styles: Sequence[str],
+    model: str = DEFAULT_MODEL,
+    options: Optional[dict] = None,
+    use_cache: bool = True,
+    segments: Optional[list] = None
+) -> Dict[str, str]:
+    """
+    一次生成多種風格的摘要，參數同 summarize()
 
-        response.raise_for_status()
-        result = response.json()
-        return result.get("response", "摘要生成失敗")
+    Returns:
+        dict: 風格 → 摘要內容（失敗的風格為錯誤訊息）
+    """
+    summaries = {}
+    for event in summarize_styles_stream(text, styles, model, options, use_cache, segments):
+        if event["type"] == "done":
+            summaries[event["style"]] = event["summary"]
+        elif event["type"] == "error":
+            summaries[event["style"]] = event["error"]
+    return summaries
 
-    except requests.exceptions.ConnectionError:
+
+def summarize_styles_stream(
+    text: str,
+    styles: Sequence[str],
+    model: str = DEFAULT_MODEL,
+    options: Optional[dict] = None,
+    use_cache: bool = True,
+    segments: Optional[list] = None
+) -> Iterator[dict]:
+    """
+    依序串流生成多種風格的摘要，參數同 summarize_stream()
+
+    長逐字稿的分段筆記只做一次；各風格的 prompt 共用相同開頭並送往同一個 Ollama 節點，
+    第一個風格之後只需處理各自的風格指示，不必重新處理整份逐字稿。
+
+    Yields:
+        dict: 與 summarize_stream() 相同的事件，另含 style 欄位
+    """
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+
+    try:
+        text = _summary_input(text, model, options, use_cache, segments)
+    except Exception as e:
+        record_error("summarize", e)
+        for style in styles:
+            yield {"type": "error", "style": style, "error": error_message(e)}
+        return
+    yield from _styles_stream(text, styles, model, options, use_cache)
+
+
+def prefix_affinity(text: str, model: str) -> str:
+    """共用 prompt 開頭的識別鍵：相同逐字稿的各風格請求送往同一個 Ollama 節點"""
+    return DiskCache.make_key(build_prefix(text), model)
+
+
+def _styles_stream(
+    text: str,
+    styles: Sequence[str],
+    model: str,
+    options: dict,
+    use_cache: bool
+) -> Iterator[dict]:
+    # 依序生成：同一節點上前一個請求留下的 KV 快取才能被下一個風格沿用
+    affinity = prefix_affinity(text, model)
+    for style in styles:
+        try:
+            for event in _stream_generate(build_prompt(text, style), model, options, use_cache, affinity):
+                yield {**event, "style": style}
+        except Exception as e:
+            record_error("summarize", e)
+            yield {"type": "error", "style": style, "error": error_message(e)}
+
+
+def error_message(e: Exception) -> str:
+    """將摘要生成的例外轉為給使用者看的錯誤訊息"""
+    if isinstance(e, EmptyResponseError):
+        return "摘要生成失敗"
+    if isinstance(e, httpx.ConnectError):
         return "錯誤：無法連接 Ollama 服務。請確認 Ollama 已啟動 (ollama serve)"
-    except requests.exceptions.Timeout:
+    if isinstance(e, httpx.TimeoutException):
         return "錯誤：摘要生成超時，請稍後再試"
-    except Exception as e:
-        return f"錯誤：{str(e)}"
+    return f"錯誤：{str(e)}"
+
+
+def _summary_input(
+    text: str,
+    model: str,
+    options: dict,
+    use_cache: bool,
+    segments: Optional[list]
+) -> str:
+    # 長逐字稿先做分段筆記，以筆記取代逐字稿放進最終 prompt
+    if estimate_tokens(text) > MAP_REDUCE_THRESHOLD_TOKENS:
+        pieces = [s.get("text", "") for s in segments] if segments else split_sentences(text)
+        text = map_notes(pieces, model, options, use_cache)
+    return text
+
 
+def _generate(
+    prompt: str,
+    model: str,
+    options: dict,
+    use_cache: bool = True,
+    affinity: Optional[str] = None
+) -> str:
+    """呼叫 Ollama 生成一次回應（含快取），失敗時丟出例外"""
+    cache_key = DiskCache.make_key(prompt, model, options)
+    if use_cache:
+        cached = summary_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    start = time.perf_counter()
+    result = ollama.call(ollama.generate(model, prompt, options, affinity))
+    if "response" not in result:
+        raise EmptyResponseError()
+    record_generation(model, generation_stats(start, None, time.perf_counter(), result))
+    summary_cache.set(cache_key, result["response"])
+    return result["response"]
+
+
+def _stream_generate(
+    prompt: str,
+    model: str,
+    options: dict,
+    use_cache: bool = True,
+    affinity: Optional[str] = None
+) -> Iterator[dict]:
+    """以 Ollama 的 NDJSON 串流逐 token 生成（含快取），失敗時丟出例外"""
+    cache_key = DiskCache.make_key(prompt, model, options)
+    if use_cache:
+        cached = summary_cache.get(cache_key)
+        if cached is not None:
+            yield {"type": "token", "text": cached}
+            yield {"type": "done", "summary": cached, "stats": {"cached": True}}
+            return
+
+    start = time.perf_counter()
+    first_token_at = None
+    parts = []
+    final = {}
+
+    for chunk in ollama.iter_sync(ollama.generate_stream(model, prompt, options, affinity)):
+        if "error" in chunk:
+            raise RuntimeError(chunk["error"])
+        token = chunk.get("response", "")
+        if token:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(token)
+            yield {"type": "token", "text": token}
+        if chunk.get("done"):
+            final = chunk
+            break
 
-def check_ollama_status() -> dict:
+    if not final:
+        raise EmptyResponseError()
+
+    summary = "".join(parts)
+    summary_cache.set(cache_key, summary)
+    stats = generation_stats(start, first_token_at, time.perf_counter(), final)
+    record_generation(model, stats)
+    yield {"type": "done", "summary": summary, "stats": stats}
+
+
+def generation_stats(start: float, first_token_at: Optional[float], end: float, final: dict) -> dict:
+    """
+    整理一次串流生成的效能數據
+
+    Args:
+        start / first_token_at / end: time.perf_counter() 時間點
+        final: Ollama 串流最後一個 chunk（含 eval_count、eval_duration 等，單位為奈秒）
+    """
+    eval_count = final.get("eval_count", 0)
+    eval_duration = final.get("eval_duration", 0) / 1e9
+    if not eval_duration and first_token_at is not None:
+        eval_duration = end - first_token_at
+    return {
+        "cached": False,
+        "time_to_first_token": (first_token_at - start) if first_token_at is not None else None,
+        "total_time": end - start,
+        "prompt_tokens": final.get("prompt_eval_count", 0),
+        "prompt_eval_time": final.get("prompt_eval_duration", 0) / 1e9,
+        "eval_tokens": eval_count,
+        "tokens_per_second": eval_count / eval_duration if eval_duration else None,
+        "load_time": final.get("load_duration", 0) / 1e9,
+    }
+
+
+def record_generation(model: str, stats: dict):
+    """將一次生成的效能數據寫入處理速度模型與 Prometheus 指標"""
+    throughput.record_llm(model, stats)
+    LLM_GENERATION_SECONDS.labels(model=model).observe(stats["total_time"])
+    if stats["time_to_first_token"] is not None:
+        LLM_TTFT_SECONDS.labels(model=model).observe(stats["time_to_first_token"])
+    if stats["tokens_per_second"]:
+        LLM_TOKENS_PER_SECOND.labels(model=model).observe(stats["tokens_per_second"])
+
+
+def split_sentences(text: str) -> List[str]:
+    """沒有分段資訊時，以句尾標點與換行切分文字"""
+    return [m.group(0) for m in _SENTENCE_RE.finditer(text) if m.group(0).strip()]
+
+
+def chunk_pieces(pieces: List[str], max_tokens: int = MAP_CHUNK_TOKENS) -> List[str]:
+    """
+    依 token 上限將文字片段（逐字稿分段或句子）依序打包成區塊，不在片段中間切開
+
+    單一片段超過上限時自成一個區塊。
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        piece = piece.strip()
+        if not piece:
+            continue
+        tokens = estimate_tokens(piece)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def build_partial_prompt(text: str, index: int, total: Optional[int] = None) -> str:
+    """分段摘要（map 階段）的 prompt，total 為 None 表示總段數未知（邊轉錄邊摘要）"""
+    position = f"{index}/{total}" if total else f"{index}"
+    return f"""以下是一份長篇會議/對話逐字稿的第 {position} 段。請只根據這一段內容，用繁體中文條列整理：
+
+- 討論的主題與重點
+- 做出的決議（如果有）
+- 提到的待辦事項與負責人（如果有）
+
+不要加入推測，也不要寫開場白。
+
+內容：
+{text}
+"""
+
+
+def combine_notes(notes: List[str]) -> str:
+    """將各段筆記合併為彙整階段的輸入"""
+    return "\n\n".join(
+        f"### 第 {i + 1} 段筆記\n{note.strip()}" for i, note in enumerate(notes)
+    )
+
+
+def map_notes(
+    pieces: List[str],
+    model: str,
+    options: dict,
+    use_cache: bool = True
+) -> str:
+    """
+    分層摘要的 map 階段：將片段打包成區塊平行摘要，回傳合併後的各段筆記
+
+    各段筆記合計仍超過門檻時，會再對筆記做一輪分段摘要，直到可以一次彙整。
+    失敗時丟出例外，由呼叫端轉為錯誤訊息。
+    """
+    chunks = chunk_pieces(pieces)
+    with ThreadPoolExecutor(max_workers=MAP_CONCURRENCY) as pool:
+        while True:
+            prompts = [
+                build_partial_prompt(chunk, i + 1, len(chunks))
+                for i, chunk in enumerate(chunks)
+            ]
+            notes = list(pool.map(lambda p: _generate(p, model, options, use_cache), prompts))
+            combined = combine_notes(notes)
+            if estimate_tokens(combined) <= MAP_REDUCE_THRESHOLD_TOKENS or len(chunks) == 1:
+                break
+            next_chunks = chunk_pieces(notes)
+            if len(next_chunks) >= len(chunks):
+                # 筆記沒有變短，再分一輪也不會收斂
+                break
+            chunks = next_chunks
+
+    return combined
+
+
+class PipelinedSummarizer:
+    """
+    邊轉錄邊摘要
+
+    轉錄過程中以 add_segment() 依序送入分段。累積的逐字稿超過
+    MEETING_MAP_REDUCE_THRESHOLD_TOKENS 後，每湊滿一個區塊就立即在背景產生該段筆記，
+    讓 LLM 與 STT 同時運作；轉錄完成後呼叫 stream() 等待剩餘筆記並串流最終摘要。
+    逐字稿未超過門檻時不會預先呼叫 LLM，stream() 的結果與 summarize_stream() 相同。
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        options: Optional[dict] = None,
+        use_cache: bool = True
+    ):
+        self.model = model
+        self.options = {**DEFAULT_OPTIONS, **(options or {})}
+        self.use_cache = use_cache
+        self._pool = ThreadPoolExecutor(max_workers=MAP_CONCURRENCY)
+        self._pieces: List[str] = []
+        self._total_tokens = 0
+        self._buffer: List[str] = []
+        self._buffer_tokens = 0
+        self._futures = []
+
+    @property
+    def started(self) -> bool:
+        """是否已開始產生分段筆記"""
+        return bool(self._futures)
+
+    def add_segment(self, text: str):
+        """送入一個轉錄分段（須依時間順序）"""
+        piece = text.strip()
+        if not piece:
+            return
+        tokens = estimate_tokens(piece)
+
+        if not self.started:
+            self._pieces.append(piece)
+            self._total_tokens += tokens
+            if self._total_tokens <= MAP_REDUCE_THRESHOLD_TOKENS:
+                return
+            # 剛超過門檻：把已累積的內容切成區塊，除最後一塊外全部送出
+            chunks = chunk_pieces(self._pieces)
+            for chunk in chunks[:-1]:
+                self._submit(chunk)
+            self._buffer = [chunks[-1]]
+            self._buffer_tokens = estimate_tokens(chunks[-1])
+            self._pieces = []
+            if not self.started:
+                self._flush()
+            return
+
+        if self._buffer and self._buffer_tokens + tokens > MAP_CHUNK_TOKENS:
+            self._flush()
+        self._buffer.append(piece)
+        self._buffer_tokens += tokens
+
+    def stream(self, text: str, style: str = "meeting", extra_styles: Sequence[str] = ()) -> Iterator[dict]:
+        """
+        轉錄完成後呼叫，產生與 summarize_styles_stream() 相同格式的事件
+
+        Args:
+            text: 完整逐字稿（未啟用分段筆記時直接用於摘要）
+            style: 摘要風格
+            extra_styles: 接著生成的其他風格，與 style 共用相同的 prompt 開頭
+        """
+        styles = [style] + [name for name in extra_styles if name != style]
+        try:
+            try:
+                if self.started:
+                    self._flush()
+                    notes = [future.result() for future in self._futures]
+                    text = combine_notes(notes)
+                    if estimate_tokens(text) > MAP_REDUCE_THRESHOLD_TOKENS:
+                        text = map_notes(notes, self.model, self.options, self.use_cache)
+            except Exception as e:
+                record_error("summarize", e)
+                for name in styles:
+                    yield {"type": "error", "style": name, "error": error_message(e)}
+                return
+            yield from _styles_stream(text, styles, self.model, self.options, self.use_cache)
+        finally:
+            self.close()
+
+    def close(self):
+        """取消尚未開始的分段筆記並釋放執行緒"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _flush(self):
+        if self._buffer:
+            self._submit("\n".join(self._buffer))
+            self._buffer, self._buffer_tokens = [], 0
+
+    def _submit(self, chunk: str):
+        prompt = build_partial_prompt(chunk, len(self._futures) + 1)
+        self._futures.append(
+            self._pool.submit(_generate, prompt, self.model, self.options, self.use_cache)
+        )
+
+
+def check_ollama_status(refresh: bool = False) -> dict:
     """
     檢查 Ollama 服務狀態
 
+    Args:
+        refresh: True 時立即查詢一次；False 時回傳背景健康檢查的快取結果，不做網路請求
+
     Returns:
-        dict: 包含 available (bool) 和 models (list)
+        dict: 包含 available (bool)、models (list) 和 checked_at (最後檢查時間)
     """
-    try:
-        response = requests.get("http://192.168.1.213:11434/api/tags", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            models = [m.get("name", "") for m in data.get("models", [])]
-            return {"available": True, "models": models}
-    except:
-        pass
-
-    return {"available": False, "models": []}
+    if refresh:
+        return ollama.call(ollama.refresh_status())
+    return ollama.status()
 
 
 if __name__ == "__main__":
     # 檢查 Ollama 狀態
-    status = check_ollama_status()
+    status = check_ollama_status(refresh=True)
     print(f"Ollama 狀態: {'可用' if status['available'] else '不可用'}")
     if status['models']:
         print(f"已安裝模型: {', '.join(status['models'])}")
@@ -0,0 +1,176 @@
+"""
+處理速度模型
+由實際完成的工作記錄各 STT 後端/模型的即時率 (RTF) 與各 LLM 模型的生成速度，
+用於估算任務處理時間與佇列等待時間；數據保存在快取目錄，重啟後沿用
+"""
+
+import os
+import json
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from cache import CACHE_DIR
+
+
+THROUGHPUT_FILE = CACHE_DIR / "throughput.json"
+# 指數移動平均的新樣本權重，越大越快反映近期變化（例如機器負載）
+SMOOTHING = float(os.environ.get("MEETING_THROUGHPUT_SMOOTHING", "0.2"))
+
+# 尚無實測資料時的預設值（README 效能參考：M2 Max 上 60 分鐘音檔約 4 分鐘轉錄）
+DEFAULT_STT_RTF = 0.07
+DEFAULT_PROMPT_TOKENS_PER_SECOND = 300.0
+DEFAULT_TOKENS_PER_SECOND = 15.0
+# 每次生成的輸出 token 數
+DEFAULT_OUTPUT_TOKENS = 600.0
+# 逐字稿每秒音訊的 token 數（中文語速約每秒 4 字）
+DEFAULT_TRANSCRIPT_TOKENS_PER_SECOND = 4.0
+
+
+class ThroughputModel:
+    """
+    處理速度的指數移動平均
+
+    stt[後端/模型] = 處理秒數 / 音訊秒數
+    llm[模型] = {prompt_tps, tps, output_tokens}
+    transcript_tps = 逐字稿 token 數 / 音訊秒數
+    """
+
+    def __init__(self, path: Path = THROUGHPUT_FILE, smoothing: float = SMOOTHING):
+        self.path = Path(path)
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self.stt: Dict[str, float] = {}
+        self.llm: Dict[str, Dict[str, float]] = {}
+        self.transcript_tps: Optional[float] = None
+        self.samples = {"stt": 0, "llm": 0}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.stt = data.get("stt", {})
+            self.llm = data.get("llm", {})
+            self.transcript_tps = data.get("transcript_tps")
+            self.samples = data.get("samples", self.samples)
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    @staticmethod
+    def stt_key(backend: str, model: str, chunked: bool = False) -> str:
+        # 分段平行轉錄的有效速度與單一行程不同，分開記錄
+        return f"{backend}/{model}" + ("/chunked" if chunked else "")
+
+    def _average(self, previous: Optional[float], value: float) -> float:
+        if previous is None:
+            return value
+        return previous + self.smoothing * (value - previous)
+
+    def record_stt(
+        self,
+        backend: str,
+        model: str,
+        audio_seconds: float,
+        elapsed: float,
+        chunked: bool = False
+    ):
+        """記錄一次（未命中快取的）轉錄"""
+        if audio_seconds <= 0 or elapsed <= 0:
+            return
+        key = self.stt_key(backend, model, chunked)
+        with self._lock:
+            self.stt[key] = self._average(self.stt.get(key), elapsed / audio_seconds)
+            self.samples["stt"] += 1
+            self._save()
+
+    def record_transcript(self, audio_seconds: float, tokens: int):
+        """記錄逐字稿長度與音訊長度的比例，用於由音訊長度推估 prompt 大小"""
+        if audio_seconds <= 0 or tokens <= 0:
+            return
+        with self._lock:
+            self.transcript_tps = self._average(self.transcript_tps, tokens / audio_seconds)
+            self._save()
+
+    def record_llm(self, model: str, stats: dict):
+        """
+        記錄一次 LLM 生成
+
+        Args:
+            stats: summarizer.generation_stats() 的結果
+        """
+        if stats.get("cached") or not stats.get("eval_tokens"):
+            return
+        with self._lock:
+            current = self.llm.setdefault(model, {})
+            if stats.get("tokens_per_second"):
+                current["tps"] = self._average(current.get("tps"), stats["tokens_per_second"])
+            if stats.get("prompt_tokens") and stats.get("prompt_eval_time"):
+                current["prompt_tps"] = self._average(
+                    current.get("prompt_tps"), stats["prompt_tokens"] / stats["prompt_eval_time"]
+                )
+            current["output_tokens"] = self._average(current.get("output_tokens"), stats["eval_tokens"])
+            self.samples["llm"] += 1
+            self._save()
+
+    def stt_rtf(
+        self,
+        backend: str,
+        model: str,
+        chunked: bool = False,
+        default: Optional[float] = None
+    ) -> float:
+        """
+        處理秒數 / 音訊秒數；分段模式尚無資料時保守地沿用單一行程的數值，
+        都沒有資料時使用 default（未指定時為 DEFAULT_STT_RTF）
+        """
+        rtf = self.stt.get(self.stt_key(backend, model))
+        if chunked:
+            rtf = self.stt.get(self.stt_key(backend, model, chunked=True), rtf)
+        if rtf is not None:
+            return rtf
+        return default if default is not None else DEFAULT_STT_RTF
+
+    def transcript_tokens(self, audio_seconds: float) -> int:
+        return int(audio_seconds * (self.transcript_tps or DEFAULT_TRANSCRIPT_TOKENS_PER_SECOND))
+
+    def output_tokens(self, model: str) -> float:
+        """每次生成的平均輸出 token 數"""
+        return self.llm.get(model, {}).get("output_tokens", DEFAULT_OUTPUT_TOKENS)
+
+    def generation_seconds(self, model: str, prompt_tokens: int, output_tokens: Optional[float] = None) -> float:
+        """估算一次生成的耗時（prompt 處理 + 輸出）"""
+        rates = self.llm.get(model, {})
+        if output_tokens is None:
+            output_tokens = self.output_tokens(model)
+        return (
+            prompt_tokens / rates.get("prompt_tps", DEFAULT_PROMPT_TOKENS_PER_SECOND)
+            + output_tokens / rates.get("tps", DEFAULT_TOKENS_PER_SECOND)
+        )
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "stt_rtf": dict(self.stt),
+                "llm": {model: dict(rates) for model, rates in self.llm.items()},
+                "transcript_tokens_per_second": self.transcript_tps,
+                "samples": dict(self.samples),
+            }
+
+    def _save(self):
+        # 呼叫端須持有 self._lock；寫入失敗不影響處理流程
+        data = json.dumps({
+            "stt": self.stt,
+            "llm": self.llm,
+            "transcript_tps": self.transcript_tps,
+            "samples": self.samples,
+        }, ensure_ascii=False)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+
+throughput = ThroughputModel()
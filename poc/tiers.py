@@ -0,0 +1,171 @@
+"""
+STT 模型分級
+同一後端準備多個由準確到快速的模型，依要求的品質、音檔長度與目前佇列等待時間
+為每個任務選擇模型：尖峰時段寧可快速交付 turbo 模型的逐字稿，也不要讓使用者等待 large-v3
+"""
+
+import os
+from typing import List, NamedTuple, Optional
+
+from stt import is_transcript_cached, use_chunked
+from stt_backends import STT_BACKEND, STT_MODEL, get_backend
+from throughput import DEFAULT_STT_RTF, throughput
+
+
+# 從上傳到逐字稿完成的目標秒數（含排隊），自動選擇時挑選能在此時間內完成的最準確模型
+STT_SLO_SECONDS = float(os.environ.get("MEETING_STT_SLO_SECONDS", "600"))
+# 自訂分級，格式為「名稱=模型」以逗號分隔，由準確到快速排列，例如 high=large-v3,fast=small
+STT_TIERS = os.environ.get("MEETING_STT_TIERS", "")
+
+# 各後端預設的分級（由準確到快速）
+DEFAULT_TIERS = {
+    "mlx": (
+        ("high", "mlx-community/whisper-large-v3-mlx"),
+        ("balanced", "mlx-community/whisper-large-v3-turbo"),
+        ("fast", "mlx-community/whisper-small-mlx"),
+    ),
+    "faster-whisper": (
+        ("high", "large-v3"),
+        ("balanced", "large-v3-turbo"),
+        ("fast", "small"),
+    ),
+    "fake": (
+        ("high", "fake"),
+        ("balanced", "fake-turbo"),
+        ("fast", "fake-small"),
+    ),
+}
+# 尚無實測速度時，各級相對於 DEFAULT_STT_RTF 的耗時比例（依分級順序）
+TIER_COST_PRIORS = (1.0, 0.35, 0.15)
+
+AUTO = "auto"
+
+# 選擇原因
+REQUESTED = "requested"      # 指定了品質
+WITHIN_SLO = "within_slo"    # 最準確的模型即可在目標時間內完成
+DOWNGRADED = "downgraded"    # 改用較快的模型才能在目標時間內完成
+FASTEST = "fastest"          # 所有模型都無法在目標時間內完成，使用最快的模型
+CACHED = "cached"            # 已有此模型（且不比依負載選擇的模型差）的逐字稿快取
+DRAFT = "draft"              # 兩階段轉錄的草稿
+
+
+class Tier(NamedTuple):
+    """一個 STT 模型分級"""
+    name: str
+    model: str
+    cost: float
+
+
+def get_tiers(backend: Optional[str] = None) -> List[Tier]:
+    """
+    取得後端的模型分級（由準確到快速）
+
+    設定 MEETING_STT_TIERS 時使用自訂分級；否則使用後端預設分級，
+    且設定 MEETING_STT_MODEL 時以其取代最準確的一級
+    """
+    backend = backend or STT_BACKEND
+    if STT_TIERS:
+        pairs = [item.split("=", 1) for item in STT_TIERS.split(",") if "=" in item]
+        pairs = [(name.strip(), model.strip()) for name, model in pairs]
+    else:
+        pairs = list(DEFAULT_TIERS.get(backend, (("high", get_backend(backend).model),)))
+        if STT_MODEL:
+            pairs[0] = (pairs[0][0], STT_MODEL)
+    return [
+        Tier(name, model, TIER_COST_PRIORS[min(i, len(TIER_COST_PRIORS) - 1)])
+        for i, (name, model) in enumerate(pairs)
+    ]
+
+
+def qualities(backend: Optional[str] = None) -> List[str]:
+    """可指定的品質：auto 與各分級名稱"""
+    return [AUTO] + [tier.name for tier in get_tiers(backend)]
+
+
+def check_quality(quality: str, backend: Optional[str] = None) -> str:
+    """確認品質可用，不存在時丟出 ValueError"""
+    if quality not in qualities(backend):
+        raise ValueError(f"不支援的轉錄品質: {quality}（可用: {', '.join(qualities(backend))}）")
+    return quality
+
+
+def transcribe_seconds(model: str, duration: float, backend: Optional[str] = None) -> float:
+    """依實測速度估算以此模型轉錄的秒數；尚無實測資料時依所屬分級的耗時比例推估"""
+    backend = backend or STT_BACKEND
+    cost = next((tier.cost for tier in get_tiers(backend) if tier.model == model), 1.0)
+    rtf = throughput.stt_rtf(backend, model, use_chunked(duration), default=DEFAULT_STT_RTF * cost)
+    return duration * rtf
+
+
+def choose_tier(
+    duration: float,
+    quality: str = AUTO,
+    queue_wait: float = 0.0,
+    backend: Optional[str] = None,
+    audio_hash: Optional[str] = None
+) -> dict:
+    """
+    為一個任務選擇 STT 模型
+
+    自動選擇時，若音檔已有某一級的逐字稿快取，且該級不比依負載選出的分級差，直接使用該級：
+    負載高時重送的音檔不會降級成較快的模型而錯過 large-v3 的快取、重跑出較差的結果
+
+    Args:
+        duration: 音訊長度（秒）
+        quality: auto 表示依負載自動選擇，或指定分級名稱
+        queue_wait: 預估排隊等待秒數
+        backend: STT 後端名稱，None 表示使用 MEETING_STT_BACKEND
+        audio_hash: 音檔的 SHA-256，用於查詢逐字稿快取；None 表示不查詢
+
+    Returns:
+        dict: tier、backend、model、reason（選擇原因）、cached（是否命中逐字稿快取）、
+            transcribe_seconds（預估轉錄秒數，命中快取時為 0）
+
+    Raises:
+        ValueError: 指定的品質不存在
+    """
+    backend = backend or STT_BACKEND
+    tiers = get_tiers(backend)
+
+    def cached(tier: Tier) -> bool:
+        return audio_hash is not None and is_transcript_cached(audio_hash, backend, tier.model)
+
+    if check_quality(quality, backend) != AUTO:
+        tier, reason = next(tier for tier in tiers if tier.name == quality), REQUESTED
+    else:
+        # 由最準確的分級開始，選第一個能在目標時間內完成的
+        tier, reason = tiers[-1], FASTEST
+        for i, candidate in enumerate(tiers):
+            if queue_wait + transcribe_seconds(candidate.model, duration, backend) <= STT_SLO_SECONDS:
+                tier, reason = candidate, WITHIN_SLO if i == 0 else DOWNGRADED
+                break
+        better = next((candidate for candidate in tiers[:tiers.index(tier) + 1] if cached(candidate)), None)
+        if better is not None:
+            tier, reason = better, CACHED
+
+    hit = reason == CACHED or cached(tier)
+    return {
+        "tier": tier.name,
+        "backend": backend,
+        "model": tier.model,
+        "reason": reason,
+        "cached": hit,
+        "transcribe_seconds": 0.0 if hit else transcribe_seconds(tier.model, duration, backend),
+    }
+
+
+def draft_tier(choice: dict) -> Optional[dict]:
+    """
+    兩階段轉錄使用的草稿分級：後端最快的一級
+
+    Args:
+        choice: choose_tier() 的結果
+
+    Returns:
+        dict: tier、backend、model、reason；選定的分級已是最快的一級，或其逐字稿已在快取中時
+            回傳 None（不需要草稿）
+    """
+    fastest = get_tiers(choice["backend"])[-1]
+    if fastest.model == choice["model"] or choice.get("cached"):
+        return None
+    return {"tier": fastest.name, "backend": choice["backend"], "model": fastest.model, "reason": DRAFT}
@@ -0,0 +1,116 @@
+"""
+模型預熱
+服務啟動時在背景執行緒載入並預熱 STT 模型，完成前 /health/ready 回報未就緒，
+負載平衡器只會把請求送到模型已載入的實例
+"""
+
+import os
+import time
+import threading
+from typing import Optional
+
+from metrics import record_error
+from stt import warmup as warmup_stt
+from stt_backends import get_backend
+from tiers import get_tiers
+
+
+# 啟動時是否預先載入 STT 模型；關閉時模型在第一個請求才載入，且不影響就緒狀態
+STT_PRELOAD = os.environ.get("MEETING_STT_PRELOAD", "1") == "1"
+# 除了最準確的一級之外也要預熱的分級名稱，以逗號分隔，例如 balanced,fast
+STT_PRELOAD_TIERS = [
+    name.strip() for name in os.environ.get("MEETING_STT_PRELOAD_TIERS", "").split(",") if name.strip()
+]
+# 是否也預熱分段平行轉錄的各工作行程；關閉時工作行程在第一次分段轉錄才載入模型
+STT_PRELOAD_POOL = os.environ.get("MEETING_STT_PRELOAD_POOL", "0") == "1"
+# 預熱失敗後重試的等待秒數，每次加倍直到上限
+WARMUP_RETRY_SECONDS = 10.0
+WARMUP_RETRY_MAX_SECONDS = 300.0
+
+# 預熱狀態
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+DISABLED = "disabled"
+
+
+def preload_models() -> list:
+    """要預熱的模型：最準確的一級，加上 MEETING_STT_PRELOAD_TIERS 指定的分級"""
+    return [
+        tier.model for i, tier in enumerate(get_tiers())
+        if i == 0 or tier.name in STT_PRELOAD_TIERS
+    ]
+
+
+class ModelWarmup:
+    """在背景執行緒中預熱 STT 模型並記錄狀態"""
+
+    def __init__(self):
+        self.state = PENDING if STT_PRELOAD else DISABLED
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.attempts = 0
+        self.retry_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        """STT 是否可立即處理請求（未啟用預熱時視為就緒）"""
+        return self.state in (READY, DISABLED)
+
+    def start(self):
+        """啟動背景預熱（重複呼叫不會重複執行）"""
+        with self._lock:
+            if self.state == DISABLED or self._thread is not None:
+                return
+            self.state = LOADING
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="stt-warmup", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        # 失敗時以指數退避重試，暫時性的錯誤（模型下載中斷等）排除後即恢復就緒，
+        # 不會讓負載平衡器永遠摘除此實例
+        delay = WARMUP_RETRY_SECONDS
+        while True:
+            self.attempts += 1
+            try:
+                warmup_stt(models=preload_models(), pool=STT_PRELOAD_POOL)
+            except Exception as e:
+                record_error("warmup", e)
+                self.error = str(e)
+                self.state = FAILED
+                self.retry_at = time.time() + delay
+                time.sleep(delay)
+                delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+                self.state = LOADING
+            else:
+                self.state = READY
+                self.error = None
+                self.retry_at = None
+                self.finished_at = time.time()
+                return
+
+    def status(self) -> dict:
+        backend = get_backend()
+        status = {
+            "state": self.state,
+            "backend": backend.name,
+            "model": backend.model,
+            "models": preload_models(),
+        }
+        if self.started_at is not None:
+            status["seconds"] = round((self.finished_at or time.time()) - self.started_at, 2)
+        if self.attempts > 1:
+            status["attempts"] = self.attempts
+        if self.error:
+            status["error"] = self.error
+        if self.retry_at is not None:
+            status["retry_at"] = self.retry_at
+        return status
+
+
+stt_warmup = ModelWarmup()